@@ -0,0 +1,295 @@
+"""
+Caché en disco para imágenes de anuncios (Google Ads / Meta Ads).
+
+Las imágenes se guardan en AD_IMAGE_CACHE_DIR con tamaño total acotado
+(AD_IMAGE_CACHE_MAX_MB), expiración por TTL (AD_IMAGE_CACHE_TTL_HOURS) y
+desalojo LRU. Cada entrada se identifica por (clave, variante): la variante
+"original" es la imagen tal como la entrega la plataforma y las variantes
+numéricas son versiones reducidas a ese ancho máximo, generadas al vuelo a
+partir del original en caché (requiere Pillow; sin Pillow se sirve el original).
+
+Los archivos se leen con el candado tomado (`read`): otra petición puede
+desalojar la entrada entre el `get` y la lectura, y en ese caso `serve` vuelve
+a descargar la imagen en lugar de fallar.
+
+Un <img src> no puede mandar el header Authorization, así que los listados de
+anuncios entregan URLs del proxy firmadas (`signed_url`: HMAC sobre la clave de
+la imagen y una expiración corta); el proxy acepta la firma o el token Bearer.
+"""
+import hashlib
+import hmac
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+CACHE_DIR = Path(os.getenv("AD_IMAGE_CACHE_DIR", Path(__file__).parent / "cache" / "ad_images"))
+CACHE_MAX_BYTES = int(float(os.getenv("AD_IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+CACHE_TTL_SECONDS = int(float(os.getenv("AD_IMAGE_CACHE_TTL_HOURS", "24")) * 3600)
+
+# Anchos permitidos para variantes reducidas (evita llenar el caché con tamaños arbitrarios)
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+ORIGINAL = "original"
+
+_CACHE_CONTROL = f"private, max-age={CACHE_TTL_SECONDS}"
+
+# Vigencia de las URLs firmadas del proxy
+SIGNED_URL_TTL_SECONDS = int(float(os.getenv("AD_IMAGE_URL_TTL_MINUTES", "60")) * 60)
+
+
+@dataclass
+class CachedImage:
+    path: Path
+    content_type: str
+    etag: str
+    size: int
+    created_at: float
+
+
+def variant_for_width(ancho: Optional[int]) -> str:
+    """Normaliza el ancho pedido al ancho permitido más cercano hacia arriba."""
+    if not ancho:
+        return ORIGINAL
+    for w in VARIANT_WIDTHS:
+        if ancho <= w:
+            return str(w)
+    return ORIGINAL
+
+
+class DiskImageCache:
+    """Caché LRU en disco, seguro entre hilos del threadpool de FastAPI."""
+
+    def __init__(self, directory: Path, max_bytes: int, ttl_seconds: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+
+    # ── Índice ────────────────────────────────────────────────────────────────
+
+    def _ensure_loaded(self):
+        """Reconstruye el índice desde disco la primera vez (orden LRU por mtime)."""
+        if self._loaded:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for meta_path in self.directory.glob("*.json"):
+            data_path = meta_path.with_suffix(".bin")
+            try:
+                meta = json.loads(meta_path.read_text())
+                stat = data_path.stat()
+            except Exception:
+                meta_path.unlink(missing_ok=True)
+                data_path.unlink(missing_ok=True)
+                continue
+            entry = CachedImage(
+                path=data_path,
+                content_type=meta.get("content_type", "image/jpeg"),
+                etag=meta["etag"],
+                size=stat.st_size,
+                created_at=float(meta.get("created_at", stat.st_mtime)),
+            )
+            found.append((stat.st_mtime, data_path.stem, entry))
+        for _, name, entry in sorted(found, key=lambda f: f[0]):
+            self._entries[name] = entry
+            self._total_bytes += entry.size
+        self._loaded = True
+
+    @staticmethod
+    def _name(key: str, variant: str) -> str:
+        return hashlib.sha256(f"{key}|{variant}".encode()).hexdigest()
+
+    def _drop(self, name: str):
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        entry.path.unlink(missing_ok=True)
+        entry.path.with_suffix(".json").unlink(missing_ok=True)
+
+    def _evict(self):
+        # Nunca desaloja la entrada recién insertada (la última), que se va a servir
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    # ── API pública ───────────────────────────────────────────────────────────
+
+    def get(self, key: str, variant: str = ORIGINAL) -> Optional[CachedImage]:
+        name = self._name(key, variant)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at > self.ttl_seconds or not entry.path.exists():
+                self._drop(name)
+                return None
+            self._entries.move_to_end(name)
+        try:
+            os.utime(entry.path)  # conserva el orden LRU entre reinicios
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, variant: str, content: bytes, content_type: str) -> CachedImage:
+        name = self._name(key, variant)
+        data_path = self.directory / f"{name}.bin"
+        entry = CachedImage(
+            path=data_path,
+            content_type=content_type or "image/jpeg",
+            etag='"' + hashlib.sha256(content).hexdigest()[:32] + '"',
+            size=len(content),
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._ensure_loaded()
+            self._drop(name)
+            tmp_path = data_path.with_suffix(".tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, data_path)
+            data_path.with_suffix(".json").write_text(json.dumps({
+                "key": key,
+                "variant": variant,
+                "content_type": entry.content_type,
+                "etag": entry.etag,
+                "created_at": entry.created_at,
+            }))
+            self._entries[name] = entry
+            self._total_bytes += entry.size
+            self._evict()
+        return entry
+
+    def read(self, entry: CachedImage) -> Optional[bytes]:
+        """Contenido de la entrada; None si ya se desalojó (el archivo no existe)."""
+        with self._lock:
+            if self._entries.get(entry.path.stem) is not entry:
+                return None
+            try:
+                return entry.path.read_bytes()
+            except FileNotFoundError:
+                self._drop(entry.path.stem)
+                return None
+
+    def get_or_resize(self, key: str, variant: str) -> Optional[CachedImage]:
+        """Devuelve la variante pedida; si solo existe el original, la genera localmente."""
+        entry = self.get(key, variant)
+        if entry is not None or variant == ORIGINAL:
+            return entry
+        original = self.get(key, ORIGINAL)
+        if original is None:
+            return None
+        return self.put_variant(key, variant, original)
+
+    def put_variant(self, key: str, variant: str, original: CachedImage,
+                    content: Optional[bytes] = None) -> Optional[CachedImage]:
+        """Variante reducida del original (`content` si ya se tiene en memoria); None si se desalojó."""
+        if variant == ORIGINAL:
+            return original
+        if content is None:
+            content = self.read(original)
+            if content is None:
+                return None
+        resized = downscale(content, int(variant))
+        if resized is None:
+            return original
+        content, content_type = resized
+        return self.put(key, variant, content, content_type)
+
+
+def downscale(content: bytes, width: int) -> Optional[tuple[bytes, str]]:
+    """Reduce la imagen a `width` px de ancho máximo. None si no hace falta o no hay Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(content))
+        if img.width <= width:
+            return None
+        fmt = "PNG" if img.format == "PNG" or img.mode in ("RGBA", "LA", "P") else "JPEG"
+        img.thumbnail((width, width * 4))
+        if fmt == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=85, optimize=True)
+        return out.getvalue(), f"image/{fmt.lower()}"
+    except Exception:
+        return None
+
+
+def image_response(request: Request, entry: CachedImage) -> Optional[Response]:
+    """
+    Respuesta HTTP para una imagen en caché, con ETag fuerte y 304 si no cambió.
+    None si la entrada se desalojó antes de poder leerla.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": _CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    content = cache.read(entry)
+    if content is None:
+        return None
+    return Response(content=content, media_type=entry.content_type, headers=headers)
+
+
+def serve(request: Request, key: str, variant: str, fetch: Callable[[], tuple[bytes, str]]) -> Response:
+    """
+    Sirve la variante desde el caché; si no está (o se desaloja mientras se
+    lee), `fetch()` descarga el original como (contenido, content_type).
+    """
+    entry = cache.get_or_resize(key, variant)
+    response = image_response(request, entry) if entry is not None else None
+    if response is not None:
+        return response
+
+    content, content_type = fetch()
+    original = cache.put(key, ORIGINAL, content, content_type)
+    entry = cache.put_variant(key, variant, original, content)
+    response = image_response(request, entry) if entry is not None else None
+    if response is None:
+        # Desalojada por otra petición justo después de guardarla: servir lo descargado
+        response = Response(content=content, media_type=original.content_type,
+                            headers={"Cache-Control": _CACHE_CONTROL})
+    return response
+
+
+cache = DiskImageCache(CACHE_DIR, CACHE_MAX_BYTES, CACHE_TTL_SECONDS)
+
+
+# ── URLs firmadas ─────────────────────────────────────────────────────────────
+
+def _signing_key() -> bytes:
+    secret = os.getenv("AD_IMAGE_URL_SECRET")
+    if not secret:
+        from routers.auth import SECRET_KEY as secret
+    return secret.encode()
+
+
+def _signature(key: str, expires: int) -> str:
+    return hmac.new(_signing_key(), f"{key}|{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def signed_url(path: str, key: str) -> str:
+    """`path` del proxy con exp y sig para la imagen `key`, válida SIGNED_URL_TTL_SECONDS."""
+    expires = int(time.time()) + SIGNED_URL_TTL_SECONDS
+    separator = "&" if "?" in path else "?"
+    return f"{path}{separator}exp={expires}&sig={_signature(key, expires)}"
+
+
+def valid_signature(key: str, expires: Optional[int], sig: Optional[str]) -> bool:
+    """Si (exp, sig) de la URL corresponden a `key` y no han expirado."""
+    if not expires or not sig or expires < time.time():
+        return False
+    return hmac.compare_digest(sig, _signature(key, expires))
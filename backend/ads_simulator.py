@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Simulador local de Google Ads REST y Meta Graph API.
+
+Implementa solo el subconjunto que usan routers/google_ads.py y routers/meta_ads.py,
+con datos sintéticos deterministas (mismo seed → mismos números):
+
+  Google:  POST /token
+           POST /v20/customers/{id}/googleAds:search        (con nextPageToken)
+           POST /v20/customers/{id}/googleAds:searchStream
+           GET  /images/{asset_id}
+  Meta:    GET  /v21.0/{act}/campaigns | adsets | insights | adimages
+           GET  /v21.0/{campaign}/ads | adsets | insights
+           GET  /v21.0/?ids=...                             (creativos)
+           POST /v21.0/                                     (Batch API)
+           POST /v21.0/{act}/insights  +  GET /v21.0/{report_run_id}[/insights]
+
+Se puede inyectar latencia y errores (HTTP 500) para medir el comportamiento
+de los routers. Uso típico (ver benchmark_ads.py):
+
+  python ads_simulator.py --port 8765 --cuentas 5 --campanas 40 --dias 90 --latencia-ms 30
+
+y en el backend:
+
+  GOOGLE_ADS_API_HOST=http://127.0.0.1:8765
+  GOOGLE_OAUTH_TOKEN_URL=http://127.0.0.1:8765/token
+  META_GRAPH_API_HOST=http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+GOOGLE_PAGE_SIZE = 10000  # igual que googleAds:search en v20
+
+
+@dataclass
+class SimConfig:
+    cuentas: int = 3
+    campanas: int = 20
+    anuncios: int = 4
+    dias: int = 90
+    latencia_ms: float = 0.0
+    jitter_ms: float = 0.0
+    tasa_error: float = 0.0
+    bytes_imagen: int = 50_000
+    google_page_size: int = GOOGLE_PAGE_SIZE
+    seed: int = 42
+
+    @property
+    def ultimo_dia(self) -> date:
+        return date(2026, 1, 1) + timedelta(days=self.dias - 1)
+
+    @property
+    def primer_dia(self) -> date:
+        return date(2026, 1, 1)
+
+
+class SimData:
+    """Genera cuentas, campañas y métricas diarias deterministas."""
+
+    def __init__(self, cfg: SimConfig):
+        self.cfg = cfg
+        self.google_customers = [f"{1000000000 + i}" for i in range(cfg.cuentas)]
+        self.meta_accounts = [f"act_{9000000 + i}" for i in range(cfg.cuentas)]
+
+    # ── Identificadores ───────────────────────────────────────────────────────
+
+    def marcas(self) -> list[str]:
+        return [f"Marca {i + 1}" for i in range(self.cfg.cuentas)]
+
+    def google_campaign_ids(self, customer_id: str) -> list[str]:
+        idx = self.google_customers.index(customer_id) if customer_id in self.google_customers else 0
+        return [f"{(idx + 1) * 100000 + c}" for c in range(self.cfg.campanas)]
+
+    def meta_campaign_ids(self, account_id: str) -> list[str]:
+        idx = self.meta_accounts.index(account_id) if account_id in self.meta_accounts else 0
+        return [f"2385{(idx + 1):03d}{c:06d}" for c in range(self.cfg.campanas)]
+
+    def days(self, since: Optional[date] = None, until: Optional[date] = None):
+        first = max(since or self.cfg.primer_dia, self.cfg.primer_dia)
+        last = min(until or self.cfg.ultimo_dia, self.cfg.ultimo_dia)
+        d = first
+        while d <= last:
+            yield d
+            d += timedelta(days=1)
+
+    # ── Métricas ──────────────────────────────────────────────────────────────
+
+    def daily(self, campaign_id: str, day: date) -> dict:
+        rng = random.Random(f"{self.cfg.seed}:{campaign_id}:{day.isoformat()}")
+        impressions = rng.randint(200, 5000)
+        clicks = rng.randint(0, impressions // 20)
+        return {
+            "impressions": impressions,
+            "clicks": clicks,
+            "interactions": clicks + rng.randint(0, 30),
+            "conversions": round(rng.random() * clicks / 5, 2),
+            "cost_micros": rng.randint(50, 2000) * 1_000_000,
+        }
+
+    def total(self, campaign_id: str, since: Optional[date] = None, until: Optional[date] = None) -> dict:
+        acc = {"impressions": 0, "clicks": 0, "interactions": 0, "conversions": 0.0, "cost_micros": 0}
+        for d in self.days(since, until):
+            for k, v in self.daily(campaign_id, d).items():
+                acc[k] += v
+        return acc
+
+
+# ─── Google Ads ────────────────────────────────────────────────────────────────
+
+_DATE_RANGE = re.compile(r"segments\.date\s+BETWEEN\s+'([\d-]+)'\s+AND\s+'([\d-]+)'", re.I)
+_FROM = re.compile(r"\bFROM\s+(\w+)", re.I)
+_CAMPAIGN_EQ = re.compile(r"campaign\.id\s*=\s*(\d+)", re.I)
+_ASSET_IDS = re.compile(r"asset\.id\s*(?:=\s*(\d+)|IN\s*\(([^)]*)\))", re.I)
+
+
+def _gads_metrics(m: dict) -> dict:
+    impr, clicks, inter, conv = m["impressions"], m["clicks"], m["interactions"], m["conversions"]
+    return {
+        "impressions": str(impr),
+        "clicks": str(clicks),
+        "interactions": str(inter),
+        "conversions": conv,
+        "costMicros": str(m["cost_micros"]),
+        "ctr": (clicks / impr) if impr else 0,
+        "averageCpc": str(m["cost_micros"] // clicks) if clicks else "0",
+        "costPerConversion": (m["cost_micros"] / conv) if conv else 0,
+    }
+
+
+def gaql_rows(data: SimData, base_url: str, customer_id: str, query: str):
+    """Filas (en formato JSON de la API REST) para la consulta GAQL dada."""
+    resource = (_FROM.search(query) or [None, ""])[1].lower()
+    if resource == "campaign":
+        campaign_filter = _CAMPAIGN_EQ.search(query)
+        ids = data.google_campaign_ids(customer_id)
+        if campaign_filter:
+            ids = [c for c in ids if c == campaign_filter.group(1)]
+        date_range = _DATE_RANGE.search(query)
+        if date_range:
+            since = date.fromisoformat(date_range.group(1))
+            until = date.fromisoformat(date_range.group(2))
+            for day in data.days(since, until):
+                for cid in ids:
+                    yield {
+                        "campaign": {"resourceName": f"customers/{customer_id}/campaigns/{cid}", "id": cid},
+                        "metrics": _gads_metrics(data.daily(cid, day)),
+                        "segments": {"date": day.isoformat()},
+                    }
+            return
+        for n, cid in enumerate(ids):
+            yield {
+                "campaign": {
+                    "id": cid,
+                    "name": f"Campaña simulada {cid}",
+                    "status": "ENABLED" if n % 5 else "PAUSED",
+                    "startDate": data.cfg.primer_dia.isoformat(),
+                    "endDate": "2037-12-30",
+                },
+                "campaignBudget": {"amountMicros": str(500 * 1_000_000)},
+                "metrics": _gads_metrics(data.total(cid)),
+            }
+    elif resource == "ad_group_ad":
+        campaign_filter = _CAMPAIGN_EQ.search(query)
+        cid = campaign_filter.group(1) if campaign_filter else "0"
+        for a in range(data.cfg.anuncios):
+            ad_id = f"{cid}{a:03d}"
+            yield {
+                "adGroupAd": {
+                    "status": "ENABLED",
+                    "ad": {
+                        "id": ad_id,
+                        "name": f"Anuncio {ad_id}",
+                        "type": "RESPONSIVE_DISPLAY_AD",
+                        "finalUrls": ["https://example.com"],
+                        "responsiveDisplayAd": {
+                            "marketingImages": [{"asset": f"customers/{customer_id}/assets/{ad_id}1"}],
+                            "squareMarketingImages": [{"asset": f"customers/{customer_id}/assets/{ad_id}2"}],
+                        },
+                    },
+                },
+                "metrics": _gads_metrics(data.total(ad_id)),
+            }
+    elif resource == "asset":
+        match = _ASSET_IDS.search(query)
+        if not match:
+            return
+        ids = [match.group(1)] if match.group(1) else [i.strip() for i in match.group(2).split(",") if i.strip()]
+        for aid in ids:
+            yield {
+                "asset": {
+                    "id": aid,
+                    "imageAsset": {"fullSize": {"url": f"{base_url}/images/{aid}"}},
+                }
+            }
+
+
+# ─── Meta Graph ────────────────────────────────────────────────────────────────
+
+def _meta_insights_row(data: SimData, campaign_id: str, since=None, until=None) -> dict:
+    t = data.total(campaign_id, since, until)
+    impr, clicks = t["impressions"], t["clicks"]
+    spend = t["cost_micros"] / 1_000_000
+    return {
+        "campaign_id": campaign_id,
+        "impressions": str(impr),
+        "clicks": str(clicks),
+        "inline_link_clicks": str(clicks),
+        "spend": f"{spend:.2f}",
+        "ctr": f"{(clicks / impr * 100) if impr else 0:.4f}",
+        "cost_per_inline_link_click": f"{(spend / clicks) if clicks else 0:.4f}",
+        "actions": [{"action_type": "lead", "value": str(int(t["conversions"]))}],
+        "date_start": str(since or data.cfg.primer_dia),
+        "date_stop": str(until or data.cfg.ultimo_dia),
+    }
+
+
+def _date_filter(params: dict):
+    if params.get("time_range"):
+        tr = json.loads(params["time_range"])
+        return date.fromisoformat(tr["since"]), date.fromisoformat(tr["until"])
+    return None, None
+
+
+class MetaGraph:
+    def __init__(self, data: SimData):
+        self.data = data
+        self.report_runs: dict = {}
+
+    def _page(self, items: list, params: dict, base_url: str, path: str) -> dict:
+        limit = int(params.get("limit", 25) or 25)
+        offset = int(params.get("after", 0) or 0)
+        page = {"data": items[offset:offset + limit]}
+        if offset + limit < len(items):
+            next_params = {k: v for k, v in params.items() if k != "after"}
+            next_params["after"] = str(offset + limit)
+            page["paging"] = {
+                "cursors": {"after": str(offset + limit)},
+                "next": f"{base_url}/{path}?{urlencode(next_params)}",
+            }
+        return page
+
+    def _account_of(self, campaign_id: str) -> Optional[str]:
+        for acct in self.data.meta_accounts:
+            if campaign_id in self.data.meta_campaign_ids(acct):
+                return acct
+        return None
+
+    def get(self, path: str, params: dict, base_url: str) -> tuple[int, dict]:
+        parts = [p for p in path.split("/") if p]
+        if not parts:
+            ids = [i for i in params.get("ids", "").split(",") if i]
+            return 200, {i: {"id": i, "thumbnail_url": f"{base_url}/images/{i}"} for i in ids}
+
+        obj = parts[0]
+        edge = parts[1] if len(parts) > 1 else ""
+
+        if obj in self.report_runs:
+            run = self.report_runs[obj]
+            if edge == "insights":
+                return 200, self._page(run["rows"], params, base_url, path)
+            return 200, {"id": obj, "async_status": "Job Completed", "async_percent_completion": 100}
+
+        if obj in self.data.meta_accounts:
+            campaign_ids = self.data.meta_campaign_ids(obj)
+            if edge == "campaigns":
+                items = [{
+                    "id": cid,
+                    "name": f"Campaña Meta {cid}",
+                    "status": "ACTIVE",
+                    "start_time": f"{self.data.cfg.primer_dia.isoformat()}T00:00:00-0600",
+                    "daily_budget": "50000",
+                } for cid in campaign_ids]
+                return 200, self._page(items, params, base_url, path)
+            if edge == "adsets":
+                items = [{"campaign_id": cid, "optimization_goal": "LEAD_GENERATION"} for cid in campaign_ids]
+                return 200, self._page(items, params, base_url, path)
+            if edge == "insights":
+                since, until = _date_filter(params)
+                items = [_meta_insights_row(self.data, cid, since, until) for cid in campaign_ids]
+                return 200, self._page(items, params, base_url, path)
+            if edge == "adimages":
+                hashes = json.loads(params.get("hashes", "[]"))
+                items = [{"hash": h, "url": f"{base_url}/images/{h}"} for h in hashes]
+                return 200, self._page(items, params, base_url, path)
+
+        if self._account_of(obj):
+            if edge == "insights":
+                since, until = _date_filter(params)
+                row = _meta_insights_row(self.data, obj, since, until)
+                row.pop("campaign_id")
+                return 200, {"data": [row]}
+            if edge == "adsets":
+                return 200, self._page([{"optimization_goal": "LEAD_GENERATION"}], params, base_url, path)
+            if edge == "ads":
+                items = [{
+                    "id": f"{obj}{a:03d}",
+                    "name": f"Anuncio {obj}{a:03d}",
+                    "effective_status": "ACTIVE",
+                    "creative": {
+                        "id": f"c{obj}{a:03d}",
+                        "image_hash": f"h{obj}{a:03d}",
+                        "thumbnail_url": f"{base_url}/images/t{obj}{a:03d}",
+                        "title": "Título",
+                        "body": "Texto del anuncio",
+                    },
+                } for a in range(self.data.cfg.anuncios)]
+                return 200, self._page(items, params, base_url, path)
+
+        return 404, {"error": {"message": f"Unsupported get request: {path}", "code": 100}}
+
+    def start_report(self, account_id: str, params: dict) -> tuple[int, dict]:
+        if account_id not in self.data.meta_accounts:
+            return 404, {"error": {"message": "Unknown account", "code": 100}}
+        since, until = _date_filter(params)
+        run_id = f"{len(self.report_runs) + 1:012d}"
+        self.report_runs[run_id] = {
+            "rows": [_meta_insights_row(self.data, cid, since, until) for cid in self.data.meta_campaign_ids(account_id)]
+        }
+        return 200, {"report_run_id": run_id}
+
+
+# ─── Aplicación ────────────────────────────────────────────────────────────────
+
+def create_app(cfg: SimConfig) -> FastAPI:
+    app = FastAPI(title="Ads simulator")
+    data = SimData(cfg)
+    graph = MetaGraph(data)
+    rng = random.Random(cfg.seed)
+    app.state.data = data
+    app.state.stats = {"requests": 0, "errores_inyectados": 0}
+
+    @app.middleware("http")
+    async def latency_and_errors(request: Request, call_next):
+        app.state.stats["requests"] += 1
+        delay = cfg.latencia_ms + (rng.random() * cfg.jitter_ms if cfg.jitter_ms else 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if cfg.tasa_error and rng.random() < cfg.tasa_error:
+            app.state.stats["errores_inyectados"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "Error simulado", "code": 2}})
+        return await call_next(request)
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    # ── Google ──
+
+    @app.post("/token")
+    async def oauth_token():
+        return {"access_token": "sim-access-token", "expires_in": 3599, "token_type": "Bearer"}
+
+    @app.post("/v20/customers/{customer_id}/googleAds:search")
+    async def gads_search(customer_id: str, request: Request):
+        body = await request.json()
+        rows = list(gaql_rows(data, base_url(request), customer_id, body.get("query", "")))
+        offset = int(body.get("pageToken") or 0)
+        size = cfg.google_page_size
+        page = {"results": rows[offset:offset + size], "fieldMask": ""}
+        if offset + size < len(rows):
+            page["nextPageToken"] = str(offset + size)
+        return page
+
+    @app.post("/v20/customers/{customer_id}/googleAds:searchStream")
+    async def gads_search_stream(customer_id: str, request: Request):
+        body = await request.json()
+        rows = gaql_rows(data, base_url(request), customer_id, body.get("query", ""))
+
+        def batches():
+            yield "["
+            first = True
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= cfg.google_page_size:
+                    yield ("" if first else ",") + json.dumps({"results": batch})
+                    first = False
+                    batch = []
+            if batch or first:
+                yield ("" if first else ",") + json.dumps({"results": batch})
+            yield "]"
+
+        return StreamingResponse(batches(), media_type="application/json")
+
+    @app.get("/images/{image_id}")
+    async def image(image_id: str):
+        payload = random.Random(image_id).randbytes(cfg.bytes_imagen)
+        return Response(content=b"\x89PNG\r\n\x1a\n" + payload, media_type="image/png")
+
+    # ── Meta ──
+
+    @app.post("/v21.0/")
+    async def meta_batch(request: Request):
+        form = await request.form()
+        out = []
+        for sub in json.loads(form.get("batch", "[]")):
+            split = urlsplit(sub.get("relative_url", ""))
+            code, body = graph.get(split.path, dict(parse_qsl(split.query)), f"{base_url(request)}/v21.0")
+            out.append({"code": code, "body": json.dumps(body)})
+        return out
+
+    @app.post("/v21.0/{account_id}/insights")
+    async def meta_report(account_id: str, request: Request):
+        form = await request.form()
+        code, body = graph.start_report(account_id, dict(form))
+        return JSONResponse(status_code=code, content=body)
+
+    @app.get("/v21.0/{path:path}")
+    async def meta_get(path: str, request: Request):
+        code, body = graph.get(path, dict(request.query_params), f"{base_url(request)}/v21.0")
+        return JSONResponse(status_code=code, content=body)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador local de Google Ads / Meta Graph")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cuentas", type=int, default=3)
+    parser.add_argument("--campanas", type=int, default=20, help="campañas por cuenta")
+    parser.add_argument("--anuncios", type=int, default=4, help="anuncios por campaña")
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="fracción de peticiones que responden 500")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    cfg = SimConfig(
+        cuentas=args.cuentas, campanas=args.campanas, anuncios=args.anuncios, dias=args.dias,
+        latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, tasa_error=args.tasa_error, seed=args.seed,
+    )
+    uvicorn.run(create_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Trabajos en segundo plano dentro del proceso de la API.
+
+Para operaciones largas que no deben bloquear la petición HTTP (p. ej. migrar
+datos al renombrar una categoría): el endpoint registra el trabajo con
+`jobs.submit(...)`, responde de inmediato con su id y el cliente consulta el
+avance. Los trabajos corren en un pool de hilos acotado y el registro guarda
+solo los más recientes (el servidor corre con un único proceso de uvicorn).
+"""
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+MAX_WORKERS = 2
+MAX_JOBS_GUARDADOS = 200
+
+PENDIENTE = "pendiente"
+EN_PROGRESO = "en_progreso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+@dataclass
+class Job:
+    id: str
+    tipo: str
+    clave: Optional[str] = None  # evita correr dos trabajos sobre el mismo recurso
+    estado: str = PENDIENTE
+    progreso: int = 0
+    paso: str = ""
+    resultado: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    creado: float = field(default_factory=time.time)
+    actualizado: float = field(default_factory=time.time)
+
+    def avance(self, paso: str, progreso: int):
+        self.paso = paso
+        self.progreso = max(0, min(100, progreso))
+        self.actualizado = time.time()
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (PENDIENTE, EN_PROGRESO)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "paso": self.paso,
+            "resultado": self.resultado,
+            "error": self.error,
+            "creado": self.creado,
+            "actualizado": self.actualizado,
+        }
+
+
+class JobRegistry:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_jobs: int = MAX_JOBS_GUARDADOS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._max_jobs = max_jobs
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, tipo: str, fn: Callable[[Job], dict], clave: Optional[str] = None) -> Job:
+        """
+        Registra y encola `fn(job)`. Lo que devuelva `fn` queda en job.resultado.
+        Lanza ValueError si ya hay un trabajo activo con la misma `clave`.
+        """
+        with self._lock:
+            if clave and any(j.clave == clave and j.activo for j in self._jobs.values()):
+                raise ValueError(f"Ya hay un trabajo en curso para {clave}")
+            job = Job(id=uuid.uuid4().hex, tipo=tipo, clave=clave)
+            self._jobs[job.id] = job
+            self._purge()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _purge(self):
+        # Descarta los trabajos terminados más viejos
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self._max_jobs:
+                break
+            if not self._jobs[job_id].activo:
+                del self._jobs[job_id]
+
+    def _run(self, job: Job, fn: Callable[[Job], dict]):
+        job.estado = EN_PROGRESO
+        job.actualizado = time.time()
+        try:
+            job.resultado = fn(job) or {}
+            job.estado = COMPLETADO
+            job.avance("Completado", 100)
+        except Exception as e:
+            traceback.print_exc()
+            job.estado = ERROR
+            job.error = str(e)
+            job.actualizado = time.time()
+
+
+jobs = JobRegistry()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los routers de Google Ads / Meta Ads contra el simulador local.
+
+Levanta ads_simulator.py en un hilo, apunta los routers a él mediante variables
+de entorno y usa una base SQLite temporal, así que no necesita credenciales ni
+toca la base real. Cada escenario llama a la función del router de punta a punta
+(HTTP al simulador + parseo + escritura en DB) y reporta throughput y percentiles.
+
+Uso:
+  python benchmark_ads.py --cuentas 5 --campanas 50 --dias 180 --iteraciones 20 --latencia-ms 25
+  python benchmark_ads.py --escenarios google_metricas,google_importar
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ESCENARIOS = (
+    "google_metricas",
+    "google_importar",
+    "google_anuncios",
+    "meta_metricas",
+    "meta_importar",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_simulator(cfg, port: int):
+    import uvicorn
+    from ads_simulator import create_app
+
+    server = uvicorn.Server(uvicorn.Config(create_app(cfg), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("El simulador no arrancó")
+        time.sleep(0.05)
+    return server
+
+
+def _configure_env(port: int, workdir: Path):
+    base = f"http://127.0.0.1:{port}"
+    os.environ.update({
+        "DB_TYPE": "sqlite",
+        "SQLITE_PATH": str(workdir / "bench.db"),
+        "AD_IMAGE_CACHE_DIR": str(workdir / "ad_images"),
+        "GOOGLE_ADS_API_HOST": base,
+        "GOOGLE_OAUTH_TOKEN_URL": f"{base}/token",
+        "META_GRAPH_API_HOST": base,
+        "GOOGLE_ADS_DEVELOPER_TOKEN": "sim-dev-token",
+        "GOOGLE_ADS_CLIENT_ID": "sim-client",
+        "GOOGLE_ADS_CLIENT_SECRET": "sim-secret",
+        "GOOGLE_ADS_REFRESH_TOKEN": "sim-refresh",
+        "META_ADS_ACCESS_TOKEN": "sim-meta-token",
+    })
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _run(nombre: str, fn, iteraciones: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    tiempos = []
+    errores = 0
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            errores += 1
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+    return {
+        "escenario": nombre,
+        "n": iteraciones,
+        "errores": errores,
+        "ops_s": iteraciones / total if total else 0.0,
+        "p50": _percentile(tiempos, 50),
+        "p90": _percentile(tiempos, 90),
+        "p99": _percentile(tiempos, 99),
+        "media": statistics.fmean(tiempos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de routers de Ads contra el simulador local")
+    parser.add_argument("--cuentas", type=int, default=3)
+    parser.add_argument("--campanas", type=int, default=20)
+    parser.add_argument("--anuncios", type=int, default=4)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tasa-error", type=float, default=0.0)
+    parser.add_argument("--iteraciones", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    args = parser.parse_args()
+
+    escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    from ads_simulator import SimConfig, SimData
+
+    sim_cfg = SimConfig(
+        cuentas=args.cuentas, campanas=args.campanas, anuncios=args.anuncios, dias=args.dias,
+        latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms, tasa_error=args.tasa_error,
+    )
+    port = _free_port()
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ads_"))
+    _configure_env(port, workdir)
+    server = _start_simulator(sim_cfg, port)
+
+    # Importar después de configurar el entorno: las URLs base se leen al importar
+    import models
+    from database import engine, SessionLocal
+    from system_settings import registry
+    from routers import google_ads, meta_ads
+
+    models.Base.metadata.create_all(bind=engine)
+    data = SimData(sim_cfg)
+    db = SessionLocal()
+    registry.set_json(db, "google_ads_customer_map", dict(zip(data.marcas(), data.google_customers)))
+    registry.set_json(db, "meta_ads_account_map", dict(zip(data.marcas(), data.meta_accounts)))
+
+    admin = {"id": 1, "role": "administrador", "username": "benchmark"}
+    primer_dia = sim_cfg.primer_dia
+    marca = data.marcas()[0]
+    campana_google = data.google_campaign_ids(data.google_customers[0])[0]
+    rango = dict(start_date=primer_dia.isoformat(), end_date=sim_cfg.ultimo_dia.isoformat())
+
+    funciones = {
+        "google_metricas": lambda: google_ads.get_period_metrics(
+            user=admin, db=db, year=primer_dia.year, month=primer_dia.month, **rango),
+        "google_importar": lambda: google_ads._importar_todas_las_marcas(db),
+        "google_anuncios": lambda: google_ads.list_campaign_ads(campana_google, user=admin, db=db, marca=marca),
+        "meta_metricas": lambda: meta_ads.get_period_metrics(
+            user=admin, db=db, year=primer_dia.year, month=primer_dia.month, **rango),
+        "meta_importar": lambda: meta_ads._importar_todas_las_marcas(db),
+    }
+
+    print(
+        f"Simulador: {args.cuentas} cuentas × {args.campanas} campañas × {args.dias} días, "
+        f"latencia {args.latencia_ms} ms (+{args.jitter_ms} jitter), errores {args.tasa_error:.0%}"
+    )
+    print(f"{'escenario':<18}{'n':>5}{'err':>5}{'ops/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'media':>10}")
+    try:
+        for nombre in escenarios:
+            r = _run(nombre, funciones[nombre], args.iteraciones, args.warmup)
+            print(
+                f"{r['escenario']:<18}{r['n']:>5}{r['errores']:>5}{r['ops_s']:>9.2f}"
+                f"{r['p50']:>10.1f}{r['p90']:>10.1f}{r['p99']:>10.1f}{r['media']:>10.1f}"
+            )
+    finally:
+        db.close()
+        server.should_exit = True
+    print(f"Peticiones atendidas por el simulador: {server.config.app.state.stats['requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark de los listados grandes servidos con fast_json.
+
+Llena una base SQLite temporal con datos sintéticos y, para cada listado, mide:
+  - endpoint: la función del router de punta a punta (consulta + JSON en bytes)
+  - rapido:   solo la serialización con fast_json.dumps
+  - validado: la serialización que hacía FastAPI antes (validar contra
+              response_model con serialize_response + JSONResponse)
+Las dos últimas parten del mismo payload, así que la diferencia es el costo de
+construir y validar los modelos Pydantic por fila.
+
+Uso:
+  python benchmark_listados.py --facturas 5000 --eventos 500 --iteraciones 10
+  python benchmark_listados.py --escenarios facturas,campanas
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from benchmark_ads import _percentile
+
+ESCENARIOS = ("facturas", "eventos", "presencia", "campanas")
+MARCAS = ("Toyota Chihuahua", "Kia Juárez", "Honda Delicias", "Mazda Parral", "GWM Cuauhtémoc")
+
+
+def _medir(fn, iteraciones: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    tiempos = []
+    for _ in range(iteraciones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50": _percentile(tiempos, 50),
+        "p90": _percentile(tiempos, 90),
+        "media": statistics.fmean(tiempos),
+    }
+
+
+def _sembrar(db, args):
+    from models import (Facturas, FacturaArchivos, FacturaCotizaciones, Eventos, BriefsEventos,
+                        ActividadesEventos, CronogramasEventos, PresenciaTradicional, Campanas)
+
+    rnd = random.Random(42)
+    inicio = date(2025, 1, 1)
+    ahora = datetime(2025, 6, 1, 12, 0, 0)
+
+    eventos = [
+        {"nombre": f"Evento {i}", "descripcion": "Exhibición de unidades " * 5, "tipo_evento": "Exhibición",
+         "fecha_inicio": inicio + timedelta(days=i % 365), "fecha_fin": inicio + timedelta(days=i % 365 + 2),
+         "ubicacion": "Plaza", "marca": rnd.choice(MARCAS), "responsable": "Coordinación",
+         "estado": "Confirmado", "objetivo": "Leads", "audiencia": "General", "presupuesto_estimado": 25000.0,
+         "presupuesto_real": 23000.0, "observaciones": "", "creado_por": "benchmark", "fecha_creacion": ahora}
+        for i in range(args.eventos)
+    ]
+    db.bulk_insert_mappings(Eventos, eventos)
+    briefs = [
+        {"evento_id": i + 1, "marca": eventos[i]["marca"], "objetivo_especifico": "Objetivo " * 20,
+         "audiencia_detallada": "Audiencia", "mensaje_clave": "Mensaje", "requerimientos": "Stand",
+         "proveedores": "Proveedor", "logistica": "Logística", "presupuesto_detallado": "{}",
+         "observaciones_especiales": json.dumps({"testimonios": ["Muy bien"] * 3, "imagenes": []}),
+         "creado_por": "benchmark", "fecha_creacion": ahora}
+        for i in range(args.eventos)
+    ]
+    db.bulk_insert_mappings(BriefsEventos, briefs)
+    db.bulk_insert_mappings(ActividadesEventos, [
+        {"brief_id": b + 1, "nombre": f"Actividad {o}", "descripcion": "Descripción", "duracion": "1h",
+         "responsable": "Staff", "recursos": "Stand", "orden": o}
+        for b in range(args.eventos) for o in range(4)
+    ])
+    db.bulk_insert_mappings(CronogramasEventos, [
+        {"brief_id": b + 1, "actividad": f"Paso {o}", "fecha_inicio": ahora, "fecha_fin": ahora,
+         "responsable": "Staff", "estado": "Pendiente", "orden": o}
+        for b in range(args.eventos) for o in range(3)
+    ])
+
+    db.bulk_insert_mappings(Campanas, [
+        {"nombre": f"Campaña {i}", "estado": "Activa", "plataforma": rnd.choice(("Google Ads", "Meta Ads")),
+         "leads": rnd.randint(0, 500), "alcance": rnd.randint(0, 50000), "interacciones": rnd.randint(0, 5000),
+         "ctr": rnd.random() * 5, "fecha_inicio": inicio + timedelta(days=i % 365), "presupuesto": 15000.0,
+         "gasto_actual": 9000.0, "conversion": 2.5, "cxc_porcentaje": 1.0, "marca": rnd.choice(MARCAS),
+         "creado_por": "benchmark", "fecha_creacion": ahora}
+        for i in range(args.campanas)
+    ])
+
+    facturas = []
+    for i in range(args.facturas):
+        subtotal = round(rnd.uniform(1000, 90000), 2)
+        facturas.append({
+            "numero_factura": f"A-{i:06d}", "proveedor": f"Proveedor {i % 150}", "subtotal": subtotal,
+            "iva": round(subtotal * 0.16, 2), "monto": round(subtotal * 1.16, 2),
+            "fecha_factura": inicio + timedelta(days=i % 365), "fecha_vencimiento": inicio + timedelta(days=i % 365 + 30),
+            "estado": rnd.choice(("Pendiente", "Autorizada", "Ingresada", "Pagada")), "marca": rnd.choice(MARCAS),
+            "categoria": "Relaciones Públicas", "subcategoria": "Eventos", "descripcion": "Servicio de evento",
+            "autorizada": rnd.random() < 0.5, "observaciones": "", "evento_id": rnd.randint(1, args.eventos) if args.eventos else None,
+            "campanya_id": rnd.randint(1, args.campanas) if args.campanas else None,
+            "creado_por": "benchmark", "user_id": 1, "fecha_creacion": ahora,
+        })
+    db.bulk_insert_mappings(Facturas, facturas)
+    db.bulk_insert_mappings(FacturaArchivos, [
+        {"factura_id": i + 1, "nombre_archivo": f"A-{i:06d}.{ext}", "tipo_archivo": ext.upper(),
+         "contenido_archivo": b"x" * 64, "tamaño_archivo": 64, "fecha_subida": ahora, "seccion": "general"}
+        for i in range(args.facturas) for ext in ("pdf", "xml")
+    ])
+    db.bulk_insert_mappings(FacturaCotizaciones, [
+        {"factura_id": i + 1, "proveedor": f"Proveedor {i % 150}", "monto": 1000.0, "nombre_archivo": "cot.pdf",
+         "contenido_archivo": b"x" * 64, "tamaño_archivo": 64, "fecha_subida": ahora, "observaciones": ""}
+        for i in range(0, args.facturas, 3)
+    ])
+
+    db.bulk_insert_mappings(PresenciaTradicional, [
+        {"tipo": "Espectacular", "nombre": f"Espectacular {i}", "marca": rnd.choice(MARCAS), "ciudad": "Chihuahua",
+         "fecha_instalacion": inicio + timedelta(days=i % 365), "costo_mensual": 12000.0,
+         "imagenes_json": "[]", "datos_extra_json": json.dumps({"fieldValues": {"f1": "valor", "f2": "2025-01-01"}}),
+         "creado_por": "benchmark", "fecha_creacion": ahora}
+        for i in range(args.presencia)
+    ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de listados con fast_json vs response_model")
+    parser.add_argument("--facturas", type=int, default=5000)
+    parser.add_argument("--eventos", type=int, default=500)
+    parser.add_argument("--presencia", type=int, default=1000)
+    parser.add_argument("--campanas", type=int, default=1000)
+    parser.add_argument("--iteraciones", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    args = parser.parse_args()
+
+    escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_listados_"))
+    os.environ.update({"DB_TYPE": "sqlite", "SQLITE_PATH": str(workdir / "bench.db")})
+    sys.path.insert(0, str(Path(__file__).parent))
+
+    # Importar después de configurar el entorno: database lee DB_TYPE al importar
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    import fast_json
+    import models
+    from database import engine, SessionLocal
+    from routers import facturas, eventos, presencia_tradicional, campanas
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    _sembrar(db, args)
+
+    admin = {"id": 1, "role": "administrador", "username": "benchmark"}
+    endpoints = {
+        "facturas": (facturas.router, facturas.read_all_facturas, dict(
+            marca=None, estado=None, categoria=None, autorizada=None, anio=None, limit=None, offset=0)),
+        "eventos": (eventos.router, eventos.read_all_eventos_with_briefs, dict(
+            marca=None, estado=None, fecha_desde=None, fecha_hasta=None, include_images=False)),
+        "presencia": (presencia_tradicional.router, presencia_tradicional.read_all_presencia, dict(
+            marca=None, agencia=None, tipo=None, limit=None, offset=0)),
+        "campanas": (campanas.router, campanas.read_all_campanas, dict(
+            marca=None, estado=None, plataforma=None)),
+    }
+
+    def response_field(router, endpoint):
+        for route in router.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                return route.response_field
+        return None
+
+    def validado(field, payload):
+        # Lo que hace FastAPI con el valor devuelto cuando hay response_model
+        if field is None:
+            return JSONResponse(payload).body
+        contenido = asyncio.run(serialize_response(field=field, response_content=payload, is_coroutine=True))
+        return JSONResponse(contenido).body
+
+    print(f"orjson: {'sí' if fast_json.orjson is not None else 'no (json estándar)'}")
+    print(f"{'listado':<11}{'filas':>7}{'KB':>9}{'endpoint':>10}{'rapido':>10}{'validado':>10}{'x':>7}")
+    try:
+        for nombre in escenarios:
+            router, endpoint, kwargs = endpoints[nombre]
+            llamada = lambda: asyncio.run(endpoint(user=admin, db=db, **kwargs))
+            cuerpo = llamada().body
+            payload = json.loads(cuerpo)
+            field = response_field(router, endpoint)
+
+            t_endpoint = _medir(llamada, args.iteraciones, args.warmup)
+            t_rapido = _medir(lambda: fast_json.dumps(payload), args.iteraciones, args.warmup)
+            t_validado = _medir(lambda: validado(field, payload), args.iteraciones, args.warmup)
+            print(
+                f"{nombre:<11}{len(payload):>7}{len(cuerpo) / 1024:>9.0f}{t_endpoint['p50']:>10.1f}"
+                f"{t_rapido['p50']:>10.1f}{t_validado['p50']:>10.1f}"
+                f"{t_validado['p50'] / max(t_rapido['p50'], 1e-6):>7.1f}"
+            )
+    finally:
+        db.close()
+    print("Tiempos en ms (p50). x = validado / rapido.")
+
+
+if __name__ == "__main__":
+    main()
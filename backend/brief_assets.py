@@ -0,0 +1,168 @@
+"""
+Almacén de imágenes de los briefs (reportes) de eventos.
+
+El formulario de reporte manda las imágenes de testimonio como data URLs base64
+dentro de observaciones_especiales. Al guardar el brief, `externalizar_imagenes`
+las mueve a la tabla brief_imagenes (original + miniatura) y en el JSON deja
+solo la referencia `imagen_id` con `url` vacía, así que listar briefs ya no
+arrastra blobs de varios MB. Las imágenes se piden aparte y bajo demanda.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from typing import Optional
+
+from sqlalchemy.orm import Session, load_only
+
+from ad_image_cache import downscale
+from models import BriefImagenes
+
+MINIATURA_ANCHO = 320
+ORIGINAL = "original"
+MINIATURA = "miniatura"
+VARIANTES = (ORIGINAL, MINIATURA)
+
+# El contenido de una imagen nunca cambia para un mismo id
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _decode_data_url(url) -> Optional[tuple[bytes, str]]:
+    """(bytes, content_type) de una data URL base64; None si no es una data URL válida."""
+    if not isinstance(url, str) or not url.startswith("data:"):
+        return None
+    header, sep, payload = url.partition(",")
+    if not sep or ";base64" not in header:
+        return None
+    content_type = header[5:].split(";")[0] or "image/jpeg"
+    try:
+        return base64.b64decode(payload), content_type
+    except (binascii.Error, ValueError):
+        return None
+
+
+def data_url(content: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(content).decode('ascii')}"
+
+
+def etag(imagen: BriefImagenes, variante: str) -> str:
+    return f'"{imagen.sha256[:32]}-{variante}"'
+
+
+def contenido_variante(imagen: BriefImagenes, variante: str) -> tuple[bytes, str]:
+    """Bytes y content type de la variante pedida (la miniatura cae al original si no existe)."""
+    if variante == MINIATURA and imagen.miniatura:
+        return imagen.miniatura, imagen.miniatura_content_type or imagen.content_type
+    return imagen.contenido, imagen.content_type
+
+
+def _parse_imagenes(observaciones: Optional[str]) -> tuple[Optional[dict], list]:
+    if not observaciones:
+        return None, []
+    try:
+        data = json.loads(observaciones)
+    except (json.JSONDecodeError, TypeError):
+        return None, []
+    if not isinstance(data, dict) or not isinstance(data.get("imagenes"), list):
+        return data if isinstance(data, dict) else None, []
+    return data, [img for img in data["imagenes"] if isinstance(img, dict)]
+
+
+def externalizar_imagenes(db: Session, brief_id: int, observaciones: Optional[str],
+                          subido_por: Optional[str] = None) -> Optional[str]:
+    """
+    Guarda en brief_imagenes las imágenes inline de `observaciones` y devuelve el
+    JSON con solo referencias. Las imágenes que ya existen para el brief (mismo
+    hash) se reutilizan y las que dejaron de referenciarse se borran; si el JSON
+    no trae la lista "imagenes" (un cliente que solo edita otros campos) no se
+    borra ninguna. No hace commit.
+    """
+    data, imagenes = _parse_imagenes(observaciones)
+    if data is None:
+        return observaciones
+
+    existentes = {
+        imagen_id: sha
+        for imagen_id, sha in db.query(BriefImagenes.id, BriefImagenes.sha256)
+        .filter(BriefImagenes.brief_id == brief_id).all()
+    }
+    por_hash = {sha: imagen_id for imagen_id, sha in existentes.items()}
+    referenciadas = set()
+    cambios = False
+
+    for img in imagenes:
+        decoded = _decode_data_url(img.get("url"))
+        if decoded is None:
+            if img.get("imagen_id") in existentes:
+                referenciadas.add(img["imagen_id"])
+            continue
+        content, content_type = decoded
+        sha = hashlib.sha256(content).hexdigest()
+        imagen_id = por_hash.get(sha)
+        if imagen_id is None:
+            miniatura = downscale(content, MINIATURA_ANCHO)
+            row = BriefImagenes(
+                brief_id=brief_id,
+                nombre=img.get("nombre"),
+                content_type=content_type,
+                contenido=content,
+                miniatura=miniatura[0] if miniatura else None,
+                miniatura_content_type=miniatura[1] if miniatura else None,
+                tamaño=len(content),
+                sha256=sha,
+                subido_por=subido_por,
+            )
+            db.add(row)
+            db.flush()
+            imagen_id = row.id
+            por_hash[sha] = imagen_id
+            existentes[imagen_id] = sha
+        img["imagen_id"] = imagen_id
+        img["url"] = ""
+        # metadatos que agrega listar_imagenes; viven en brief_imagenes
+        img.pop("content_type", None)
+        img.pop("tamaño", None)
+        referenciadas.add(imagen_id)
+        cambios = True
+
+    huerfanas = set(existentes) - referenciadas if isinstance(data.get("imagenes"), list) else set()
+    if huerfanas:
+        db.query(BriefImagenes).filter(BriefImagenes.id.in_(huerfanas)).delete(synchronize_session=False)
+
+    return json.dumps(data, ensure_ascii=False) if cambios else observaciones
+
+
+def listar_imagenes(db: Session, brief_id: int, observaciones: Optional[str], variante: str) -> list[dict]:
+    """
+    Imágenes del brief en el orden del JSON, con `url` como data URL de la variante
+    pedida. Las imágenes legacy que siguen inline se devuelven tal cual.
+    """
+    _, imagenes = _parse_imagenes(observaciones)
+    ids = [img["imagen_id"] for img in imagenes if img.get("imagen_id") and not img.get("url")]
+    columnas = [BriefImagenes.id, BriefImagenes.content_type, BriefImagenes.tamaño, BriefImagenes.sha256]
+    if variante == MINIATURA:
+        columnas += [BriefImagenes.miniatura, BriefImagenes.miniatura_content_type]
+    else:
+        columnas.append(BriefImagenes.contenido)
+    rows = {
+        row.id: row
+        for row in db.query(BriefImagenes).options(load_only(*columnas))
+        .filter(BriefImagenes.brief_id == brief_id, BriefImagenes.id.in_(ids)).all()
+    } if ids else {}
+
+    resultado = []
+    for img in imagenes:
+        row = rows.get(img.get("imagen_id"))
+        if row is None:
+            if img.get("url"):
+                resultado.append(img)
+            continue
+        # contenido se carga perezosamente solo si falta la miniatura
+        content, content_type = contenido_variante(row, variante)
+        resultado.append({
+            **img,
+            "url": data_url(content, content_type),
+            "content_type": content_type,
+            "tamaño": row.tamaño,
+        })
+    return resultado
@@ -0,0 +1,225 @@
+"""
+Búsqueda de facturas por texto (folio, proveedor, descripción, OC, observaciones).
+
+PostgreSQL: índice GIN sobre un tsvector calculado (expresión, sin columna
+extra) más índices de trigramas (pg_trgm) en proveedor y numero_factura para
+tolerar errores de dedo y folios parciales. SQLite (desarrollo): tabla virtual
+FTS5 con contenido externo sobre facturas, sincronizada con triggers.
+Sin pg_trgm, PostgreSQL usa solo el tsvector más ILIKE sobre folio y
+proveedor; si no hay ningún índice se cae a LIKE, correcto pero sin índice.
+
+Los índices se crean con migrations/create_busqueda_facturas.py (CONCURRENTLY
+en PostgreSQL, para no bloquear facturas); el arranque solo avisa si faltan.
+
+Los resultados van ordenados por relevancia y se paginan con cursor
+(keyset sobre (score, id)), así que pedir la página siguiente no re-escanea
+las anteriores.
+"""
+import base64
+import binascii
+import json
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from sugerencias_proveedores import tiene_pg_trgm
+
+CAMPOS = ("numero_factura", "proveedor", "descripcion", "orden_compra", "observaciones")
+
+# Misma expresión en el índice y en la consulta: el planner solo usa el índice
+# si coinciden. Folio, proveedor y OC pesan más que el texto libre.
+_TSVECTOR = (
+    "setweight(to_tsvector('spanish', coalesce(numero_factura, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(proveedor, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(orden_compra, '')), 'B') || "
+    "setweight(to_tsvector('spanish', coalesce(descripcion, '')), 'C') || "
+    "setweight(to_tsvector('spanish', coalesce(observaciones, '')), 'D')"
+)
+
+# (nombre, DDL); la migración agrega CONCURRENTLY a los CREATE INDEX
+DDL_POSTGRES = [
+    ("ix_facturas_busqueda",
+     f"CREATE INDEX IF NOT EXISTS ix_facturas_busqueda ON facturas USING gin (({_TSVECTOR}))"),
+    ("pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    ("ix_facturas_proveedor_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_facturas_proveedor_trgm ON facturas USING gin (proveedor gin_trgm_ops)"),
+    ("ix_facturas_numero_factura_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_facturas_numero_factura_trgm ON facturas USING gin (numero_factura gin_trgm_ops)"),
+]
+
+_COLUMNAS_FTS = ", ".join(CAMPOS)
+_NUEVOS_FTS = ", ".join(f"new.{c}" for c in CAMPOS)
+_VIEJOS_FTS = ", ".join(f"old.{c}" for c in CAMPOS)
+_DDL_SQLITE = [
+    f"CREATE VIRTUAL TABLE facturas_fts USING fts5({_COLUMNAS_FTS}, content='facturas', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS facturas_fts_ai AFTER INSERT ON facturas BEGIN "
+    f"INSERT INTO facturas_fts(rowid, {_COLUMNAS_FTS}) VALUES (new.id, {_NUEVOS_FTS}); END",
+    f"CREATE TRIGGER IF NOT EXISTS facturas_fts_ad AFTER DELETE ON facturas BEGIN "
+    f"INSERT INTO facturas_fts(facturas_fts, rowid, {_COLUMNAS_FTS}) VALUES ('delete', old.id, {_VIEJOS_FTS}); END",
+    f"CREATE TRIGGER IF NOT EXISTS facturas_fts_au AFTER UPDATE ON facturas BEGIN "
+    f"INSERT INTO facturas_fts(facturas_fts, rowid, {_COLUMNAS_FTS}) VALUES ('delete', old.id, {_VIEJOS_FTS}); "
+    f"INSERT INTO facturas_fts(rowid, {_COLUMNAS_FTS}) VALUES (new.id, {_NUEVOS_FTS}); END",
+    "INSERT INTO facturas_fts(facturas_fts) VALUES ('rebuild')",
+]
+
+_SELECT = (
+    "f.id, f.numero_factura, f.proveedor, f.monto, f.fecha_factura, f.estado, f.marca, "
+    "f.categoria, f.descripcion, f.orden_compra"
+)
+
+
+def _fts_sqlite_existe(conn) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'facturas_fts'"
+    )).first() is not None
+
+
+def indices_faltantes(engine) -> list[str]:
+    """Índices de búsqueda que todavía no existen (solo consulta el catálogo)."""
+    if engine.dialect.name == "postgresql":
+        from migrations.crear_indices_modelos import indices_validos
+        nombres = [nombre for nombre, ddl in DDL_POSTGRES if ddl.startswith("CREATE INDEX")]
+        existentes = indices_validos(engine, nombres)
+        return [nombre for nombre in nombres if nombre not in existentes]
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            return [] if _fts_sqlite_existe(conn) else ["facturas_fts"]
+    return []
+
+
+def crear_fts_sqlite(engine) -> list[str]:
+    """Tabla FTS5 y sus triggers en SQLite (si faltan). Devuelve los pasos que fallaron."""
+    with engine.connect() as conn:
+        if _fts_sqlite_existe(conn):
+            return []
+    try:
+        with engine.begin() as conn:
+            for ddl in _DDL_SQLITE:
+                conn.execute(text(ddl))
+    except DBAPIError as e:
+        return [f"FTS5: {e.orig}"]
+    return []
+
+
+def codificar_cursor(score: float, factura_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, factura_id]).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[float, int]:
+    """(score, id) del cursor; ValueError si no es válido."""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        score, factura_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return float(score), int(factura_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Cursor inválido")
+
+
+def _terminos(q: str) -> list[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def _filtros(params: dict, user_id: Optional[int], marca: Optional[str], estado: Optional[str]) -> str:
+    clausulas = []
+    if user_id is not None:
+        clausulas.append("f.user_id = :user_id")
+        params["user_id"] = user_id
+    if marca:
+        clausulas.append("f.marca = :marca")
+        params["marca"] = marca
+    if estado:
+        clausulas.append("f.estado = :estado")
+        params["estado"] = estado
+    return "".join(f" AND {c}" for c in clausulas)
+
+
+def _patron(q: str) -> str:
+    """`%q%` para LIKE/ILIKE con los comodines de q escapados (se usa con ESCAPE '\\')."""
+    return "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+
+
+def _sql_postgres(params: dict, q: str, filtros: str, trigramas: bool) -> str:
+    params["q"] = q
+    params["patron"] = _patron(q)
+    if not trigramas:
+        # Sin pg_trgm: tsvector para palabras y ILIKE para fragmentos de folio/proveedor
+        return (
+            f"SELECT {_SELECT}, ts_rank({_TSVECTOR}, websearch_to_tsquery('spanish', :q))::float8 AS score "
+            "FROM facturas f "
+            f"WHERE (({_TSVECTOR}) @@ websearch_to_tsquery('spanish', :q) "
+            "OR f.numero_factura ILIKE :patron ESCAPE '\\' OR f.proveedor ILIKE :patron ESCAPE '\\')"
+            f"{filtros}"
+        )
+    return (
+        f"SELECT {_SELECT}, (ts_rank({_TSVECTOR}, websearch_to_tsquery('spanish', :q)) "
+        "+ greatest(similarity(f.proveedor, :q), similarity(f.numero_factura, :q)))::float8 AS score "
+        "FROM facturas f "
+        f"WHERE (({_TSVECTOR}) @@ websearch_to_tsquery('spanish', :q) "
+        "OR f.proveedor % :q OR f.numero_factura % :q OR f.numero_factura ILIKE :patron ESCAPE '\\')"
+        f"{filtros}"
+    )
+
+
+def _sql_sqlite(params: dict, q: str, filtros: str) -> Optional[str]:
+    terminos = _terminos(q)
+    if not terminos:
+        return None
+    # Cada término como prefijo entre comillas: sin operadores FTS5 del usuario
+    params["match"] = " ".join(f'"{t}"*' for t in terminos)
+    return (
+        f"SELECT {_SELECT}, -bm25(facturas_fts, 10.0, 10.0, 2.0, 5.0, 1.0) AS score "
+        "FROM facturas_fts JOIN facturas f ON f.id = facturas_fts.rowid "
+        f"WHERE facturas_fts MATCH :match{filtros}"
+    )
+
+
+def _sql_ilike(params: dict, q: str, filtros: str) -> str:
+    params["patron"] = _patron(q)
+    coincide = " OR ".join(f"f.{c} LIKE :patron ESCAPE '\\'" for c in CAMPOS)
+    return f"SELECT {_SELECT}, 0.0 AS score FROM facturas f WHERE ({coincide}){filtros}"
+
+
+def _fts_sqlite_disponible(db: Session) -> bool:
+    return _fts_sqlite_existe(db)
+
+
+def buscar(db: Session, q: str, limite: int = 20, cursor: Optional[str] = None,
+           user_id: Optional[int] = None, marca: Optional[str] = None,
+           estado: Optional[str] = None) -> dict:
+    """
+    Facturas que coinciden con `q`, de mayor a menor relevancia. `user_id`
+    restringe a las facturas de ese usuario (None = todas). Devuelve
+    {"resultados": [...], "siguiente": cursor o None}. ValueError si el cursor no es válido.
+    """
+    params: dict = {}
+    filtros = _filtros(params, user_id, marca, estado)
+    dialecto = db.bind.dialect.name
+    if dialecto == "postgresql":
+        sql = _sql_postgres(params, q, filtros, tiene_pg_trgm(db))
+    elif dialecto == "sqlite" and _fts_sqlite_disponible(db):
+        sql = _sql_sqlite(params, q, filtros)
+        if sql is None:
+            return {"resultados": [], "siguiente": None}
+    else:
+        sql = _sql_ilike(params, q, filtros)
+
+    where_cursor = ""
+    if cursor:
+        params["cursor_score"], params["cursor_id"] = decodificar_cursor(cursor)
+        where_cursor = "WHERE score < :cursor_score OR (score = :cursor_score AND id < :cursor_id) "
+    # Se pide una fila de más para saber si hay página siguiente
+    params["limite"] = limite + 1
+    filas = db.execute(text(
+        f"SELECT * FROM ({sql}) AS busqueda {where_cursor}ORDER BY score DESC, id DESC LIMIT :limite"
+    ), params).mappings().all()
+
+    resultados = [dict(fila) for fila in filas[:limite]]
+    siguiente = None
+    if len(filas) > limite:
+        ultimo = resultados[-1]
+        siguiente = codificar_cursor(ultimo["score"], ultimo["id"])
+    return {"resultados": resultados, "siguiente": siguiente}
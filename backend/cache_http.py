@@ -0,0 +1,157 @@
+"""
+GET condicional (ETag / If-None-Match) para los listados que los tableros
+vuelven a pedir en cada navegación.
+
+El ETag se arma antes de llamar al endpoint con lo que ya está en memoria:
+las versiones de las tablas que lee el listado (versiones_tablas), la ruta,
+los parámetros de consulta y el alcance del usuario (id y rol del token).
+Si coincide con If-None-Match se responde 304 sin tocar la base; si no, el
+endpoint corre normal y la respuesta 200 sale con el ETag.
+
+Cache-Control "private, no-cache" deja que el navegador guarde la respuesta
+pero la revalide siempre, así que un cambio se ve en la siguiente petición.
+
+El mismo middleware comprime las respuestas (ver compresion). Las respuestas
+comprimidas de rutas con ETag se guardan por (ETag, codificación): como el
+ETag ya identifica el contenido, otra petición con el mismo ETag (p. ej. un
+navegador sin la respuesta en caché) recibe los bytes ya comprimidos sin
+correr el endpoint ni volver a comprimir.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from fastapi import Request
+from jose import JWTError, jwt
+from starlette.responses import Response
+
+import compresion
+from routers.auth import ALGORITHM, SECRET_KEY
+from versiones_tablas import registro
+
+# Ruta del listado -> tablas de las que sale su respuesta
+RUTAS: dict[str, tuple[str, ...]] = {
+    "/marcas/": ("marcas",),
+    "/categorias/": ("categorias",),
+    "/presupuesto/": ("presupuesto_mensual", "marcas"),
+    "/proyecciones/": ("proyecciones", "proyeccion_partidas"),
+    "/facturas/": ("facturas", "factura_archivos", "factura_cotizaciones", "eventos", "campanyas"),
+    "/eventos/with-briefs": ("eventos", "briefs_eventos", "actividades_eventos", "cronogramas_eventos",
+                             "brief_imagenes", "users"),
+    "/presencia-tradicional/": ("presencia_tradicional",),
+    "/campanas/": ("campanyas",),
+}
+
+CACHE_CONTROL = "private, no-cache"
+MAX_BYTES_CACHE = 64 * 1024 * 1024
+
+
+def _alcance(request: Request) -> Optional[tuple]:
+    """(id, rol) del token; None si no hay token válido (el endpoint responderá 401)."""
+    auth = request.headers.get("authorization", "")
+    if not auth.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(auth[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("id") is None:
+        return None
+    return payload.get("id"), payload.get("role")
+
+
+def calcular_etag(request: Request) -> Optional[str]:
+    """ETag débil de la petición, o None si la ruta no es condicional o no hay usuario."""
+    if request.method != "GET":
+        return None
+    tablas = RUTAS.get(request.url.path)
+    if tablas is None:
+        return None
+    alcance = _alcance(request)
+    if alcance is None:
+        return None
+    partes = (
+        registro.epoca,
+        registro.versiones(tablas),
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        alcance,
+    )
+    return f'W/"{hashlib.sha1(repr(partes).encode()).hexdigest()[:20]}"'
+
+
+def coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: W/"x" y "x" son equivalentes
+    sin_w = etag.removeprefix("W/")
+    return any(valor.strip().removeprefix("W/") == sin_w for valor in if_none_match.split(","))
+
+
+class _Comprimida(NamedTuple):
+    status_code: int
+    raw_headers: list
+    cuerpo: bytes
+
+
+class CacheComprimidas:
+    """Respuestas ya comprimidas por (ETag, codificación), LRU acotado por bytes."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES_CACHE):
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._datos: "OrderedDict[tuple[str, str], _Comprimida]" = OrderedDict()
+
+    def obtener(self, etag: str, codificacion: str) -> Optional[Response]:
+        with self._lock:
+            entrada = self._datos.get((etag, codificacion))
+            if entrada is None:
+                return None
+            self._datos.move_to_end((etag, codificacion))
+        response = Response(content=entrada.cuerpo, status_code=entrada.status_code)
+        response.raw_headers = list(entrada.raw_headers)
+        return response
+
+    def guardar(self, etag: str, codificacion: str, response: Response):
+        entrada = _Comprimida(response.status_code, list(response.raw_headers), response.body)
+        if len(entrada.cuerpo) > self._max_bytes // 4:
+            return
+        with self._lock:
+            anterior = self._datos.pop((etag, codificacion), None)
+            if anterior is not None:
+                self._bytes -= len(anterior.cuerpo)
+            self._datos[(etag, codificacion)] = entrada
+            self._bytes += len(entrada.cuerpo)
+            while self._bytes > self._max_bytes:
+                _, descartada = self._datos.popitem(last=False)
+                self._bytes -= len(descartada.cuerpo)
+
+
+comprimidas = CacheComprimidas()
+
+
+async def middleware(request: Request, call_next):
+    codificacion = compresion.elegir_codificacion(request.headers.get("accept-encoding"))
+    etag = calcular_etag(request)
+
+    if etag is not None:
+        if coincide(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        if codificacion is not None:
+            guardada = comprimidas.obtener(etag, codificacion)
+            if guardada is not None:
+                return guardada
+
+    response = await call_next(request)
+    if etag is not None and response.status_code == 200:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+
+    response, comprimida = await compresion.comprimir_respuesta(response, codificacion)
+    if comprimida and etag is not None and response.status_code == 200:
+        comprimidas.guardar(etag, codificacion, response)
+    return response
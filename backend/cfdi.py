@@ -0,0 +1,141 @@
+"""
+Lectura de CFDI (XML de facturas del SAT, versiones 3.2, 3.3 y 4.0).
+
+`parse_cfdi` recorre el XML con iterparse (liberando cada nodo al terminar) y
+devuelve solo los datos que usa una factura: emisor, folio, fecha, importes,
+uso CFDI, conceptos y UUID del timbre. No lanza excepciones: los errores van
+en la llave "error" para que se pueda usar tal cual dentro de un pool de
+procesos. `parse_lote` reparte un lote de XMLs en el pool (o en el mismo
+proceso si el lote es chico o el pool no está disponible).
+"""
+import asyncio
+import io
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from typing import Optional
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+# Debajo de esto no vale la pena pagar el envío a otro proceso
+MIN_PARA_POOL = 8
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _attr(elem, nombre: str) -> Optional[str]:
+    """Atributo sin importar mayúsculas (CFDI 3.2 usa minúsculas: folio, subTotal)."""
+    valor = elem.get(nombre)
+    if valor is None:
+        valor = elem.get(nombre[0].lower() + nombre[1:])
+    return valor.strip() if isinstance(valor, str) and valor.strip() else None
+
+
+def _float(valor: Optional[str]) -> Optional[float]:
+    try:
+        return round(float(valor), 2) if valor is not None else None
+    except ValueError:
+        return None
+
+
+def _fecha(valor: Optional[str]) -> Optional[date]:
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor[:19]).date()
+    except ValueError:
+        return None
+
+
+def parse_cfdi(contenido: bytes) -> dict:
+    """Datos de la factura contenidos en un CFDI; {"error": ...} si no es un CFDI válido."""
+    datos: dict = {"conceptos": []}
+    pila: list[str] = []
+    iva_trasladado = None
+    try:
+        for evento, elem in ET.iterparse(io.BytesIO(contenido), events=("start", "end")):
+            nombre = _local(elem.tag)
+            if evento == "start":
+                padre = pila[-1] if pila else None
+                pila.append(nombre)
+                if nombre == "Comprobante" and padre is None:
+                    datos.update(
+                        version=_attr(elem, "Version"),
+                        serie=_attr(elem, "Serie"),
+                        folio=_attr(elem, "Folio"),
+                        fecha=_fecha(_attr(elem, "Fecha")),
+                        subtotal=_float(_attr(elem, "SubTotal")),
+                        total=_float(_attr(elem, "Total")),
+                        metodo_pago=_attr(elem, "MetodoPago"),
+                        moneda=_attr(elem, "Moneda"),
+                        tipo_comprobante=_attr(elem, "TipoDeComprobante"),
+                    )
+                elif nombre == "Emisor" and padre == "Comprobante":
+                    datos["rfc_emisor"] = (_attr(elem, "Rfc") or "").upper() or None
+                    datos["nombre_emisor"] = _attr(elem, "Nombre")
+                elif nombre == "Receptor" and padre == "Comprobante":
+                    datos["rfc_receptor"] = (_attr(elem, "Rfc") or "").upper() or None
+                    datos["uso_cfdi"] = _attr(elem, "UsoCFDI")
+                elif nombre == "Concepto" and padre == "Conceptos":
+                    datos["conceptos"].append({
+                        "descripcion": _attr(elem, "Descripcion"),
+                        "cantidad": _float(_attr(elem, "Cantidad")),
+                        "importe": _float(_attr(elem, "Importe")),
+                    })
+                elif nombre == "Impuestos" and padre == "Comprobante":
+                    iva_trasladado = _float(_attr(elem, "TotalImpuestosTrasladados"))
+                elif nombre == "TimbreFiscalDigital":
+                    datos["uuid"] = (_attr(elem, "UUID") or "").upper() or None
+            else:
+                pila.pop()
+                elem.clear()
+    except ET.ParseError as e:
+        return {"error": f"XML inválido: {e}"}
+
+    if "total" not in datos:
+        return {"error": "No es un CFDI (falta el nodo Comprobante)"}
+    if not datos.get("rfc_emisor"):
+        return {"error": "El CFDI no trae RFC del emisor"}
+    if datos["total"] is None or datos.get("fecha") is None:
+        return {"error": "El CFDI no trae Total o Fecha válidos"}
+    subtotal = datos.get("subtotal") or 0.0
+    datos["iva"] = iva_trasladado if iva_trasladado is not None else round(max(datos["total"] - subtotal, 0.0), 2)
+    return datos
+
+
+def numero_factura(datos: dict) -> Optional[str]:
+    """Número de factura como se captura a mano ("A-100" con serie, "100" sin ella); el UUID si no hay folio."""
+    folio = datos.get("folio")
+    if not folio:
+        return datos.get("uuid")
+    serie = datos.get("serie")
+    return f"{serie}-{folio}" if serie else folio
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return _pool
+
+
+async def parse_lote(contenidos: list[bytes]) -> list[dict]:
+    """parse_cfdi de cada contenido, en el mismo orden, usando el pool de procesos."""
+    if len(contenidos) < MIN_PARA_POOL or MAX_WORKERS < 2:
+        return [parse_cfdi(c) for c in contenidos]
+    global _pool
+    loop = asyncio.get_running_loop()
+    chunksize = max(1, len(contenidos) // (MAX_WORKERS * 4))
+    try:
+        pool = _get_pool()
+        # pool.map bloquea mientras junta resultados: se espera en un hilo, no en el event loop
+        return await loop.run_in_executor(None, lambda: list(pool.map(parse_cfdi, contenidos, chunksize=chunksize)))
+    except (BrokenProcessPool, OSError):
+        # El pool murió o no se pudo crear: se descarta y se parsea aquí
+        _pool = None
+        return [parse_cfdi(c) for c in contenidos]
@@ -0,0 +1,130 @@
+"""
+Compresión de respuestas (zstd, brotli, gzip) para los listados JSON grandes.
+
+Se elige la codificación con Accept-Encoding en orden de preferencia
+PREFERENCIA (zstd solo si el cliente la anuncia, como todas). Se comprimen
+solo respuestas con Content-Length de al menos MIN_BYTES y un tipo de
+COMPRIMIBLES; las descargas en streaming (CSV, XLSX, ZIP) no traen
+Content-Length y pasan intactas. Los cuerpos de OFFLOAD_BYTES o más se
+comprimen en un pool de hilos para no bloquear el event loop (zlib, brotli y
+zstandard liberan el GIL mientras comprimen).
+
+brotli y zstandard son opcionales: sin ellos solo se ofrece gzip.
+"""
+import asyncio
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+MIN_BYTES = 1024
+OFFLOAD_BYTES = 64 * 1024
+COMPRIMIBLES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+# Niveles pensados para contenido dinámico: buena reducción en JSON sin costar más que enviarlo
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+NIVEL_ZSTD = 3
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="compresion")
+
+
+def _gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=NIVEL_BROTLI, mode=brotli.MODE_TEXT)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=NIVEL_ZSTD).compress(data)
+
+
+COMPRESORES = {"gzip": _gzip}
+if brotli is not None:
+    COMPRESORES["br"] = _brotli
+if zstandard is not None:
+    COMPRESORES["zstd"] = _zstd
+
+PREFERENCIA = [c for c in ("zstd", "br", "gzip") if c in COMPRESORES]
+
+
+def elegir_codificacion(accept_encoding: Optional[str]) -> Optional[str]:
+    """La codificación preferida que el cliente acepta (q > 0), o None."""
+    if not accept_encoding:
+        return None
+    aceptadas = {}
+    for parte in accept_encoding.lower().split(","):
+        nombre, _, params = parte.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip()] = q
+    for codificacion in PREFERENCIA:
+        if aceptadas.get(codificacion, aceptadas.get("*", 0.0)) > 0:
+            return codificacion
+    return None
+
+
+def comprimible(response: Response) -> bool:
+    if response.status_code in (204, 304) or "content-encoding" in response.headers:
+        return False
+    tamaño = response.headers.get("content-length")
+    if tamaño is None or int(tamaño) < MIN_BYTES:
+        return False
+    tipo = response.headers.get("content-type", "")
+    return tipo.startswith(COMPRIMIBLES)
+
+
+async def comprimir(data: bytes, codificacion: str) -> bytes:
+    compresor = COMPRESORES[codificacion]
+    if len(data) < OFFLOAD_BYTES:
+        return compresor(data)
+    return await asyncio.get_running_loop().run_in_executor(_executor, compresor, data)
+
+
+def agregar_vary(raw_headers: list) -> list:
+    """Encabezados con `Vary: Accept-Encoding` (sin duplicarlo)."""
+    for nombre, valor in raw_headers:
+        if nombre == b"vary" and b"accept-encoding" in valor.lower():
+            return raw_headers
+    return raw_headers + [(b"vary", b"Accept-Encoding")]
+
+
+async def comprimir_respuesta(response: Response, codificacion: Optional[str]) -> tuple[Response, bool]:
+    """
+    (respuesta, comprimida). Lee el cuerpo y arma una respuesta nueva con
+    Content-Encoding si aplica; si no, devuelve la original intacta.
+    """
+    if not comprimible(response):
+        return response, False
+    if codificacion is None:
+        response.raw_headers = agregar_vary(list(response.raw_headers))
+        return response, False
+
+    cuerpo = b"".join([chunk async for chunk in response.body_iterator])
+    comprimido = await comprimir(cuerpo, codificacion)
+    nueva = Response(content=comprimido, status_code=response.status_code)
+    nueva.raw_headers = agregar_vary([
+        (nombre, valor) for nombre, valor in response.raw_headers if nombre != b"content-length"
+    ]) + [
+        (b"content-encoding", codificacion.encode()),
+        (b"content-length", str(len(comprimido)).encode()),
+    ]
+    return nueva, True
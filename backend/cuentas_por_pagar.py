@@ -0,0 +1,201 @@
+"""
+Cuentas por pagar: antigüedad de saldos y flujo de pagos por semana.
+
+Ambos reportes salen de una sola consulta agrupada sobre las facturas sin
+pagar (sin fecha_pago y con estado distinto de "Pagada"), apoyada en el
+índice parcial ix_facturas_por_pagar_vencimiento. El resultado se guarda
+CACHE_TTL segundos por combinación de filtros: los tableros de pagos piden
+lo mismo muchas veces seguidas. Los endpoints que crean, editan, borran o
+pagan facturas llaman a `cache.invalidar()`; el TTL cubre los demás cambios
+(p. ej. el paso del tiempo entre rangos de antigüedad).
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import Date, case, cast, func, or_
+from sqlalchemy.orm import Session
+
+from models import Facturas
+
+CACHE_TTL = 60  # seconds
+MAX_ENTRADAS_CACHE = 256
+
+VENCIDO = "vencido"
+RANGOS = ((30, "0-30"), (60, "31-60"), (90, "61-90"))
+MAS_DE_90 = "mas_90"
+SIN_VENCIMIENTO = "sin_vencimiento"
+BUCKETS = (VENCIDO, *(nombre for _, nombre in RANGOS), MAS_DE_90, SIN_VENCIMIENTO)
+
+
+class CacheTTL:
+    """Resultados por llave que expiran a los `ttl` segundos; descarta los más viejos al llenarse."""
+
+    def __init__(self, ttl: float = CACHE_TTL, max_entradas: int = MAX_ENTRADAS_CACHE):
+        self.ttl = ttl
+        self._max = max_entradas
+        self._lock = threading.Lock()
+        self._datos: "OrderedDict[tuple, tuple[float, object]]" = OrderedDict()
+        self._generacion = 0  # cambia con cada invalidar()
+
+    def obtener(self, llave: tuple, calcular: Callable[[], object]):
+        ahora = time.time()
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada is not None and ahora - entrada[0] < self.ttl:
+                return entrada[1]
+            generacion = self._generacion
+        valor = calcular()
+        with self._lock:
+            if generacion != self._generacion:
+                # Se invalidó mientras se calculaba: el valor puede ser anterior al cambio
+                return valor
+            self._datos[llave] = (ahora, valor)
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self._max:
+                self._datos.popitem(last=False)
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
+
+
+cache = CacheTTL()
+
+
+def _por_pagar(db: Session, columnas: list, marca: Optional[str], proveedor: Optional[str],
+               user_id: Optional[int]):
+    query = db.query(*columnas).filter(
+        Facturas.fecha_pago.is_(None),
+        or_(Facturas.estado.is_(None), Facturas.estado != "Pagada"),
+    )
+    if marca:
+        query = query.filter(Facturas.marca == marca)
+    if proveedor:
+        query = query.filter(Facturas.proveedor == proveedor)
+    if user_id is not None:
+        query = query.filter(Facturas.user_id == user_id)
+    return query
+
+
+def _vacio() -> dict:
+    return {"facturas": 0, "monto": 0.0}
+
+
+def _sumar(destino: dict, facturas: int, monto) -> None:
+    destino["facturas"] += facturas
+    destino["monto"] = round(destino["monto"] + float(monto or 0), 2)
+
+
+def _calcular_antiguedad(db: Session, fecha_corte: date, marca: Optional[str], proveedor: Optional[str],
+                         user_id: Optional[int]) -> dict:
+    vencimiento = Facturas.fecha_vencimiento
+    bucket = case(
+        (vencimiento.is_(None), SIN_VENCIMIENTO),
+        (vencimiento < fecha_corte, VENCIDO),
+        *((vencimiento <= fecha_corte + timedelta(days=dias), nombre) for dias, nombre in RANGOS),
+        else_=MAS_DE_90,
+    ).label("bucket")
+    filas = _por_pagar(
+        db, [Facturas.proveedor, bucket, func.count(Facturas.id), func.sum(Facturas.monto)],
+        marca, proveedor, user_id,
+    ).group_by(Facturas.proveedor, bucket).all()
+
+    totales = {b: _vacio() for b in BUCKETS}
+    por_proveedor: dict = {}
+    for nombre, b, facturas, monto in filas:
+        _sumar(totales[b], facturas, monto)
+        fila = por_proveedor.setdefault(nombre, {"proveedor": nombre, **_vacio(), "buckets": {}})
+        _sumar(fila, facturas, monto)
+        _sumar(fila["buckets"].setdefault(b, _vacio()), facturas, monto)
+
+    total = _vacio()
+    for valores in totales.values():
+        _sumar(total, valores["facturas"], valores["monto"])
+    return {
+        "fecha_corte": fecha_corte,
+        "total": total,
+        "buckets": totales,
+        "proveedores": sorted(por_proveedor.values(), key=lambda p: -p["monto"]),
+    }
+
+
+def _inicio_semana(fecha, dialecto: str):
+    """Lunes de la semana de `fecha`, como expresión SQL."""
+    if dialecto == "postgresql":
+        return cast(func.date_trunc("week", fecha), Date)
+    # SQLite: el domingo siguiente (o el mismo) menos 6 días
+    return func.date(fecha, "weekday 0", "-6 days")
+
+
+def _como_fecha(valor) -> Optional[date]:
+    if valor is None or isinstance(valor, date):
+        return valor.date() if isinstance(valor, datetime) else valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def _calcular_flujo(db: Session, fecha_corte: date, semanas: int, marca: Optional[str],
+                    proveedor: Optional[str], user_id: Optional[int]) -> dict:
+    # Lo vencido se espera pagar en la semana de corte
+    pago_esperado = case(
+        (Facturas.fecha_vencimiento < fecha_corte, fecha_corte),
+        else_=Facturas.fecha_vencimiento,
+    )
+    semana = _inicio_semana(pago_esperado, db.bind.dialect.name).label("semana")
+    vencidas = func.sum(case((Facturas.fecha_vencimiento < fecha_corte, Facturas.monto), else_=0))
+    filas = _por_pagar(
+        db, [semana, func.count(Facturas.id), func.sum(Facturas.monto), vencidas],
+        marca, proveedor, user_id,
+    ).group_by(semana).all()
+
+    primera = fecha_corte - timedelta(days=fecha_corte.weekday())
+    por_semana = {primera + timedelta(weeks=i): {**_vacio(), "vencido": 0.0} for i in range(semanas)}
+    posteriores, sin_vencimiento = _vacio(), _vacio()
+    for inicio, facturas, monto, monto_vencido in filas:
+        inicio = _como_fecha(inicio)
+        if inicio is None:
+            _sumar(sin_vencimiento, facturas, monto)
+        elif inicio in por_semana:
+            _sumar(por_semana[inicio], facturas, monto)
+            por_semana[inicio]["vencido"] = round(float(monto_vencido or 0), 2)
+        else:
+            _sumar(posteriores, facturas, monto)
+
+    acumulado = 0.0
+    resultado = []
+    for inicio, valores in por_semana.items():
+        acumulado = round(acumulado + valores["monto"], 2)
+        resultado.append({
+            "semana_inicio": inicio,
+            "semana_fin": inicio + timedelta(days=6),
+            **valores,
+            "acumulado": acumulado,
+        })
+    return {
+        "fecha_corte": fecha_corte,
+        "semanas": resultado,
+        "posteriores": posteriores,
+        "sin_vencimiento": sin_vencimiento,
+    }
+
+
+def antiguedad_saldos(db: Session, fecha_corte: date, marca: Optional[str] = None,
+                      proveedor: Optional[str] = None, user_id: Optional[int] = None) -> dict:
+    """Saldo por pagar por rango de vencimiento (vencido, 0-30, 31-60, 61-90, +90), total y por proveedor."""
+    return cache.obtener(
+        ("antiguedad", fecha_corte, marca, proveedor, user_id),
+        lambda: _calcular_antiguedad(db, fecha_corte, marca, proveedor, user_id),
+    )
+
+
+def flujo_semanal(db: Session, fecha_corte: date, semanas: int = 12, marca: Optional[str] = None,
+                  proveedor: Optional[str] = None, user_id: Optional[int] = None) -> dict:
+    """Pagos esperados por semana (lunes a domingo) a partir de la semana de `fecha_corte`."""
+    return cache.obtener(
+        ("flujo", fecha_corte, semanas, marca, proveedor, user_id),
+        lambda: _calcular_flujo(db, fecha_corte, semanas, marca, proveedor, user_id),
+    )
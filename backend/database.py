@@ -12,7 +12,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_TYPE = os.getenv("DB_TYPE", "postgresql")
 
 if DB_TYPE == "sqlite":
-    DATABASE_PATH = os.path.join(BASE_DIR, "sgpme.db")
+    DATABASE_PATH = os.getenv("SQLITE_PATH", os.path.join(BASE_DIR, "sgpme.db"))
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
     print(f"🔧 Usando SQLite: {DATABASE_PATH}")
     engine = create_engine(
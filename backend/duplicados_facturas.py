@@ -0,0 +1,216 @@
+"""
+Detección de facturas y archivos duplicados.
+
+Cada factura guarda una clave normalizada (`clave_unica`): RFC del proveedor +
+serie y folio sin guiones, espacios ni ceros a la izquierda, de modo que
+"A-00123" y "a123" del mismo RFC chocan pero "A-123" y "B-123" no. Al
+importar un CFDI el número se arma con su Serie y Folio
+(`cfdi.numero_factura`), así que coincide con la misma factura capturada a
+mano. Si el proveedor no está registrado
+se usa su nombre normalizado en lugar del RFC. Cuando la factura tiene XML se
+guarda además el UUID del timbre (`uuid_cfdi`). Ambas columnas están
+indexadas, así que la verificación al crear, editar o importar es una
+búsqueda en índice y no un recorrido de la tabla.
+
+Los archivos guardan el SHA-256 de su contenido (`hash_contenido`, también
+indexado) para detectar el mismo PDF/XML subido dos veces.
+
+Las columnas no son UNIQUE porque la base ya puede tener duplicados; el
+trabajo `reporte_duplicados` llena las claves de los registros existentes y
+lista los grupos repetidos para depurarlos.
+"""
+import hashlib
+import re
+from typing import Optional
+
+from sqlalchemy import func, inspect, or_, select, text, update
+from sqlalchemy.orm import Session
+
+import cfdi
+from background_jobs import Job
+from database import SessionLocal
+from models import Facturas, FacturaArchivos, Proveedores
+
+LOTE = 1000
+LOTE_ARCHIVOS = 50  # los blobs se leen completos para calcular el hash
+# Solo PDF/XML identifican a una factura; un comprobante de pago puede cubrir varias
+TIPOS_CON_HASH_UNICO = ("PDF", "XML")
+
+# Columnas nuevas: create_all no las agrega a tablas que ya existen
+COLUMNAS = [
+    ("facturas", "clave_unica", "VARCHAR"),
+    ("facturas", "uuid_cfdi", "VARCHAR"),
+    ("factura_archivos", "hash_contenido", "VARCHAR(64)"),
+]
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9A-Z]+")
+_CEROS_A_LA_IZQUIERDA = re.compile(r"(?<![0-9])0+(?=[0-9])")
+
+
+def agregar_columnas(engine) -> list[str]:
+    """Agrega las columnas de COLUMNAS que falten. Devuelve las que agregó."""
+    inspector = inspect(engine)
+    agregadas = []
+    for tabla, columna, tipo in COLUMNAS:
+        if not inspector.has_table(tabla):
+            continue
+        if columna in {c["name"] for c in inspector.get_columns(tabla)}:
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}"))
+        agregadas.append(f"{tabla}.{columna}")
+    return agregadas
+
+
+def _normalizar(texto: Optional[str]) -> str:
+    return _NO_ALFANUMERICO.sub("", (texto or "").upper())
+
+
+def normalizar_folio(numero_factura: Optional[str]) -> Optional[str]:
+    folio = _CEROS_A_LA_IZQUIERDA.sub("", _normalizar(numero_factura))
+    return folio or None
+
+
+def clave_factura(rfc: Optional[str], proveedor: Optional[str], numero_factura: Optional[str]) -> Optional[str]:
+    """`RFC|SERIEFOLIO` (o `nombre del proveedor|SERIEFOLIO` sin RFC); None si falta el número."""
+    folio = normalizar_folio(numero_factura)
+    emisor = _normalizar(rfc) or _normalizar(proveedor)
+    if not folio or not emisor:
+        return None
+    return f"{emisor}|{folio}"
+
+
+def rfc_proveedor(db: Session, proveedor: Optional[str]) -> Optional[str]:
+    if not proveedor:
+        return None
+    return db.query(Proveedores.rfc).filter(Proveedores.nombre == proveedor).limit(1).scalar()
+
+
+def clave_para(db: Session, proveedor: Optional[str], numero_factura: Optional[str]) -> Optional[str]:
+    return clave_factura(rfc_proveedor(db, proveedor), proveedor, numero_factura)
+
+
+def hash_contenido(contenido: bytes) -> str:
+    return hashlib.sha256(contenido or b"").hexdigest()
+
+
+def buscar_duplicada(db: Session, clave: Optional[str] = None, uuid: Optional[str] = None,
+                     excluir_id: Optional[int] = None):
+    """Primera factura con la misma clave o UUID (id, numero_factura, proveedor), o None."""
+    condiciones = []
+    if clave:
+        condiciones.append(Facturas.clave_unica == clave)
+    if uuid:
+        condiciones.append(Facturas.uuid_cfdi == uuid.upper())
+    if not condiciones:
+        return None
+    query = db.query(Facturas.id, Facturas.numero_factura, Facturas.proveedor).filter(or_(*condiciones))
+    if excluir_id is not None:
+        query = query.filter(Facturas.id != excluir_id)
+    return query.order_by(Facturas.id).first()
+
+
+def archivo_existente(db: Session, hash_archivo: str):
+    """Primer archivo PDF/XML con el mismo contenido (id, factura_id, nombre_archivo), o None."""
+    return db.query(FacturaArchivos.id, FacturaArchivos.factura_id, FacturaArchivos.nombre_archivo)\
+        .filter(FacturaArchivos.hash_contenido == hash_archivo,
+                FacturaArchivos.tipo_archivo.in_(TIPOS_CON_HASH_UNICO))\
+        .order_by(FacturaArchivos.id).first()
+
+
+def _llenar_claves(db: Session, job: Job) -> int:
+    rfcs = {nombre: rfc for nombre, rfc in db.query(Proveedores.nombre, Proveedores.rfc) if nombre}
+    actualizadas = 0
+    ultimo_id = 0
+    while True:
+        lote = db.query(Facturas.id, Facturas.proveedor, Facturas.numero_factura, Facturas.clave_unica)\
+            .filter(Facturas.id > ultimo_id).order_by(Facturas.id).limit(LOTE).all()
+        if not lote:
+            break
+        cambios = []
+        for factura_id, proveedor, numero, clave_actual in lote:
+            clave = clave_factura(rfcs.get(proveedor), proveedor, numero)
+            if clave != clave_actual:
+                cambios.append({"id": factura_id, "clave_unica": clave})
+        if cambios:
+            db.execute(update(Facturas), cambios)
+            db.commit()
+        actualizadas += len(cambios)
+        ultimo_id = lote[-1].id
+        job.avance(f"Claves: {ultimo_id} facturas revisadas", min(40, job.progreso + 1))
+    return actualizadas
+
+
+def _llenar_hashes(db: Session, job: Job) -> tuple[int, int]:
+    """Hash de los archivos que no lo tienen y UUID de las facturas desde su XML."""
+    hashes = uuids = 0
+    ultimo_id = 0
+    while True:
+        lote = db.query(FacturaArchivos.id, FacturaArchivos.factura_id, FacturaArchivos.tipo_archivo,
+                        FacturaArchivos.contenido_archivo)\
+            .filter(FacturaArchivos.id > ultimo_id, FacturaArchivos.hash_contenido.is_(None))\
+            .order_by(FacturaArchivos.id).limit(LOTE_ARCHIVOS).all()
+        if not lote:
+            break
+        cambios = []
+        uuid_por_factura = {}
+        for archivo_id, factura_id, tipo, contenido in lote:
+            cambios.append({"id": archivo_id, "hash_contenido": hash_contenido(contenido)})
+            if tipo == "XML" and factura_id and contenido:
+                uuid = cfdi.parse_cfdi(contenido).get("uuid")
+                if uuid:
+                    uuid_por_factura.setdefault(factura_id, uuid)
+        db.execute(update(FacturaArchivos), cambios)
+        if uuid_por_factura:
+            sin_uuid = {fid for (fid,) in db.query(Facturas.id).filter(
+                Facturas.id.in_(uuid_por_factura), Facturas.uuid_cfdi.is_(None))}
+            if sin_uuid:
+                db.execute(update(Facturas), [
+                    {"id": fid, "uuid_cfdi": uuid_por_factura[fid]} for fid in sin_uuid
+                ])
+                uuids += len(sin_uuid)
+        db.commit()
+        hashes += len(cambios)
+        ultimo_id = lote[-1].id
+        job.avance(f"Archivos: {hashes} procesados", min(85, 40 + hashes // LOTE_ARCHIVOS))
+    return hashes, uuids
+
+
+def _grupos(db: Session, columna, id_columna, extra=(), filtro=None) -> list[dict]:
+    """Valores de `columna` repetidos en más de un registro, con los registros de cada uno."""
+    repetidos = select(columna).where(columna.is_not(None))
+    if filtro is not None:
+        repetidos = repetidos.where(filtro)
+    repetidos = repetidos.group_by(columna).having(func.count(func.distinct(id_columna)) > 1)
+    query = db.query(columna, id_columna, *extra).filter(columna.in_(repetidos))
+    if filtro is not None:
+        query = query.filter(filtro)
+    grupos: dict = {}
+    for valor, registro_id, *resto in query.order_by(columna, id_columna):
+        grupos.setdefault(valor, []).append([registro_id, *resto] if resto else registro_id)
+    return [{"valor": valor, "registros": registros} for valor, registros in grupos.items()]
+
+
+def reporte_duplicados(job: Job) -> dict:
+    """
+    Trabajo de respaldo: llena clave_unica, uuid_cfdi y hash_contenido de los
+    registros existentes y reporta las facturas y archivos repetidos.
+    """
+    with SessionLocal() as db:
+        job.avance("Calculando claves de facturas", 0)
+        claves = _llenar_claves(db, job)
+        job.avance("Calculando hashes de archivos", 40)
+        hashes, uuids = _llenar_hashes(db, job)
+        job.avance("Buscando duplicados", 90)
+        return {
+            "claves_actualizadas": claves,
+            "hashes_calculados": hashes,
+            "uuids_encontrados": uuids,
+            "facturas_misma_clave": _grupos(db, Facturas.clave_unica, Facturas.id),
+            "facturas_mismo_uuid": _grupos(db, Facturas.uuid_cfdi, Facturas.id),
+            # [factura_id, archivo_id] del mismo PDF/XML adjunto a facturas distintas
+            "archivos_repetidos": _grupos(
+                db, FacturaArchivos.hash_contenido, FacturaArchivos.factura_id, (FacturaArchivos.id,),
+                filtro=FacturaArchivos.tipo_archivo.in_(TIPOS_CON_HASH_UNICO),
+            ),
+        }
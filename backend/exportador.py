@@ -0,0 +1,149 @@
+"""
+Exportación de listados a CSV y XLSX en streaming.
+
+El endpoint arma el SELECT (con los mismos filtros que su listado) y
+`exportar` lo devuelve como StreamingResponse. Las filas se leen con un cursor
+del lado del servidor (`yield_per`) en lotes de LOTE, así que la memoria no
+crece con el número de filas:
+  - CSV: cada lote se escribe y se manda de inmediato.
+  - XLSX: libro write-only de openpyxl (las filas van a un archivo temporal);
+    el ZIP se manda al terminar la hoja, desde un archivo temporal en disco.
+
+La consulta corre en su propia sesión: la del request se cierra antes de que
+empiece el streaming. openpyxl es opcional; sin él solo hay CSV.
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from typing import Iterator, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import SessionLocal
+
+CSV = "csv"
+XLSX = "xlsx"
+PATRON_FORMATO = "^(csv|xlsx)$"
+
+LOTE = 1000
+CHUNK = 64 * 1024
+MAX_XLSX_EN_MEMORIA = 8 * 1024 * 1024
+
+MEDIA_TYPES = {
+    CSV: "text/csv; charset=utf-8",
+    XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# (encabezado, etiqueta de la columna en el SELECT)
+Columnas = Sequence[tuple[str, str]]
+
+
+def xlsx_disponible() -> bool:
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# Un texto que empieza así se interpreta como fórmula al abrir el CSV en Excel
+_INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _valor_csv(valor):
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "Sí" if valor else "No"
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def _lotes(statement) -> Iterator[list]:
+    with SessionLocal() as db:
+        resultado = db.execute(statement.execution_options(stream_results=True, yield_per=LOTE))
+        for lote in resultado.partitions():
+            yield lote
+
+
+def _filas_csv(statement, columnas: Columnas) -> Iterator[bytes]:
+    claves = [clave for _, clave in columnas]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel abra el UTF-8 con acentos correctamente
+    buffer.write("\ufeff")
+    writer.writerow([titulo for titulo, _ in columnas])
+    # El encabezado sale antes de la primera consulta: la descarga empieza de inmediato
+    yield buffer.getvalue().encode("utf-8")
+    for lote in _lotes(statement):
+        buffer.seek(0)
+        buffer.truncate()
+        for fila in lote:
+            mapping = fila._mapping
+            writer.writerow([_valor_csv(mapping[clave]) for clave in claves])
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _filas_xlsx(statement, columnas: Columnas, hoja: str) -> Iterator[bytes]:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    claves = [clave for _, clave in columnas]
+    libro = Workbook(write_only=True)
+    ws = libro.create_sheet(title=hoja[:31])
+    negrita = Font(bold=True)
+    encabezados = []
+    for titulo, _ in columnas:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.font = negrita
+        encabezados.append(celda)
+    ws.append(encabezados)
+
+    def texto(valor):
+        # openpyxl toma "=..." como fórmula; se fuerza celda de texto
+        celda = WriteOnlyCell(ws, value=valor)
+        celda.data_type = "s"
+        return celda
+
+    for lote in _lotes(statement):
+        for fila in lote:
+            mapping = fila._mapping
+            ws.append([
+                texto(valor) if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA) else valor
+                for valor in (mapping[clave] for clave in claves)
+            ])
+
+    with tempfile.SpooledTemporaryFile(max_size=MAX_XLSX_EN_MEMORIA) as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while chunk := archivo.read(CHUNK):
+            yield chunk
+
+
+def exportar(statement, columnas: Columnas, formato: str, nombre: str,
+             hoja: Optional[str] = None) -> StreamingResponse:
+    """
+    StreamingResponse con el resultado de `statement` en `formato`. El archivo
+    se llama `{nombre}_{fecha}.{formato}`. HTTP 501 si piden XLSX sin openpyxl.
+    """
+    if formato == XLSX:
+        if not xlsx_disponible():
+            raise HTTPException(status_code=501, detail='Exportación XLSX no disponible (falta openpyxl)')
+        contenido = _filas_xlsx(statement, columnas, hoja or nombre)
+    else:
+        formato = CSV
+        contenido = _filas_csv(statement, columnas)
+    archivo = f"{nombre}_{date.today().isoformat()}.{formato}"
+    return StreamingResponse(
+        contenido,
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{archivo}"'},
+    )
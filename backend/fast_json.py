@@ -0,0 +1,69 @@
+"""
+Respuestas JSON rápidas para listados grandes.
+
+En los listados con miles de filas, construir un modelo Pydantic por fila y que
+FastAPI lo vuelva a validar contra `response_model` cuesta más que la consulta.
+Estos endpoints arman dicts directamente desde las tuplas de SQL y devuelven un
+`FastJSONResponse`: FastAPI no valida ni re-serializa una Response devuelta por
+el endpoint, pero sigue usando `response_model` del decorador para el esquema
+OpenAPI. Solo se usa con formas internas de confianza; las columnas se eligen a
+partir del mismo modelo de respuesta (`columnas`) para que no se desalineen.
+
+orjson es opcional: si no está instalado se usa json de la biblioteca estándar.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Iterable
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto en bytes; fechas en ISO 8601 como las serializa Pydantic."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def columnas(modelo, esquema: type[BaseModel], excluir: Iterable[str] = ()) -> list:
+    """
+    Columnas de `modelo` (SQLAlchemy) para los campos de `esquema` que existen en
+    la tabla, etiquetadas con el nombre del campo.
+    """
+    excluir = set(excluir)
+    tabla = modelo.__table__.columns
+    return [
+        getattr(modelo, campo).label(campo)
+        for campo in esquema.model_fields
+        if campo in tabla and campo not in excluir
+    ]
+
+
+def filas(query) -> list[dict]:
+    """Dicts {etiqueta: valor} a partir de una Query de columnas, sin objetos ORM."""
+    campos = [c["name"] for c in query.column_descriptions]
+    return [dict(zip(campos, fila)) for fila in query]
@@ -7,6 +7,7 @@ import asyncio
 import time
 import traceback
 import models
+import cache_http
 from database import engine, SessionLocal
 from routers import auth, marcas, admin, eventos, facturas, proyecciones, proveedores, campanas, presencia_tradicional, metricas, presupuesto, categorias, form_templates, desplazamiento, google_ads, meta_ads, embajadores, vendedores, conciliacion_bdc, diagramas_conversion, dev_tools, maintenance, funnel_pisos
 from jose import jwt, JWTError
@@ -21,6 +22,46 @@ _log_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="reqlog")
 
 @asynccontextmanager
 async def lifespan(app):
+    # Columnas de detección de duplicados
+    try:
+        import duplicados_facturas
+        for columna in duplicados_facturas.agregar_columnas(engine):
+            print(f"✅ Columna agregada: {columna}")
+    except Exception as e:
+        print(f"⚠️ Columnas de duplicados de facturas: {e}")
+    # Índices declarados en models que falten en tablas existentes: no se crean al
+    # arrancar (bloquearían facturas), se crean con migrations/crear_indices_modelos.py
+    try:
+        from migrations.crear_indices_modelos import indices_faltantes
+        faltantes = indices_faltantes(engine)
+        if faltantes:
+            print(f"⚠️ Faltan {len(faltantes)} índices ({', '.join(i.name for i in faltantes)}); "
+                  f"ejecutar: python migrations/crear_indices_modelos.py")
+    except Exception as e:
+        print(f"⚠️ No se pudieron revisar los índices: {e}")
+    # Búsqueda de facturas: tsvector/trigramas en PostgreSQL, FTS5 en SQLite
+    try:
+        import busqueda_facturas
+        faltantes = busqueda_facturas.indices_faltantes(engine)
+        if faltantes:
+            print(f"⚠️ Faltan índices de búsqueda de facturas ({', '.join(faltantes)}); "
+                  f"ejecutar: python migrations/create_busqueda_facturas.py")
+    except Exception as e:
+        print(f"⚠️ No se pudieron revisar los índices de búsqueda: {e}")
+    # Autocompletado de proveedores: trigramas para el respaldo en base e índice en memoria
+    try:
+        import sugerencias_proveedores
+        faltantes = sugerencias_proveedores.indices_faltantes(engine)
+        if faltantes:
+            print(f"⚠️ Faltan índices de proveedores ({', '.join(faltantes)}); "
+                  f"ejecutar: python migrations/create_trigramas_proveedores.py")
+    except Exception as e:
+        print(f"⚠️ No se pudieron revisar los índices de proveedores: {e}")
+    try:
+        from sugerencias_proveedores import sugerencias
+        sugerencias.calentar()
+    except Exception:
+        pass
     # Auto-migración: agregar columnas faltantes
     try:
         from sqlalchemy import text
@@ -79,6 +120,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# GET condicional (ETag por versión de tablas) y compresión gzip/brotli/zstd de las respuestas.
+# Se registra antes que CORS para quedar por dentro: los 304 también llevan los encabezados CORS.
+app.middleware("http")(cache_http.middleware)
+
 # Configuración de CORS
 app.add_middleware(
     CORSMiddleware,
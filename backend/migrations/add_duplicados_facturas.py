@@ -0,0 +1,46 @@
+"""
+Migración: detección de facturas y archivos duplicados.
+
+Agrega facturas.clave_unica, facturas.uuid_cfdi y factura_archivos.hash_contenido
+con sus índices, llena los valores de los registros existentes y muestra los
+grupos de duplicados encontrados. El arranque de la API agrega las columnas;
+los índices se crean aquí o con crear_indices_modelos.py, y el llenado también
+se puede lanzar con POST /facturas/duplicados/reporte.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from background_jobs import Job
+from database import engine
+from models import Facturas, FacturaArchivos
+from crear_indices_modelos import crear_indices
+import duplicados_facturas
+
+
+def migrate():
+    for columna in duplicados_facturas.agregar_columnas(engine):
+        print(f"✅ Columna agregada: {columna}")
+    creados, fallos = crear_indices(engine, (Facturas.__table__, FacturaArchivos.__table__))
+    for fallo in fallos:
+        print(f"❌ Índice {fallo}")
+    print(f"✅ Índices de duplicados verificados ({len(creados)} creados)")
+
+    job = Job(id="migracion", tipo="reporte_duplicados")
+    resultado = duplicados_facturas.reporte_duplicados(job)
+    print(f"   {resultado['claves_actualizadas']} claves, {resultado['hashes_calculados']} hashes, "
+          f"{resultado['uuids_encontrados']} UUIDs")
+    for titulo, llave in (("Facturas con la misma clave", "facturas_misma_clave"),
+                          ("Facturas con el mismo UUID", "facturas_mismo_uuid"),
+                          ("Archivos repetidos [factura_id, archivo_id]", "archivos_repetidos")):
+        grupos = resultado[llave]
+        print(f"{'⚠️' if grupos else '✅'} {titulo}: {len(grupos)}")
+        for grupo in grupos:
+            print(f"   {grupo['valor']}: {grupo['registros']}")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,117 @@
+"""
+Migración: crear los índices declarados en models que falten en tablas existentes.
+
+create_all solo crea los índices al crear la tabla, así que los que se agregan
+después a models (compuestos de facturas y eventos, el parcial de cuentas por
+pagar, las claves de duplicados, ...) se crean aquí y no al arrancar la API.
+En PostgreSQL se usa CREATE INDEX CONCURRENTLY, fuera de transacción, para no
+bloquear las escrituras de facturas/factura_archivos mientras se construyen.
+Un índice que falla se informa y se sigue con los demás; si quedó INVALID se
+borra para que la siguiente corrida lo vuelva a intentar.
+
+Es idempotente: solo crea los índices que no existen.
+"""
+import re
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.schema import CreateIndex
+
+import models
+from database import engine
+
+
+def indices_faltantes(engine, tablas=None) -> list:
+    """Índices de models (de `tablas`, o de todas) que no existen en la base."""
+    inspector = inspect(engine)
+    faltantes = []
+    for tabla in tablas if tablas is not None else models.Base.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue  # create_all la creará con sus índices
+        existentes = {i["name"] for i in inspector.get_indexes(tabla.name)}
+        faltantes.extend(index for index in tabla.indexes if index.name not in existentes)
+    return faltantes
+
+
+def indices_validos(engine, nombres) -> set[str]:
+    """De `nombres`, los índices que existen y son válidos (en PostgreSQL excluye los INVALID)."""
+    nombres = list(nombres)
+    if not nombres:
+        return set()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            filas = conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE i.indisvalid AND c.relname = ANY(:nombres)"
+            ), {"nombres": nombres})
+        else:
+            filas = conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name IN :nombres"
+            ).bindparams(bindparam("nombres", expanding=True)), {"nombres": nombres})
+        return {nombre for (nombre,) in filas}
+
+
+def crear_concurrente(engine, ddls) -> tuple[list[str], list[str]]:
+    """
+    Ejecuta cada (nombre, DDL) fuera de transacción y devuelve (creados, fallos).
+    En PostgreSQL los CREATE INDEX llevan CONCURRENTLY; un índice INVALID que
+    dejó una corrida anterior se borra antes de reintentarlo, y uno que falla
+    ahora se borra para no dejarlo a medias.
+    """
+    postgres = engine.dialect.name == "postgresql"
+    creados, fallos = [], []
+    # CONCURRENTLY no puede correr dentro de una transacción
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for nombre, ddl in ddls:
+            es_indice = re.match(r"CREATE (UNIQUE )?INDEX ", ddl) is not None
+            if postgres and es_indice:
+                ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+                invalido = conn.execute(text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE NOT i.indisvalid AND c.relname = :nombre"
+                ), {"nombre": nombre}).first()
+                if invalido:
+                    conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{nombre}"'))
+            try:
+                conn.execute(text(ddl))
+                creados.append(nombre)
+            except Exception as e:
+                fallos.append(f"{nombre}: {getattr(e, 'orig', e)}")
+                if postgres and es_indice:
+                    try:
+                        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{nombre}"'))
+                    except Exception:
+                        pass
+    return creados, fallos
+
+
+def crear_indices(engine, tablas=None) -> tuple[list[str], list[str]]:
+    """Crea los índices faltantes de models. Devuelve (creados, fallos)."""
+    return crear_concurrente(engine, [
+        (index.name, str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect)))
+        for index in indices_faltantes(engine, tablas)
+    ])
+
+
+def migrate():
+    faltantes = indices_faltantes(engine)
+    if not faltantes:
+        print("✅ Todos los índices de models existen")
+        return
+    print(f"🔧 Creando {len(faltantes)} índices: {', '.join(i.name for i in faltantes)}")
+    creados, fallos = crear_indices(engine)
+    for nombre in creados:
+        print(f"✅ {nombre}")
+    for fallo in fallos:
+        print(f"❌ {fallo}")
+    if fallos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,38 @@
+"""
+Migración: índices de búsqueda de facturas (/facturas/search).
+
+PostgreSQL: índice GIN sobre el tsvector de folio, proveedor, OC, descripción y
+observaciones, extensión pg_trgm e índices de trigramas en proveedor y folio,
+todos con CREATE INDEX CONCURRENTLY para no bloquear las escrituras en
+facturas mientras se construyen. Si CREATE EXTENSION falla (p. ej. sin
+permiso), la búsqueda sigue funcionando con tsvector + ILIKE.
+SQLite: tabla FTS5 facturas_fts con sus triggers, reconstruida desde facturas.
+El arranque de la API no crea estos índices, solo avisa si faltan.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import engine
+from busqueda_facturas import DDL_POSTGRES, crear_fts_sqlite
+from crear_indices_modelos import crear_concurrente
+
+
+def migrate():
+    if engine.dialect.name == "postgresql":
+        _, fallos = crear_concurrente(engine, DDL_POSTGRES)
+    else:
+        fallos = crear_fts_sqlite(engine)
+    for fallo in fallos:
+        print(f"❌ {fallo}")
+    if not fallos:
+        print(f"✅ Índices de búsqueda de facturas verificados ({engine.dialect.name})")
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,56 @@
+"""
+Migración: crear la tabla proyeccion_partidas y llenarla a partir de
+Proyecciones.partidas_json.
+
+Es idempotente: cada proyección se reescribe completa (borrar + insertar sus
+partidas), así que se puede volver a correr si se interrumpe.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import SessionLocal, engine
+from models import Proyecciones, ProyeccionPartidas
+from proyeccion_partidas import sync_partidas
+
+LOTE = 500
+
+
+def migrate():
+    ProyeccionPartidas.__table__.create(bind=engine, checkfirst=True)
+    for index in ProyeccionPartidas.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    print("✅ Tabla proyeccion_partidas verificada")
+
+    db = SessionLocal()
+    try:
+        ultimo_id = 0
+        procesadas = 0
+        while True:
+            lote = db.query(Proyecciones).filter(Proyecciones.id > ultimo_id)\
+                .order_by(Proyecciones.id).limit(LOTE).all()
+            if not lote:
+                break
+            for proyeccion in lote:
+                sync_partidas(db, proyeccion)
+            db.commit()
+            ultimo_id = lote[-1].id
+            procesadas += len(lote)
+            db.expunge_all()
+            print(f"   {procesadas} proyecciones procesadas...")
+
+        total = db.query(ProyeccionPartidas).count()
+        print(f"✅ {procesadas} proyecciones, {total} partidas en proyeccion_partidas")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error en migración: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,36 @@
+"""
+Migración: extensión pg_trgm e índices de trigramas de proveedores (nombre,
+razón social, RFC) para el respaldo en base de /proveedores/suggest.
+
+Solo PostgreSQL; los índices se crean con CREATE INDEX CONCURRENTLY para no
+bloquear las escrituras en proveedores. Si CREATE EXTENSION falla (p. ej. sin
+permiso), las sugerencias siguen funcionando con ILIKE.
+El arranque de la API no crea estos índices, solo avisa si faltan.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import engine
+from sugerencias_proveedores import DDL_POSTGRES
+from crear_indices_modelos import crear_concurrente
+
+
+def migrate():
+    if engine.dialect.name != "postgresql":
+        print("ℹ️ Solo aplica a PostgreSQL; en SQLite las sugerencias usan LIKE")
+        return
+    creados, fallos = crear_concurrente(engine, DDL_POSTGRES)
+    for nombre in creados:
+        print(f"✅ {nombre}")
+    for fallo in fallos:
+        print(f"❌ {fallo}")
+    if fallos:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,61 @@
+"""
+Migración: mover las imágenes inline (data URLs base64) de
+briefs_eventos.observaciones_especiales a la tabla brief_imagenes.
+
+Después de correrla, observaciones_especiales solo guarda referencias
+(imagen_id) y las imágenes se sirven desde /eventos/{id}/brief/imagenes.
+Se procesa un brief por transacción, así que se puede interrumpir y volver a correr.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import SessionLocal, engine
+from models import Base, BriefsEventos, BriefImagenes
+import brief_assets
+
+
+def migrate():
+    Base.metadata.create_all(bind=engine, tables=[BriefImagenes.__table__])
+    print("✅ Tabla brief_imagenes verificada")
+
+    db = SessionLocal()
+    try:
+        brief_ids = [
+            brief_id for (brief_id,) in db.query(BriefsEventos.id)
+            .filter(BriefsEventos.observaciones_especiales.like('%"data:%'))
+            .order_by(BriefsEventos.id).all()
+        ]
+        print(f"📋 Briefs con imágenes inline: {len(brief_ids)}")
+
+        migrados = 0
+        for brief_id in brief_ids:
+            brief = db.query(BriefsEventos).filter(BriefsEventos.id == brief_id).first()
+            try:
+                nuevas = brief_assets.externalizar_imagenes(
+                    db, brief.id, brief.observaciones_especiales, brief.creado_por
+                )
+                if nuevas != brief.observaciones_especiales:
+                    # fecha_modificacion explícita para que onupdate no la cambie
+                    db.query(BriefsEventos).filter(BriefsEventos.id == brief_id).update({
+                        BriefsEventos.observaciones_especiales: nuevas,
+                        BriefsEventos.fecha_modificacion: BriefsEventos.fecha_modificacion,
+                    }, synchronize_session=False)
+                    migrados += 1
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"❌ Brief {brief_id}: {e}")
+            finally:
+                db.expunge_all()
+
+        print(f"✅ {migrados} briefs migrados a brief_imagenes")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Date, Text, Boolean, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Date, Text, Boolean, DateTime, LargeBinary, UniqueConstraint, Index, text
 from sqlalchemy.sql import func
 
 class Users(Base):
@@ -54,6 +54,11 @@ class Eventos(Base):
     creado_por = Column(String)
     user_id = Column(Integer, ForeignKey('users.id'))
 
+    __table_args__ = (
+        # Dashboard y calendario filtran por marca y rango de fecha_inicio
+        Index('ix_eventos_marca_fecha_inicio', 'marca', 'fecha_inicio'),
+    )
+
 
 class Facturas(Base):
     __tablename__ = 'facturas'
@@ -87,6 +92,20 @@ class Facturas(Base):
     fecha_creacion = Column(DateTime, server_default=func.now())
     creado_por = Column(String)
     user_id = Column(Integer, ForeignKey('users.id'))
+    # Detección de duplicados (ver duplicados_facturas): RFC|folio normalizado y UUID del CFDI
+    clave_unica = Column(String, nullable=True, index=True)
+    uuid_cfdi = Column(String, nullable=True, index=True)
+
+    __table_args__ = (
+        # Listados por marca/estado y año usan rangos sobre fecha_factura
+        Index('ix_facturas_marca_fecha_factura', 'marca', 'fecha_factura'),
+        Index('ix_facturas_estado_fecha_factura', 'estado', 'fecha_factura'),
+        # Gasto real por evento y categoría
+        Index('ix_facturas_evento_categoria', 'evento_id', 'categoria'),
+        # Cuentas por pagar: solo las facturas sin fecha de pago, por vencimiento
+        Index('ix_facturas_por_pagar_vencimiento', 'fecha_vencimiento',
+              postgresql_where=text('fecha_pago IS NULL'), sqlite_where=text('fecha_pago IS NULL')),
+    )
 
 
 class FacturaArchivos(Base):
@@ -101,6 +120,7 @@ class FacturaArchivos(Base):
     fecha_subida = Column(DateTime, server_default=func.now())
     subido_por = Column(String)
     seccion = Column(String, nullable=True)  # 'general' | 'productos'
+    hash_contenido = Column(String(64), nullable=True, index=True)  # SHA-256
 
 
 class FacturaCotizaciones(Base):
@@ -143,6 +163,30 @@ class Proyecciones(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
 
 
+class ProyeccionPartidas(Base):
+    """Partidas de una proyección; copia consultable de partidas_json, escrita en la misma transacción."""
+    __tablename__ = 'proyeccion_partidas'
+
+    id = Column(Integer, primary_key=True, index=True)
+    proyeccion_id = Column(Integer, ForeignKey('proyecciones.id'), index=True)
+    posicion = Column(Integer, default=0)  # Orden dentro de partidas_json
+    partida_id = Column(String, nullable=True)  # id generado por el frontend
+    categoria = Column(String)
+    subcategoria = Column(String, nullable=True)
+    monto = Column(Float, default=0)
+    es_reembolso = Column(Boolean, default=False)
+    notas = Column(Text, nullable=True)
+    # Copiados de la proyección para agrupar sin JOIN
+    marca = Column(String)
+    año = Column(Integer)
+    mes = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('ix_proyeccion_partidas_categoria_subcategoria', 'categoria', 'subcategoria'),
+        Index('ix_proyeccion_partidas_marca_anio_mes', 'marca', 'año', 'mes'),
+    )
+
+
 class Proveedores(Base):
     __tablename__ = 'proveedores'
 
@@ -223,6 +267,23 @@ class CronogramasEventos(Base):
     user_id = Column(Integer, ForeignKey('users.id'))
 
 
+class BriefImagenes(Base):
+    """Imágenes de testimonio de un brief; observaciones_especiales solo guarda la referencia (imagen_id)."""
+    __tablename__ = 'brief_imagenes'
+
+    id = Column(Integer, primary_key=True, index=True)
+    brief_id = Column(Integer, ForeignKey('briefs_eventos.id'), index=True)
+    nombre = Column(String)
+    content_type = Column(String)
+    contenido = Column(LargeBinary)
+    miniatura = Column(LargeBinary, nullable=True)  # Variante reducida (None si no se pudo generar)
+    miniatura_content_type = Column(String, nullable=True)
+    tamaño = Column(Integer)
+    sha256 = Column(String(64), index=True)
+    fecha_subida = Column(DateTime, server_default=func.now())
+    subido_por = Column(String)
+
+
 class Campanas(Base):
     __tablename__ = 'campanyas'
 
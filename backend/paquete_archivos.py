@@ -0,0 +1,114 @@
+"""
+Paquete ZIP de los archivos de facturas (PDF, XML, comprobantes), en streaming.
+
+El ZIP se arma mientras se envía: zipfile escribe sobre un buffer que no admite
+seek (usa data descriptors) y cada archivo se lee de la base en trozos con
+substr(), así que ni el blob completo ni el ZIP completo pasan por memoria.
+ZIP64 queda habilitado para paquetes de más de 4 GB o más de 65535 entradas.
+"""
+import re
+import zipfile
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional
+
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import FacturaArchivos
+
+CHUNK = 1024 * 1024
+# Se comprimen los formatos de texto; PDF e imágenes ya vienen comprimidos
+EXTENSIONES_COMPRIMIBLES = (".xml", ".txt", ".csv", ".json")
+_NO_PERMITIDOS = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+class Entrada(NamedTuple):
+    archivo_id: int
+    proveedor: Optional[str]
+    folio: Optional[str]
+    nombre_archivo: Optional[str]
+    fecha_subida: Optional[datetime]
+
+
+class _Salida:
+    """Destino de escritura sin seek: acumula lo que zipfile escribe hasta que se vacía."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _limpiar(texto: Optional[str], default: str) -> str:
+    texto = _NO_PERMITIDOS.sub("_", (texto or "").strip()).strip(". ")
+    return texto[:100] or default
+
+
+def nombre_entrada(entrada: Entrada) -> str:
+    """`Proveedor/Folio - archivo.pdf`, sin caracteres inválidos en Windows."""
+    proveedor = _limpiar(entrada.proveedor, "Sin proveedor")
+    folio = _limpiar(entrada.folio, "Sin folio")
+    archivo = _limpiar(entrada.nombre_archivo, f"archivo_{entrada.archivo_id}")
+    return f"{proveedor}/{folio} - {archivo}"
+
+
+def _nombres_unicos(entradas: list[Entrada]) -> list[str]:
+    vistos: dict[str, int] = {}
+    nombres = []
+    for entrada in entradas:
+        nombre = nombre_entrada(entrada)
+        n = vistos.get(nombre.lower(), 0)
+        vistos[nombre.lower()] = n + 1
+        if n:
+            carpeta, _, archivo = nombre.rpartition("/")
+            base, punto, ext = archivo.rpartition(".")
+            archivo = f"{base} ({n + 1}).{ext}" if punto and base else f"{archivo} ({n + 1})"
+            nombre = f"{carpeta}/{archivo}"
+        nombres.append(nombre)
+    return nombres
+
+
+def _zipinfo(nombre: str, entrada: Entrada, tamaño: int) -> zipfile.ZipInfo:
+    fecha = entrada.fecha_subida or datetime.now()
+    if fecha.year < 1980:
+        fecha = datetime(1980, 1, 1)
+    info = zipfile.ZipInfo(nombre, date_time=fecha.timetuple()[:6])
+    info.compress_type = (
+        zipfile.ZIP_DEFLATED if nombre.lower().endswith(EXTENSIONES_COMPRIMIBLES) else zipfile.ZIP_STORED
+    )
+    info.file_size = tamaño  # zipfile decide con esto si la entrada necesita ZIP64
+    return info
+
+
+def generar_zip(entradas: list[Entrada]) -> Iterator[bytes]:
+    """Bytes del ZIP con los archivos de `entradas`, en orden, leídos en trozos de CHUNK."""
+    salida = _Salida()
+    with SessionLocal() as db, zipfile.ZipFile(salida, mode="w", allowZip64=True) as zf:
+        for entrada, nombre in zip(entradas, _nombres_unicos(entradas)):
+            tamaño = db.query(func.length(FacturaArchivos.contenido_archivo))\
+                .filter(FacturaArchivos.id == entrada.archivo_id).scalar()
+            if tamaño is None:
+                continue  # borrado mientras se armaba el paquete
+            with zf.open(_zipinfo(nombre, entrada, tamaño), mode="w") as destino:
+                # substr() es 1-based en PostgreSQL y SQLite
+                for inicio in range(1, tamaño + 1, CHUNK):
+                    trozo = db.query(func.substr(FacturaArchivos.contenido_archivo, inicio, CHUNK))\
+                        .filter(FacturaArchivos.id == entrada.archivo_id).scalar()
+                    destino.write(trozo or b"")
+                    if data := salida.vaciar():
+                        yield data
+            if data := salida.vaciar():
+                yield data
+    # directorio central
+    if data := salida.vaciar():
+        yield data
@@ -0,0 +1,58 @@
+"""
+Sincronización de Proyecciones.partidas_json con la tabla proyeccion_partidas.
+
+partidas_json sigue siendo lo que lee y escribe el frontend; cada vez que se
+guarda una proyección se reescriben sus filas en proyeccion_partidas dentro de
+la misma transacción, para que los resúmenes por categoría se hagan con GROUP BY.
+"""
+import json
+from typing import Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from models import Proyecciones, ProyeccionPartidas
+
+
+def _monto(valor) -> float:
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def parse_partidas(partidas_json: Optional[str]) -> list[dict]:
+    """Filas de proyeccion_partidas (sin proyeccion_id) a partir de partidas_json; [] si no es válido."""
+    if not partidas_json:
+        return []
+    try:
+        partidas = json.loads(partidas_json)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if not isinstance(partidas, list):
+        return []
+    return [
+        {
+            "posicion": posicion,
+            "partida_id": str(partida["id"]) if partida.get("id") is not None else None,
+            "categoria": partida.get("categoria"),
+            "subcategoria": partida.get("subcategoria") or None,
+            "monto": _monto(partida.get("monto")),
+            "es_reembolso": bool(partida.get("esReembolso", False)),
+            "notas": partida.get("notas"),
+        }
+        for posicion, partida in enumerate(partidas)
+        if isinstance(partida, dict)
+    ]
+
+
+def sync_partidas(db: Session, proyeccion: Proyecciones):
+    """Reescribe las partidas de `proyeccion` (ya con id) en dos sentencias. No hace commit."""
+    db.execute(delete(ProyeccionPartidas).where(ProyeccionPartidas.proyeccion_id == proyeccion.id))
+    filas = [
+        {**fila, "proyeccion_id": proyeccion.id, "marca": proyeccion.marca,
+         "año": proyeccion.año, "mes": proyeccion.mes}
+        for fila in parse_partidas(proyeccion.partidas_json)
+    ]
+    if filas:
+        db.execute(insert(ProyeccionPartidas), filas)
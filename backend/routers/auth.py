@@ -25,6 +25,7 @@ ALGORITHM = 'HS256'
 
 bcrypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl='auth/token')
+oauth2_bearer_opcional = OAuth2PasswordBearer(tokenUrl='auth/token', auto_error=False)
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -99,6 +100,12 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail='Could not validate credentials')
 
+async def get_current_user_opcional(token: Annotated[Optional[str], Depends(oauth2_bearer_opcional)]):
+    """Como get_current_user, pero None si la petición no trae token (p. ej. un <img> con URL firmada)."""
+    if token is None:
+        return None
+    return await get_current_user(token)
+
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 @router.get("/users", status_code=status.HTTP_200_OK)
@@ -7,6 +7,7 @@ from models import Campanas, Facturas
 from database import SessionLocal
 from .auth import get_current_user
 from datetime import date
+import fast_json
 
 router = APIRouter(
     prefix='/campanas',
@@ -74,7 +75,8 @@ async def read_all_campanas(user: user_dependency, db: db_dependency,
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
     
-    query = db.query(Campanas)
+    # Solo las columnas del response_model, serializadas con fast_json sin validar por fila
+    query = db.query(*fast_json.columnas(Campanas, CampanyaResponse))
     
     if marca:
         query = query.filter(Campanas.marca == marca)
@@ -86,8 +88,7 @@ async def read_all_campanas(user: user_dependency, db: db_dependency,
     # Ordenar por fecha_inicio desc, luego por fecha_creacion desc
     query = query.order_by(Campanas.fecha_inicio.desc(), Campanas.fecha_creacion.desc())
         
-    campanas = query.all()
-    return campanas
+    return fast_json.FastJSONResponse(fast_json.filas(query))
 
 @router.get("/{campana_id}", response_model=CampanyaResponse, status_code=status.HTTP_200_OK)
 async def read_campana(user: user_dependency, db: db_dependency, campana_id: int = Path(gt=0)):
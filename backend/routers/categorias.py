@@ -5,10 +5,13 @@ Router para gestión de categorías y subcategorías del sistema
 from typing import Annotated, Optional
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from pydantic import BaseModel, Field
+from sqlalchemy import or_, text, update
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 from starlette import status
+from background_jobs import Job, jobs
 from database import SessionLocal
-from models import Categorias, Facturas, Proyecciones, PresupuestoMensual, PresupuestoAnual
+from models import Categorias, Facturas, Proyecciones, ProyeccionPartidas, PresupuestoMensual, PresupuestoAnual
 from routers.auth import get_current_user
 import json
 
@@ -154,14 +157,203 @@ async def create_categoria(
     }
 
 
-@router.put("/{categoria_id}", status_code=status.HTTP_200_OK)
+# Renombra la categoría y limpia subcategorías eliminadas dentro de partidas_json
+# (texto con un arreglo JSON) en una sola sentencia; RETURNING devuelve cuántas
+# partidas cambió cada proyección.
+_PARTIDAS_JSONB_SQL = text("""
+    UPDATE proyecciones AS pr
+    SET partidas_json = sub.partidas::text
+    FROM (
+        SELECT p.id,
+               jsonb_agg(r2.partida ORDER BY e.ord) AS partidas,
+               count(*) FILTER (WHERE r2.partida IS DISTINCT FROM e.partida) AS cambios
+        FROM proyecciones p
+        CROSS JOIN LATERAL jsonb_array_elements(p.partidas_json::jsonb) WITH ORDINALITY AS e(partida, ord)
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN e.partida->>'categoria' = :anterior
+                        THEN jsonb_set(e.partida, '{categoria}', to_jsonb(CAST(:nuevo AS text)))
+                        ELSE e.partida END AS partida
+        ) AS r1
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN r1.partida->>'categoria' = :nuevo
+                             AND r1.partida->>'subcategoria' = ANY(CAST(:eliminadas AS text[]))
+                        THEN jsonb_set(r1.partida, '{subcategoria}', 'null'::jsonb)
+                        ELSE r1.partida END AS partida
+        ) AS r2
+        WHERE p.partidas_json LIKE '[%' AND p.partidas_json LIKE ANY(CAST(:patrones AS text[]))
+        GROUP BY p.id
+    ) AS sub
+    WHERE pr.id = sub.id AND sub.cambios > 0
+    RETURNING sub.cambios
+""")
+
+
+def _patrones_like(*nombres: str) -> list[str]:
+    """Patrones LIKE para encontrar los nombres dentro del JSON, con o sin escapes \\uXXXX."""
+    patrones = set()
+    for nombre in nombres:
+        for forma in (nombre, json.dumps(nombre)[1:-1]):
+            patrones.add("%" + forma.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    return sorted(patrones)
+
+
+def _migrar_partidas_python(db: Session, nombre_anterior: str, nombre_nuevo: str,
+                            subcats_eliminadas: list[str]) -> tuple[int, int]:
+    """Misma migración de partidas_json en Python (SQLite o JSON inválido en PostgreSQL)."""
+    proyecciones_actualizadas = partidas_actualizadas = 0
+    cambios = []
+    candidatas = db.query(Proyecciones.id, Proyecciones.partidas_json).filter(or_(*[
+        Proyecciones.partidas_json.like(patron, escape="\\")
+        for patron in _patrones_like(nombre_anterior, nombre_nuevo)
+    ]))
+    for proyeccion_id, partidas_json in candidatas:
+        try:
+            partidas = json.loads(partidas_json)
+        except (json.JSONDecodeError, TypeError):
+            continue
+        if not isinstance(partidas, list):
+            continue
+        actualizado = 0
+        for partida in partidas:
+            if not isinstance(partida, dict):
+                continue
+            if partida.get('categoria') == nombre_anterior:
+                partida['categoria'] = nombre_nuevo
+                actualizado += 1
+            if partida.get('categoria') == nombre_nuevo and partida.get('subcategoria') in subcats_eliminadas:
+                partida['subcategoria'] = None
+                actualizado += 1
+        if actualizado:
+            cambios.append({"id": proyeccion_id, "partidas_json": json.dumps(partidas)})
+            proyecciones_actualizadas += 1
+            partidas_actualizadas += actualizado
+    if cambios:
+        db.execute(update(Proyecciones), cambios)
+    return proyecciones_actualizadas, partidas_actualizadas
+
+
+def _migrar_categoria(job: Job, categoria_id: int, datos: dict, nombre_anterior: str,
+                      subcats_eliminadas: list[str]) -> dict:
+    """Propaga el cambio de categoría con UPDATEs por conjunto, en una sola transacción."""
+    nombre_nuevo = datos["nombre"]
+    renombrada = nombre_anterior != nombre_nuevo
+    stats = {
+        "facturas_actualizadas": 0,
+        "proyecciones_actualizadas": 0,
+        "partidas_actualizadas": 0,
+        "presupuestos_mensuales_actualizados": 0,
+        "presupuestos_anuales_actualizados": 0
+    }
+
+    db = SessionLocal()
+    try:
+        # 1. Facturas: categoría y subcategorías eliminadas
+        job.avance("Facturas", 10)
+        if renombrada:
+            stats["facturas_actualizadas"] += db.execute(
+                update(Facturas).where(Facturas.categoria == nombre_anterior)
+                .values(categoria=nombre_nuevo),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+        if subcats_eliminadas:
+            stats["facturas_actualizadas"] += db.execute(
+                update(Facturas).where(Facturas.categoria == nombre_nuevo,
+                                       Facturas.subcategoria.in_(subcats_eliminadas))
+                .values(subcategoria=None),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+
+        # 2. Proyecciones: columna categoria y partidas_json
+        job.avance("Proyecciones", 35)
+        if renombrada:
+            stats["proyecciones_actualizadas"] += db.execute(
+                update(Proyecciones).where(Proyecciones.categoria == nombre_anterior)
+                .values(categoria=nombre_nuevo),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+
+        job.avance("Partidas de proyecciones", 55)
+        if renombrada or subcats_eliminadas:
+            partidas = None
+            if db.bind.dialect.name == 'postgresql':
+                savepoint = db.begin_nested()
+                try:
+                    partidas = db.execute(_PARTIDAS_JSONB_SQL, {
+                        "anterior": nombre_anterior,
+                        "nuevo": nombre_nuevo,
+                        "eliminadas": subcats_eliminadas,
+                        "patrones": _patrones_like(nombre_anterior, nombre_nuevo),
+                    }).scalars().all()
+                    savepoint.commit()
+                except DBAPIError:
+                    # Algún partidas_json no es JSON válido: se migra fila por fila
+                    savepoint.rollback()
+            if partidas is not None:
+                stats["partidas_actualizadas"] += sum(partidas)
+                stats["proyecciones_actualizadas"] += len(partidas)
+            else:
+                filas, cambiadas = _migrar_partidas_python(db, nombre_anterior, nombre_nuevo, subcats_eliminadas)
+                stats["proyecciones_actualizadas"] += filas
+                stats["partidas_actualizadas"] += cambiadas
+
+            # Copia normalizada de las partidas
+            if renombrada:
+                db.execute(
+                    update(ProyeccionPartidas).where(ProyeccionPartidas.categoria == nombre_anterior)
+                    .values(categoria=nombre_nuevo),
+                    execution_options={"synchronize_session": False},
+                )
+            if subcats_eliminadas:
+                db.execute(
+                    update(ProyeccionPartidas).where(ProyeccionPartidas.categoria == nombre_nuevo,
+                                                     ProyeccionPartidas.subcategoria.in_(subcats_eliminadas))
+                    .values(subcategoria=None),
+                    execution_options={"synchronize_session": False},
+                )
+
+        # 3. Presupuestos mensuales
+        # Nota: PresupuestoAnual no tiene columna categoria, solo tiene monto total por año/marca
+        job.avance("Presupuestos mensuales", 80)
+        if renombrada:
+            stats["presupuestos_mensuales_actualizados"] += db.execute(
+                update(PresupuestoMensual).where(PresupuestoMensual.categoria == nombre_anterior)
+                .values(categoria=nombre_nuevo),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+
+        # 4. La categoría misma, en la misma transacción que los datos migrados
+        job.avance("Categoría", 95)
+        db.execute(
+            update(Categorias).where(Categorias.id == categoria_id).values(
+                nombre=nombre_nuevo,
+                subcategorias=json.dumps(datos["subcategorias"]),
+                activo=datos["activo"],
+                orden=datos["orden"],
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@router.put("/{categoria_id}", status_code=status.HTTP_202_ACCEPTED)
 async def update_categoria(
     user: user_dependency,
     db: db_dependency,
     categoria_request: CategoriaRequest,
     categoria_id: int = Path(gt=0)
 ):
-    """Actualizar una categoría existente y migrar todos los datos relacionados"""
+    """
+    Actualizar una categoría existente y migrar todos los datos relacionados.
+
+    La migración corre en segundo plano; la respuesta trae el job_id para
+    consultar su avance en /categorias/migraciones/{job_id}.
+    """
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
     
@@ -182,10 +374,6 @@ async def update_categoria(
             detail=f'Ya existe otra categoría "{categoria_request.nombre}"'
         )
     
-    # Guardar nombre anterior para migración
-    nombre_anterior = categoria.nombre
-    nombre_nuevo = categoria_request.nombre
-    
     # Preparar subcategorías anteriores y nuevas para migración
     subcats_anteriores = []
     if categoria.subcategorias:
@@ -194,100 +382,40 @@ async def update_categoria(
         except:
             subcats_anteriores = []
     
-    subcats_nuevas = categoria_request.subcategorias
-    
-    # Crear mapeo de subcategorías (si cambiaron nombres)
     # Por ahora, solo actualizamos subcategorías que ya no existen
-    subcats_eliminadas = [s for s in subcats_anteriores if s not in subcats_nuevas]
-    
-    # MIGRACIÓN DE DATOS
-    stats = {
-        "facturas_actualizadas": 0,
-        "proyecciones_actualizadas": 0,
-        "partidas_actualizadas": 0,
-        "presupuestos_mensuales_actualizados": 0,
-        "presupuestos_anuales_actualizados": 0
-    }
-    
-    # 1. Actualizar facturas con la categoría
-    if nombre_anterior != nombre_nuevo:
-        facturas = db.query(Facturas).filter(Facturas.categoria == nombre_anterior).all()
-        for factura in facturas:
-            factura.categoria = nombre_nuevo
-            stats["facturas_actualizadas"] += 1
-    
-    # 2. Actualizar subcategorías en facturas (si se eliminaron)
-    if subcats_eliminadas:
-        for subcat in subcats_eliminadas:
-            facturas_subcat = db.query(Facturas).filter(
-                Facturas.categoria == nombre_nuevo,
-                Facturas.subcategoria == subcat
-            ).all()
-            for factura in facturas_subcat:
-                factura.subcategoria = None  # O asignar a "Otros" si existe
-                stats["facturas_actualizadas"] += 1
-    
-    # 3. Actualizar proyecciones - necesitamos actualizar el campo partidas_json Y el campo categoria
-    proyecciones = db.query(Proyecciones).all()
-    for proyeccion in proyecciones:
-        # Actualizar campo categoria directo
-        if proyeccion.categoria == nombre_anterior:
-            proyeccion.categoria = nombre_nuevo
-            stats["proyecciones_actualizadas"] += 1
-        
-        # Actualizar partidas_json
-        if proyeccion.partidas_json:
-            try:
-                partidas = json.loads(proyeccion.partidas_json)
-                actualizado = False
-                
-                for partida in partidas:
-                    # Actualizar nombre de categoría en partidas
-                    if partida.get('categoria') == nombre_anterior:
-                        partida['categoria'] = nombre_nuevo
-                        actualizado = True
-                        stats["partidas_actualizadas"] += 1
-                    
-                    # Actualizar subcategorías eliminadas
-                    if (partida.get('categoria') == nombre_nuevo and 
-                        partida.get('subcategoria') in subcats_eliminadas):
-                        partida['subcategoria'] = None
-                        actualizado = True
-                        stats["partidas_actualizadas"] += 1
-                
-                if actualizado:
-                    proyeccion.partidas_json = json.dumps(partidas)
-                    if stats["proyecciones_actualizadas"] == 0:
-                        stats["proyecciones_actualizadas"] = 1
-            except:
-                pass
-    
-    # 4. Actualizar presupuestos mensuales
-    if nombre_anterior != nombre_nuevo:
-        presupuestos_mensuales = db.query(PresupuestoMensual).filter(
-            PresupuestoMensual.categoria == nombre_anterior
-        ).all()
-        for presupuesto in presupuestos_mensuales:
-            presupuesto.categoria = nombre_nuevo
-            stats["presupuestos_mensuales_actualizados"] += 1
-    
-    # Nota: PresupuestoAnual no tiene columna categoria, solo tiene monto total por año/marca
-    # No es necesario actualizar presupuestos anuales
-    
-    # Actualizar la categoría
-    categoria.nombre = categoria_request.nombre
-    categoria.subcategorias = json.dumps(categoria_request.subcategorias)
-    categoria.activo = categoria_request.activo
-    categoria.orden = categoria_request.orden
-    
-    db.commit()
+    subcats_eliminadas = [s for s in subcats_anteriores if s not in categoria_request.subcategorias]
+    nombre_anterior = categoria.nombre
+
+    try:
+        job = jobs.submit(
+            "migracion_categoria",
+            lambda job: _migrar_categoria(job, categoria_id, categoria_request.model_dump(),
+                                          nombre_anterior, subcats_eliminadas),
+            clave=f"categoria:{categoria_id}",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     
     return {
-        "message": "Categoría actualizada exitosamente",
-        "migracion": stats
+        "message": "Actualización de categoría en proceso",
+        "job_id": job.id,
+        "estado": job.estado,
     }
 
 
+@router.get("/migraciones/{job_id}", status_code=status.HTTP_200_OK)
+async def get_migracion_categoria(user: user_dependency, job_id: str):
+    """Estado y avance de la migración lanzada por update_categoria"""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    job = jobs.get(job_id)
+    if job is None or job.tipo != "migracion_categoria":
+        raise HTTPException(status_code=404, detail='Migración no encontrada')
+
+    return job.to_dict()
+
+
 @router.delete("/{categoria_id}", status_code=status.HTTP_200_OK)
 async def delete_categoria(
     user: user_dependency,
@@ -8,8 +8,8 @@ from models import (
     Users, Marcas, Facturas, Proyecciones, Campanas, Embajadores,
     PresenciaTradicional, PresupuestoAnual, PresupuestoMensual,
     Eventos, Proveedores, RequestLog, ActivityLog, FeatureFlag,
-    SystemSettings
 )
+from system_settings import registry as settings_registry
 from .auth import get_current_user
 from pydantic import BaseModel
 import subprocess
@@ -390,12 +390,10 @@ async def trigger_sync(
     if service in ['google_ads', 'all']:
         try:
             # Check Google Ads config
-            config = db.query(SystemSettings).filter(
-                SystemSettings.key == 'google_ads_config'
-            ).first()
+            config = settings_registry.snapshot(db).has('google_ads_config')
             results['google_ads'] = {
                 'status': 'configured' if config else 'not_configured',
-                'config_exists': config is not None,
+                'config_exists': config,
                 'message': 'Google Ads configurado' if config else 'Google Ads no configurado en SystemSettings',
             }
         except Exception as e:
@@ -403,12 +401,10 @@ async def trigger_sync(
 
     if service in ['meta_ads', 'all']:
         try:
-            config = db.query(SystemSettings).filter(
-                SystemSettings.key == 'meta_ads_config'
-            ).first()
+            config = settings_registry.snapshot(db).has('meta_ads_config')
             results['meta_ads'] = {
                 'status': 'configured' if config else 'not_configured',
-                'config_exists': config is not None,
+                'config_exists': config,
                 'message': 'Meta Ads configurado' if config else 'Meta Ads no configurado en SystemSettings',
             }
         except Exception as e:
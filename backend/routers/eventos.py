@@ -1,13 +1,17 @@
 from typing import Annotated, Optional
 from pydantic import BaseModel, Field
+from sqlalchemy import delete, func, insert, select, update
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import Response
 from starlette import status
-from models import Eventos, BriefsEventos, ActividadesEventos, CronogramasEventos, Users
+from models import Eventos, BriefsEventos, ActividadesEventos, CronogramasEventos, Users, BriefImagenes
 from database import SessionLocal
 from .auth import get_current_user
 from datetime import date, datetime
 import json
+import brief_assets
+import fast_json
 
 router = APIRouter(
     prefix='/eventos',
@@ -25,8 +29,12 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 def _strip_brief_images(obs_especiales: Optional[str]) -> Optional[str]:
-    """Strip imagenes array from observaciones_especiales JSON to reduce payload size."""
-    if not obs_especiales:
+    """Strip imagenes array from observaciones_especiales JSON to reduce payload size.
+
+    Los briefs guardados desde que las imágenes viven en brief_imagenes solo traen
+    referencias, así que únicamente se parsea el JSON de briefs legacy con data URLs.
+    """
+    if not obs_especiales or '"data:' not in obs_especiales:
         return obs_especiales
     try:
         data = json.loads(obs_especiales)
@@ -36,6 +44,33 @@ def _strip_brief_images(obs_especiales: Optional[str]) -> Optional[str]:
     except (json.JSONDecodeError, TypeError):
         return obs_especiales
 
+def _sync_brief_items(db: Session, model, brief_id: int, items: list[dict], user_id: Optional[int]) -> list[dict]:
+    """
+    Sincroniza las filas hijas de un brief (actividades o cronograma) con `items` por id:
+    borra las que ya no vienen, actualiza las existentes e inserta las nuevas, con un
+    número constante de sentencias y sin commit. Devuelve las filas en el orden recibido.
+    """
+    existentes = set(db.scalars(select(model.id).where(model.brief_id == brief_id)))
+    actualizar = [item for item in items if item.get('id') in existentes]
+    nuevas = [
+        {**{k: v for k, v in item.items() if k != 'id'}, 'brief_id': brief_id, 'user_id': user_id}
+        for item in items if item.get('id') not in existentes
+    ]
+
+    conservar = {item['id'] for item in actualizar}
+    if existentes - conservar:
+        db.execute(delete(model).where(model.id.in_(existentes - conservar)))
+    if actualizar:
+        db.execute(update(model), actualizar)
+    insertadas = iter(db.execute(
+        insert(model).returning(model.id, sort_by_parameter_order=True), nuevas
+    ).scalars().all() if nuevas else [])
+
+    return [
+        item if item.get('id') in conservar else {**item, 'id': next(insertadas)}
+        for item in items
+    ]
+
 class EventoRequest(BaseModel):
     nombre: str = Field(min_length=1, max_length=200)
     descripcion: Optional[str] = None
@@ -83,6 +118,7 @@ class EventoResponse(BaseModel):
     creado_por: str
 
 class ActividadEventoRequest(BaseModel):
+    id: Optional[int] = None  # id existente para conservarla al editar
     nombre: str
     descripcion: str
     duracion: str
@@ -91,6 +127,7 @@ class ActividadEventoRequest(BaseModel):
     orden: Optional[int] = 0
 
 class CronogramaEventoRequest(BaseModel):
+    id: Optional[int] = None  # id existente para conservarlo al editar
     actividad: str
     fecha_inicio: datetime
     fecha_fin: datetime
@@ -177,6 +214,26 @@ async def read_all_eventos(user: user_dependency, db: db_dependency,
     return query.order_by(Eventos.fecha_inicio.desc()).all()
 
 
+_CAMPOS_EVENTO = (
+    "id", "nombre", "descripcion", "tipo_evento", "fecha_inicio", "fecha_fin", "ubicacion",
+    "marca", "responsable", "estado", "objetivo", "audiencia", "horario", "audiencia_esperada",
+    "demografia", "nse", "numero_autos", "presupuesto_estimado", "presupuesto_real",
+    "observaciones", "datos_confirmacion", "creado_por", "fecha_creacion", "fecha_modificacion",
+)
+_CAMPOS_BRIEF = (
+    "id", "evento_id", "marca", "objetivo_especifico", "audiencia_detallada", "mensaje_clave",
+    "requerimientos", "proveedores", "logistica", "presupuesto_detallado",
+    "observaciones_especiales", "fecha_creacion", "fecha_modificacion", "creado_por",
+    "aprobado_por", "fecha_aprobacion", "user_id",
+)
+_CAMPOS_ACTIVIDAD = ("id", "nombre", "descripcion", "duracion", "responsable", "recursos", "orden")
+_CAMPOS_CRONOGRAMA = ("id", "actividad", "fecha_inicio", "fecha_fin", "responsable", "estado", "orden")
+
+
+def _columnas(modelo, campos) -> list:
+    return [getattr(modelo, campo) for campo in campos]
+
+
 @router.get("/with-briefs", status_code=status.HTTP_200_OK)
 async def read_all_eventos_with_briefs(user: user_dependency, db: db_dependency,
                                         marca: Optional[str] = Query(None),
@@ -188,7 +245,8 @@ async def read_all_eventos_with_briefs(user: user_dependency, db: db_dependency,
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
 
-    query = db.query(Eventos)
+    # Solo columnas y dicts: el listado se serializa con fast_json sin objetos ORM
+    query = db.query(*_columnas(Eventos, _CAMPOS_EVENTO))
     if marca:
         query = query.filter(Eventos.marca == marca)
     if estado:
@@ -198,130 +256,163 @@ async def read_all_eventos_with_briefs(user: user_dependency, db: db_dependency,
     if fecha_hasta:
         query = query.filter(Eventos.fecha_inicio <= fecha_hasta)
 
-    eventos = query.order_by(Eventos.fecha_inicio.desc()).all()
-    evento_ids = [e.id for e in eventos]
+    eventos = fast_json.filas(query.order_by(Eventos.fecha_inicio.desc()))
+    evento_ids = [e["id"] for e in eventos]
 
     # Bulk load all briefs for these eventos
-    briefs = db.query(BriefsEventos).filter(BriefsEventos.evento_id.in_(evento_ids)).all()
-    briefs_by_evento: dict[int, list] = {}
-    for b in briefs:
-        briefs_by_evento.setdefault(b.evento_id, []).append(b)
-    brief_ids = [b.id for b in briefs]
+    briefs = fast_json.filas(
+        db.query(*_columnas(BriefsEventos, _CAMPOS_BRIEF)).filter(BriefsEventos.evento_id.in_(evento_ids))
+    ) if evento_ids else []
+    brief_ids = [b["id"] for b in briefs]
 
-    # Bulk load actividades and cronogramas
-    actividades = db.query(ActividadesEventos).filter(
-        ActividadesEventos.brief_id.in_(brief_ids)
-    ).order_by(ActividadesEventos.orden).all() if brief_ids else []
-    
-    cronogramas = db.query(CronogramasEventos).filter(
-        CronogramasEventos.brief_id.in_(brief_ids)
-    ).order_by(CronogramasEventos.orden).all() if brief_ids else []
+    # Bulk load actividades and cronogramas, indexed by brief_id
+    acts_by_brief = {}
+    crons_by_brief = {}
+    if brief_ids:
+        for brief_id, *valores in db.query(
+            ActividadesEventos.brief_id, *_columnas(ActividadesEventos, _CAMPOS_ACTIVIDAD)
+        ).filter(ActividadesEventos.brief_id.in_(brief_ids)).order_by(ActividadesEventos.orden):
+            acts_by_brief.setdefault(brief_id, []).append(dict(zip(_CAMPOS_ACTIVIDAD, valores)))
+        for brief_id, *valores in db.query(
+            CronogramasEventos.brief_id, *_columnas(CronogramasEventos, _CAMPOS_CRONOGRAMA)
+        ).filter(CronogramasEventos.brief_id.in_(brief_ids)).order_by(CronogramasEventos.orden):
+            crons_by_brief.setdefault(brief_id, []).append(dict(zip(_CAMPOS_CRONOGRAMA, valores)))
 
     # Bulk load creator names
-    user_ids = list(set(b.user_id for b in briefs if b.user_id))
+    user_ids = list(set(b["user_id"] for b in briefs if b["user_id"]))
     users_map = {}
     if user_ids:
-        users = db.query(Users).filter(Users.id.in_(user_ids)).all()
+        users = db.query(Users.id, Users.full_name, Users.username).filter(Users.id.in_(user_ids)).all()
         users_map = {u.id: u.full_name or u.username for u in users}
 
-    # Index actividades and cronogramas by brief_id
-    acts_by_brief = {}
-    for a in actividades:
-        acts_by_brief.setdefault(a.brief_id, []).append(a)
-    crons_by_brief = {}
-    for c in cronogramas:
-        crons_by_brief.setdefault(c.brief_id, []).append(c)
+    briefs_by_evento: dict[int, list] = {}
+    for brief in briefs:
+        user_id = brief.pop("user_id")
+        if user_id:
+            brief["creado_por"] = users_map.get(user_id, brief["creado_por"])
+        if not include_images:
+            brief["observaciones_especiales"] = _strip_brief_images(brief["observaciones_especiales"])
+        brief["actividades"] = acts_by_brief.get(brief["id"], [])
+        brief["cronograma"] = crons_by_brief.get(brief["id"], [])
+        briefs_by_evento.setdefault(brief["evento_id"], []).append(brief)
 
-    result = []
     for evento in eventos:
-        evento_briefs = briefs_by_evento.get(evento.id, [])
-        briefs_data = []
-        for brief in evento_briefs:
-            creado_por = users_map.get(brief.user_id, brief.creado_por) if brief.user_id else brief.creado_por
-            briefs_data.append({
-                "id": brief.id,
-                "evento_id": brief.evento_id,
-                "marca": brief.marca,
-                "objetivo_especifico": brief.objetivo_especifico,
-                "audiencia_detallada": brief.audiencia_detallada,
-                "mensaje_clave": brief.mensaje_clave,
-                "actividades": [
-                    {"id": a.id, "nombre": a.nombre, "descripcion": a.descripcion,
-                     "duracion": a.duracion, "responsable": a.responsable,
-                     "recursos": a.recursos, "orden": a.orden}
-                    for a in acts_by_brief.get(brief.id, [])
-                ],
-                "cronograma": [
-                    {"id": c.id, "actividad": c.actividad,
-                     "fecha_inicio": c.fecha_inicio.isoformat() if c.fecha_inicio else None,
-                     "fecha_fin": c.fecha_fin.isoformat() if c.fecha_fin else None,
-                     "responsable": c.responsable, "estado": c.estado, "orden": c.orden}
-                    for c in crons_by_brief.get(brief.id, [])
-                ],
-                "requerimientos": brief.requerimientos,
-                "proveedores": brief.proveedores,
-                "logistica": brief.logistica,
-                "presupuesto_detallado": brief.presupuesto_detallado,
-                "observaciones_especiales": brief.observaciones_especiales if include_images else _strip_brief_images(brief.observaciones_especiales),
-                "fecha_creacion": brief.fecha_creacion.isoformat() if brief.fecha_creacion else None,
-                "fecha_modificacion": brief.fecha_modificacion.isoformat() if brief.fecha_modificacion else None,
-                "creado_por": creado_por,
-                "aprobado_por": brief.aprobado_por,
-                "fecha_aprobacion": brief.fecha_aprobacion.isoformat() if brief.fecha_aprobacion else None,
-            })
-
-        result.append({
-            "id": evento.id,
-            "nombre": evento.nombre,
-            "descripcion": evento.descripcion,
-            "tipo_evento": evento.tipo_evento,
-            "fecha_inicio": evento.fecha_inicio.isoformat() if evento.fecha_inicio else None,
-            "fecha_fin": evento.fecha_fin.isoformat() if evento.fecha_fin else None,
-            "ubicacion": evento.ubicacion,
-            "marca": evento.marca,
-            "responsable": evento.responsable,
-            "estado": evento.estado,
-            "objetivo": evento.objetivo,
-            "audiencia": evento.audiencia,
-            "horario": evento.horario,
-            "audiencia_esperada": evento.audiencia_esperada,
-            "demografia": evento.demografia,
-            "nse": evento.nse,
-            "numero_autos": evento.numero_autos,
-            "presupuesto_estimado": evento.presupuesto_estimado,
-            "presupuesto_real": evento.presupuesto_real,
-            "observaciones": evento.observaciones,
-            "datos_confirmacion": evento.datos_confirmacion,
-            "creado_por": evento.creado_por,
-            "fecha_creacion": evento.fecha_creacion.isoformat() if evento.fecha_creacion else None,
-            "fecha_modificacion": evento.fecha_modificacion.isoformat() if evento.fecha_modificacion else None,
-            "briefs": briefs_data,
-        })
+        evento["briefs"] = briefs_by_evento.get(evento["id"], [])
+
+    return fast_json.FastJSONResponse(eventos)
+
+def filtrar_eventos(query, marca: Optional[str], fecha_desde: Optional[date], fecha_hasta: Optional[date]):
+    """Filtros por marca y rango de fecha_inicio (cubiertos por ix_eventos_marca_fecha_inicio)."""
+    if marca:
+        query = query.filter(Eventos.marca == marca)
+    if fecha_desde:
+        query = query.filter(Eventos.fecha_inicio >= fecha_desde)
+    if fecha_hasta:
+        query = query.filter(Eventos.fecha_inicio <= fecha_hasta)
+    return query
 
-    return result
+ESTADOS_ESTADISTICAS = {
+    "Realizado": "realizados",
+    "Prospectado": "prospectados",
+    "Confirmado": "confirmados",
+    "Cancelado": "cancelados",
+}
 
 @router.get("/estadisticas", status_code=status.HTTP_200_OK)
-async def get_estadisticas_eventos(user: user_dependency, db: db_dependency):
+async def get_estadisticas_eventos(user: user_dependency, db: db_dependency,
+                                   marca: Optional[str] = Query(None),
+                                   fecha_desde: Optional[date] = Query(None),
+                                   fecha_hasta: Optional[date] = Query(None)):
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
-    
-    eventos = db.query(Eventos).all()
-    
-    estadisticas = {
-        "realizados": sum(1 for e in eventos if e.estado == "Realizado"),
-        "prospectados": sum(1 for e in eventos if e.estado == "Prospectado"),
-        "confirmados": sum(1 for e in eventos if e.estado == "Confirmado"),
-        "cancelados": sum(1 for e in eventos if e.estado == "Cancelado"),
-        "total": len(eventos),
-        "presupuestoTotal": sum(e.presupuesto_estimado or 0 for e in eventos),
-        "presupuestoReal": sum(e.presupuesto_real or 0 for e in eventos),
-        "marcas": list(set(e.marca for e in eventos if e.marca)),
-        "responsables": list(set(e.responsable for e in eventos if e.responsable))
-    }
+
+    # Una sola consulta agrupada; el número de grupos depende de estados × marcas × responsables,
+    # no de cuántos eventos haya
+    query = db.query(
+        Eventos.estado,
+        Eventos.marca,
+        Eventos.responsable,
+        func.count(Eventos.id),
+        func.coalesce(func.sum(Eventos.presupuesto_estimado), 0),
+        func.coalesce(func.sum(Eventos.presupuesto_real), 0),
+    )
+    grupos = filtrar_eventos(query, marca, fecha_desde, fecha_hasta)\
+        .group_by(Eventos.estado, Eventos.marca, Eventos.responsable).all()
+
+    estadisticas = {clave: 0 for clave in ESTADOS_ESTADISTICAS.values()}
+    por_estado: dict[str, int] = {}
+    marcas, responsables = set(), set()
+    total = presupuesto_total = presupuesto_real = 0
+    for estado, marca_evento, responsable, cantidad, estimado, real in grupos:
+        por_estado[estado] = por_estado.get(estado, 0) + cantidad
+        if estado in ESTADOS_ESTADISTICAS:
+            estadisticas[ESTADOS_ESTADISTICAS[estado]] += cantidad
+        total += cantidad
+        presupuesto_total += estimado or 0
+        presupuesto_real += real or 0
+        if marca_evento:
+            marcas.add(marca_evento)
+        if responsable:
+            responsables.add(responsable)
+
+    estadisticas.update({
+        "total": total,
+        "presupuestoTotal": presupuesto_total,
+        "presupuestoReal": presupuesto_real,
+        "marcas": sorted(marcas),
+        "responsables": sorted(responsables),
+        "porEstado": por_estado,
+    })
     estadisticas["diferencia"] = estadisticas["presupuestoTotal"] - estadisticas["presupuestoReal"]
-    
+
     return estadisticas
 
+@router.get("/calendario", status_code=status.HTTP_200_OK)
+async def get_calendario_eventos(user: user_dependency, db: db_dependency,
+                                 agrupacion: str = Query("mes", pattern="^(mes|semana)$"),
+                                 marca: Optional[str] = Query(None),
+                                 fecha_desde: Optional[date] = Query(None),
+                                 fecha_hasta: Optional[date] = Query(None)):
+    """Eventos y presupuesto por mes o semana (lunes) de fecha_inicio, agrupados en SQL."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    if db.bind.dialect.name == 'sqlite':
+        if agrupacion == 'mes':
+            periodo = func.date(Eventos.fecha_inicio, 'start of month')
+        else:
+            periodo = func.date(Eventos.fecha_inicio, 'weekday 0', '-6 days')
+    else:
+        periodo = func.date(func.date_trunc('month' if agrupacion == 'mes' else 'week', Eventos.fecha_inicio))
+    periodo = periodo.label('periodo')
+
+    query = db.query(
+        periodo,
+        Eventos.estado,
+        func.count(Eventos.id),
+        func.coalesce(func.sum(Eventos.presupuesto_estimado), 0),
+        func.coalesce(func.sum(Eventos.presupuesto_real), 0),
+    ).filter(Eventos.fecha_inicio.isnot(None))
+    grupos = filtrar_eventos(query, marca, fecha_desde, fecha_hasta)\
+        .group_by(periodo, Eventos.estado).order_by(periodo).all()
+
+    buckets: dict[str, dict] = {}
+    for inicio, estado, cantidad, estimado, real in grupos:
+        inicio = str(inicio)[:10]
+        bucket = buckets.setdefault(inicio, {
+            "inicio": inicio,
+            "total": 0,
+            "por_estado": {},
+            "presupuesto_estimado": 0,
+            "presupuesto_real": 0,
+        })
+        bucket["total"] += cantidad
+        bucket["por_estado"][estado] = bucket["por_estado"].get(estado, 0) + cantidad
+        bucket["presupuesto_estimado"] += estimado or 0
+        bucket["presupuesto_real"] += real or 0
+
+    return {"agrupacion": agrupacion, "periodos": list(buckets.values())}
+
 @router.get("/{evento_id}", response_model=EventoResponse, status_code=status.HTTP_200_OK)
 async def read_evento(user: user_dependency, db: db_dependency, evento_id: int = Path(gt=0)):
     if user is None:
@@ -404,31 +495,50 @@ async def update_evento(user: user_dependency, db: db_dependency,
     db.add(evento)
     db.commit()
 
+def _eliminar_eventos(db: Session, evento_ids: list[int]) -> list[int]:
+    """
+    Borra eventos con sus briefs, actividades, cronogramas e imágenes usando un
+    DELETE por tabla (brief_id IN subconsulta), sin importar cuántos briefs haya.
+    No hace commit. Devuelve los ids de eventos efectivamente borrados.
+    """
+    briefs = select(BriefsEventos.id).where(BriefsEventos.evento_id.in_(evento_ids))
+    for model in (ActividadesEventos, CronogramasEventos, BriefImagenes):
+        db.execute(delete(model).where(model.brief_id.in_(briefs)), execution_options={"synchronize_session": False})
+    db.execute(delete(BriefsEventos).where(BriefsEventos.evento_id.in_(evento_ids)),
+               execution_options={"synchronize_session": False})
+    return list(db.scalars(
+        delete(Eventos).where(Eventos.id.in_(evento_ids)).returning(Eventos.id),
+        execution_options={"synchronize_session": False},
+    ))
+
+class EliminarEventosRequest(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=1000)
+
+@router.post("/eliminar-lote", status_code=status.HTTP_200_OK)
+async def delete_eventos_lote(user: user_dependency, db: db_dependency, request: EliminarEventosRequest):
+    """Borra varios eventos (y todo lo que cuelga de sus briefs) en una sola transacción."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    ids = sorted(set(request.ids))
+    eliminados = _eliminar_eventos(db, ids)
+    db.commit()
+
+    return {
+        "eliminados": len(eliminados),
+        "ids": sorted(eliminados),
+        "no_encontrados": sorted(set(ids) - set(eliminados)),
+    }
+
 @router.delete("/{evento_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_evento(user: user_dependency, db: db_dependency, evento_id: int = Path(gt=0)):
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
 
-    evento = db.query(Eventos).filter(Eventos.id == evento_id).first()
-    
-    if evento is None:
+    if not _eliminar_eventos(db, [evento_id]):
+        db.rollback()
         raise HTTPException(status_code=404, detail='Evento no encontrado')
 
-    # Buscar los briefs asociados al evento
-    event_briefs = db.query(BriefsEventos).filter(BriefsEventos.evento_id == evento_id).all()
-    
-    for brief in event_briefs:
-        # Eliminar actividades del brief
-        db.query(ActividadesEventos).filter(ActividadesEventos.brief_id == brief.id).delete()
-        
-        # Eliminar cronogramas del brief
-        db.query(CronogramasEventos).filter(CronogramasEventos.brief_id == brief.id).delete()
-        
-        # Eliminar el brief
-        db.delete(brief)
-    
-    # Eliminar el evento
-    db.delete(evento)
     db.commit()
 
 # ENDPOINTS PARA BRIEFS
@@ -466,7 +576,6 @@ async def create_brief(user: user_dependency, db: db_dependency,
         proveedores=brief_request.proveedores,
         logistica=brief_request.logistica,
         presupuesto_detallado=brief_request.presupuesto_detallado,
-        observaciones_especiales=brief_request.observaciones_especiales,
         creado_por=user.get('username'),
         aprobado_por=brief_request.aprobado_por,
         fecha_aprobacion=brief_request.fecha_aprobacion,
@@ -474,62 +583,24 @@ async def create_brief(user: user_dependency, db: db_dependency,
     )
     
     db.add(brief_model)
+    db.flush()
+    brief_model.observaciones_especiales = brief_assets.externalizar_imagenes(
+        db, brief_model.id, brief_request.observaciones_especiales, user.get('username')
+    )
+    
+    actividades = _sync_brief_items(
+        db, ActividadesEventos, brief_model.id,
+        [a.model_dump(exclude={'id'}) for a in brief_request.actividades], user.get('id')
+    )
+    cronograma = _sync_brief_items(
+        db, CronogramasEventos, brief_model.id,
+        [c.model_dump(exclude={'id'}) for c in brief_request.cronograma], user.get('id')
+    )
     db.commit()
     db.refresh(brief_model)
-    
-    # Agregar actividades
-    actividades_response = []
-    for actividad_request in brief_request.actividades:
-        actividad_model = ActividadesEventos(
-            brief_id=brief_model.id,
-            nombre=actividad_request.nombre,
-            descripcion=actividad_request.descripcion,
-            duracion=actividad_request.duracion,
-            responsable=actividad_request.responsable,
-            recursos=actividad_request.recursos,
-            orden=actividad_request.orden,
-            user_id=user.get('id')
-        )
-        db.add(actividad_model)
-        db.commit()
-        db.refresh(actividad_model)
-        
-        actividades_response.append(ActividadEventoResponse(
-            id=actividad_model.id,
-            nombre=actividad_model.nombre,
-            descripcion=actividad_model.descripcion,
-            duracion=actividad_model.duracion,
-            responsable=actividad_model.responsable,
-            recursos=actividad_model.recursos,
-            orden=actividad_model.orden
-        ))
-    
-    # Agregar cronograma
-    cronograma_response = []
-    for cronograma_request in brief_request.cronograma:
-        cronograma_model = CronogramasEventos(
-            brief_id=brief_model.id,
-            actividad=cronograma_request.actividad,
-            fecha_inicio=cronograma_request.fecha_inicio,
-            fecha_fin=cronograma_request.fecha_fin,
-            responsable=cronograma_request.responsable,
-            estado=cronograma_request.estado,
-            orden=cronograma_request.orden,
-            user_id=user.get('id')
-        )
-        db.add(cronograma_model)
-        db.commit()
-        db.refresh(cronograma_model)
-        
-        cronograma_response.append(CronogramaEventoResponse(
-            id=cronograma_model.id,
-            actividad=cronograma_model.actividad,
-            fecha_inicio=cronograma_model.fecha_inicio,
-            fecha_fin=cronograma_model.fecha_fin,
-            responsable=cronograma_model.responsable,
-            estado=cronograma_model.estado,
-            orden=cronograma_model.orden
-        ))
+
+    actividades_response = [ActividadEventoResponse(**a) for a in actividades]
+    cronograma_response = [CronogramaEventoResponse(**c) for c in cronograma]
     
     return BriefEventoResponse(
         id=brief_model.id,
@@ -666,72 +737,26 @@ async def update_brief(user: user_dependency, db: db_dependency,
     brief.proveedores = brief_request.proveedores
     brief.logistica = brief_request.logistica
     brief.presupuesto_detallado = brief_request.presupuesto_detallado
-    brief.observaciones_especiales = brief_request.observaciones_especiales
+    brief.observaciones_especiales = brief_assets.externalizar_imagenes(
+        db, brief.id, brief_request.observaciones_especiales, user.get('username')
+    )
     brief.aprobado_por = brief_request.aprobado_por
     brief.fecha_aprobacion = brief_request.fecha_aprobacion
     
-    db.add(brief)
-    db.commit()
-    
-    # Eliminar actividades existentes y crear nuevas
-    db.query(ActividadesEventos).filter(ActividadesEventos.brief_id == brief.id).delete()
-    db.commit()
-    
-    actividades_response = []
-    for actividad_request in brief_request.actividades:
-        actividad_model = ActividadesEventos(
-            brief_id=brief.id,
-            nombre=actividad_request.nombre,
-            descripcion=actividad_request.descripcion,
-            duracion=actividad_request.duracion,
-            responsable=actividad_request.responsable,
-            recursos=actividad_request.recursos,
-            orden=actividad_request.orden,
-            user_id=user.get('id')
-        )
-        db.add(actividad_model)
-        db.commit()
-        db.refresh(actividad_model)
-        
-        actividades_response.append(ActividadEventoResponse(
-            id=actividad_model.id,
-            nombre=actividad_model.nombre,
-            descripcion=actividad_model.descripcion,
-            duracion=actividad_model.duracion,
-            responsable=actividad_model.responsable,
-            recursos=actividad_model.recursos,
-            orden=actividad_model.orden
-        ))
-    
-    # Eliminar cronograma existente y crear nuevo
-    db.query(CronogramasEventos).filter(CronogramasEventos.brief_id == brief.id).delete()
+    # Sincronizar actividades y cronograma por id, todo en una sola transacción
+    actividades = _sync_brief_items(
+        db, ActividadesEventos, brief.id,
+        [a.model_dump() for a in brief_request.actividades], user.get('id')
+    )
+    cronograma = _sync_brief_items(
+        db, CronogramasEventos, brief.id,
+        [c.model_dump() for c in brief_request.cronograma], user.get('id')
+    )
     db.commit()
-    
-    cronograma_response = []
-    for cronograma_request in brief_request.cronograma:
-        cronograma_model = CronogramasEventos(
-            brief_id=brief.id,
-            actividad=cronograma_request.actividad,
-            fecha_inicio=cronograma_request.fecha_inicio,
-            fecha_fin=cronograma_request.fecha_fin,
-            responsable=cronograma_request.responsable,
-            estado=cronograma_request.estado,
-            orden=cronograma_request.orden,
-            user_id=user.get('id')
-        )
-        db.add(cronograma_model)
-        db.commit()
-        db.refresh(cronograma_model)
-        
-        cronograma_response.append(CronogramaEventoResponse(
-            id=cronograma_model.id,
-            actividad=cronograma_model.actividad,
-            fecha_inicio=cronograma_model.fecha_inicio,
-            fecha_fin=cronograma_model.fecha_fin,
-            responsable=cronograma_model.responsable,
-            estado=cronograma_model.estado,
-            orden=cronograma_model.orden
-        ))
+    db.refresh(brief)
+
+    actividades_response = [ActividadEventoResponse(**a) for a in actividades]
+    cronograma_response = [CronogramaEventoResponse(**c) for c in cronograma]
     
     return BriefEventoResponse(
         id=brief.id,
@@ -774,10 +799,48 @@ async def delete_brief(user: user_dependency, db: db_dependency, evento_id: int,
     if brief is None:
         raise HTTPException(status_code=404, detail='Brief no encontrado')
     
-    # Eliminar actividades y cronograma relacionados
-    db.query(ActividadesEventos).filter(ActividadesEventos.brief_id == brief.id).delete()
-    db.query(CronogramasEventos).filter(CronogramasEventos.brief_id == brief.id).delete()
+    # Eliminar actividades, cronograma e imágenes relacionados
+    for model in (ActividadesEventos, CronogramasEventos, BriefImagenes):
+        db.query(model).filter(model.brief_id == brief.id).delete(synchronize_session=False)
     
     # Eliminar el brief
     db.delete(brief)
-    db.commit()
\ No newline at end of file
+    db.commit()
+
+
+@router.get("/{evento_id}/brief/imagenes", status_code=status.HTTP_200_OK)
+async def list_brief_imagenes(user: user_dependency, db: db_dependency, evento_id: int,
+                              marca: Optional[str] = Query(None),
+                              variante: str = Query(brief_assets.ORIGINAL, pattern="^(original|miniatura)$")):
+    """Imágenes del brief como data URLs, para cargarlas solo cuando la UI las necesita."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    query = db.query(BriefsEventos.id, BriefsEventos.observaciones_especiales)\
+        .filter(BriefsEventos.evento_id == evento_id)
+    if marca:
+        query = query.filter(BriefsEventos.marca == marca)
+    brief = query.first()
+    if brief is None:
+        raise HTTPException(status_code=404, detail='Brief no encontrado')
+
+    return brief_assets.listar_imagenes(db, brief.id, brief.observaciones_especiales, variante)
+
+@router.get("/{evento_id}/brief/imagenes/{imagen_id}", status_code=status.HTTP_200_OK)
+async def get_brief_imagen(user: user_dependency, db: db_dependency, request: Request,
+                           evento_id: int, imagen_id: int,
+                           variante: str = Query(brief_assets.ORIGINAL, pattern="^(original|miniatura)$")):
+    """Una imagen del brief en binario, con ETag para que el navegador la reutilice."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    imagen = db.query(BriefImagenes).join(BriefsEventos, BriefsEventos.id == BriefImagenes.brief_id)\
+        .filter(BriefImagenes.id == imagen_id, BriefsEventos.evento_id == evento_id).first()
+    if imagen is None:
+        raise HTTPException(status_code=404, detail='Imagen no encontrada')
+
+    headers = {"ETag": brief_assets.etag(imagen, variante), "Cache-Control": brief_assets.CACHE_CONTROL}
+    if headers["ETag"] in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    content, content_type = brief_assets.contenido_variante(imagen, variante)
+    return Response(content=content, media_type=content_type, headers=headers)
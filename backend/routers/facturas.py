@@ -1,17 +1,26 @@
 from typing import Annotated, Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, HTTPException, Path, Query, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from starlette import status
-from models import Facturas, Proyecciones, FacturaArchivos, FacturaCotizaciones, Eventos, Campanas
+from models import Facturas, Proyecciones, FacturaArchivos, FacturaCotizaciones, Eventos, Campanas, Proveedores
 from database import SessionLocal
-from sqlalchemy import func, extract
+from sqlalchemy import extract, func, insert, or_, select, update
 from .auth import get_current_user
-from datetime import date
+from background_jobs import jobs
+from datetime import date, timedelta
 import base64
 import io
 import mimetypes
+import zipfile
+import fast_json
+import busqueda_facturas
+import exportador
+import paquete_archivos
+import cfdi
+import duplicados_facturas
+import cuentas_por_pagar
 
 def can_access_facturas(user_role: str) -> bool:
     """Determina si el usuario puede acceder a facturas según su rol"""
@@ -43,20 +52,27 @@ def can_mark_paid_facturas(user_role: str) -> bool:
     # Administradores, developers y coordinadores pueden marcar como pagadas
     return user_role in ['administrador', 'admin', 'developer', 'coordinador', 'coor']
 
-def get_facturas_query_for_user(query, user_role: str, user_id: int):
-    """Aplica filtros a las facturas según el rol del usuario"""
+def facturas_restringidas_a(user_role: str, user_id: int) -> Optional[int]:
+    """user_id al que se limitan las facturas visibles para el rol; None si ve todas"""
     if user_role in ['administrador', 'admin', 'developer']:
         # Los administradores y developers ven todas las facturas
-        return query
+        return None
     elif user_role in ['coordinador', 'coor']:
         # Los coordinadores ven todas las facturas también
-        return query
+        return None
     elif user_role in ['auditor', 'aud']:
         # Los auditores ven todas las facturas también (solo lectura)
-        return query
+        return None
     else:
         # Usuarios sin rol definido solo ven sus propias facturas
-        return query.filter(Facturas.user_id == user_id)
+        return user_id
+
+def get_facturas_query_for_user(query, user_role: str, user_id: int):
+    """Aplica filtros a las facturas según el rol del usuario"""
+    restringido = facturas_restringidas_a(user_role, user_id)
+    if restringido is None:
+        return query
+    return query.filter(Facturas.user_id == restringido)
 
 router = APIRouter(
     prefix='/facturas',
@@ -84,6 +100,44 @@ def actualizar_monto_real_proyeccion(db: Session, proyeccion_id: int):
         proyeccion.monto_real = total_facturas
         db.commit()
 
+def actualizar_montos_reales_proyecciones(db: Session, proyeccion_ids):
+    """Recalcula monto_real de varias proyecciones en un solo UPDATE. No hace commit."""
+    proyeccion_ids = {pid for pid in proyeccion_ids if pid}
+    if not proyeccion_ids:
+        return
+    total = select(func.coalesce(func.sum(Facturas.monto), 0))\
+        .where(Facturas.proyeccion_id == Proyecciones.id).scalar_subquery()
+    db.execute(
+        update(Proyecciones).where(Proyecciones.id.in_(proyeccion_ids)).values(monto_real=total),
+        execution_options={"synchronize_session": False},
+    )
+
+def rango_anio(anio: int) -> tuple[date, date]:
+    """Rango semiabierto [1 ene, 1 ene siguiente) para filtrar fechas usando índices."""
+    return date(anio, 1, 1), date(anio + 1, 1, 1)
+
+def rango_meses(anio: int, mes_inicio: int, mes_fin: int) -> tuple[date, date]:
+    """Rango semiabierto que cubre de mes_inicio a mes_fin (inclusive) de `anio`."""
+    fin = date(anio + 1, 1, 1) if mes_fin == 12 else date(anio, mes_fin + 1, 1)
+    return date(anio, mes_inicio, 1), fin
+
+def filtrar_facturas(query, marca: Optional[str] = None, estado: Optional[str] = None,
+                     categoria: Optional[str] = None, autorizada: Optional[bool] = None,
+                     anio: Optional[int] = None):
+    """Filtros del listado de facturas; el año es un rango sobre fecha_factura (sargable)."""
+    if marca:
+        query = query.filter(Facturas.marca == marca)
+    if estado:
+        query = query.filter(Facturas.estado == estado)
+    if categoria:
+        query = query.filter(Facturas.categoria == categoria)
+    if autorizada is not None:
+        query = query.filter(Facturas.autorizada == autorizada)
+    if anio:
+        desde, hasta = rango_anio(anio)
+        query = query.filter(Facturas.fecha_factura >= desde, Facturas.fecha_factura < hasta)
+    return query
+
 class ArchivoResponse(BaseModel):
     id: int
     nombre_archivo: str
@@ -216,6 +270,26 @@ async def get_campanyas_disponibles(user: user_dependency, db: db_dependency):
         for c in campanyas
     ]
 
+def consulta_facturas(db: Session, user: dict, marca: Optional[str] = None, estado: Optional[str] = None,
+                      categoria: Optional[str] = None, autorizada: Optional[bool] = None,
+                      anio: Optional[int] = None):
+    """
+    Query del listado: columnas del FacturaResponse + nombres de evento/campaña
+    en la misma consulta, con el filtro por rol y los filtros del listado.
+    """
+    query = db.query(
+        *fast_json.columnas(Facturas, FacturaResponse),
+        Eventos.nombre.label("evento_nombre"),
+        Campanas.nombre.label("campanya_nombre"),
+    ).select_from(Facturas)\
+        .outerjoin(Eventos, Eventos.id == Facturas.evento_id)\
+        .outerjoin(Campanas, Campanas.id == Facturas.campanya_id)
+    
+    # Aplicar filtros según el rol del usuario
+    query = get_facturas_query_for_user(query, user.get('role', ''), user.get('id'))
+    
+    return filtrar_facturas(query, marca, estado, categoria, autorizada, anio)
+
 @router.get("/", response_model=list[FacturaResponse], status_code=status.HTTP_200_OK)
 async def read_all_facturas(user: user_dependency, db: db_dependency,
                            marca: Optional[str] = Query(None),
@@ -232,144 +306,287 @@ async def read_all_facturas(user: user_dependency, db: db_dependency,
     if not can_access_facturas(user_role):
         raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
     
-    query = db.query(Facturas)
-    
-    # Aplicar filtros según el rol del usuario
-    query = get_facturas_query_for_user(query, user_role, user.get('id'))
-    
-    if marca:
-        query = query.filter(Facturas.marca == marca)
-    if estado:
-        query = query.filter(Facturas.estado == estado)
-    if categoria:
-        query = query.filter(Facturas.categoria == categoria)
-    if autorizada is not None:
-        query = query.filter(Facturas.autorizada == autorizada)
-    if anio:
-        query = query.filter(extract('year', Facturas.fecha_factura) == anio)
+    # Se serializa desde las tuplas sin construir modelos Pydantic por fila
+    query = consulta_facturas(db, user, marca, estado, categoria, autorizada, anio)
 
     query = query.offset(offset)
     if limit:
         query = query.limit(limit)
 
-    facturas = query.all()
+    facturas = fast_json.filas(query)
     
     # Bulk load related data to avoid N+1 queries
-    factura_ids = [f.id for f in facturas]
+    factura_ids = [f["id"] for f in facturas]
     
     # Bulk load archivos — excluir contenido_archivo (LargeBinary) para no transferir
     # los PDFs/XMLs en cada listado; se descargan individualmente via /archivos/{id}/descargar
-    all_archivos = db.query(
-        FacturaArchivos.id,
-        FacturaArchivos.factura_id,
-        FacturaArchivos.nombre_archivo,
-        FacturaArchivos.tipo_archivo,
-        FacturaArchivos.tamaño_archivo,
-        FacturaArchivos.fecha_subida,
-        FacturaArchivos.seccion,
-    ).filter(
-        FacturaArchivos.factura_id.in_(factura_ids)
-    ).all() if factura_ids else []
     archivos_by_factura = {}
-    for archivo in all_archivos:
-        archivos_by_factura.setdefault(archivo.factura_id, []).append(archivo)
+    if factura_ids:
+        for factura_id, *archivo in db.query(
+            FacturaArchivos.factura_id,
+            FacturaArchivos.id,
+            FacturaArchivos.nombre_archivo,
+            FacturaArchivos.tipo_archivo,
+            FacturaArchivos.tamaño_archivo,
+            FacturaArchivos.fecha_subida,
+            FacturaArchivos.seccion,
+        ).filter(FacturaArchivos.factura_id.in_(factura_ids)):
+            archivo_id, nombre, tipo, tamaño, fecha_subida, seccion = archivo
+            archivos_by_factura.setdefault(factura_id, []).append({
+                "id": archivo_id,
+                "nombre_archivo": nombre,
+                "tipo_archivo": tipo,
+                "tamaño_archivo": tamaño,
+                "fecha_subida": fecha_subida.strftime("%Y-%m-%d %H:%M:%S"),
+                "seccion": seccion,
+            })
     
     # Bulk load cotizaciones — excluir contenido_archivo por la misma razón
-    all_cotizaciones = db.query(
-        FacturaCotizaciones.id,
-        FacturaCotizaciones.factura_id,
-        FacturaCotizaciones.proveedor,
-        FacturaCotizaciones.monto,
-        FacturaCotizaciones.nombre_archivo,
-        FacturaCotizaciones.tamaño_archivo,
-        FacturaCotizaciones.fecha_subida,
-        FacturaCotizaciones.observaciones,
-    ).filter(
-        FacturaCotizaciones.factura_id.in_(factura_ids)
-    ).all() if factura_ids else []
     cotizaciones_by_factura = {}
-    for cotizacion in all_cotizaciones:
-        cotizaciones_by_factura.setdefault(cotizacion.factura_id, []).append(cotizacion)
-    
-    # Bulk load evento names (select only needed columns to avoid issues with schema changes)
-    evento_ids = list(set(f.evento_id for f in facturas if f.evento_id))
-    eventos_map = {}
-    if evento_ids:
-        eventos_list = db.query(Eventos.id, Eventos.nombre).filter(Eventos.id.in_(evento_ids)).all()
-        eventos_map = {e.id: e.nombre for e in eventos_list}
-    
-    # Bulk load campaña names
-    campanya_ids = list(set(f.campanya_id for f in facturas if f.campanya_id))
-    campanyas_map = {}
-    if campanya_ids:
-        campanyas_list = db.query(Campanas).filter(Campanas.id.in_(campanya_ids)).all()
-        campanyas_map = {c.id: c.nombre for c in campanyas_list}
-
-    facturas_con_archivos = []
+    if factura_ids:
+        for factura_id, *cotizacion in db.query(
+            FacturaCotizaciones.factura_id,
+            FacturaCotizaciones.id,
+            FacturaCotizaciones.proveedor,
+            FacturaCotizaciones.monto,
+            FacturaCotizaciones.nombre_archivo,
+            FacturaCotizaciones.tamaño_archivo,
+            FacturaCotizaciones.fecha_subida,
+            FacturaCotizaciones.observaciones,
+        ).filter(FacturaCotizaciones.factura_id.in_(factura_ids)):
+            cotizacion_id, proveedor, monto, nombre, tamaño, fecha_subida, observaciones = cotizacion
+            cotizaciones_by_factura.setdefault(factura_id, []).append({
+                "id": cotizacion_id,
+                "proveedor": proveedor,
+                "monto": monto,
+                "nombre_archivo": nombre,
+                "tamaño_archivo": tamaño,
+                "fecha_subida": fecha_subida.strftime("%Y-%m-%d %H:%M:%S"),
+                "observaciones": observaciones,
+            })
+
     for factura in facturas:
-        archivos_response = [
-            ArchivoResponse(
-                id=archivo.id,
-                nombre_archivo=archivo.nombre_archivo,
-                tipo_archivo=archivo.tipo_archivo,
-                tamaño_archivo=archivo.tamaño_archivo,
-                fecha_subida=archivo.fecha_subida.strftime("%Y-%m-%d %H:%M:%S"),
-                seccion=archivo.seccion
-            ) for archivo in archivos_by_factura.get(factura.id, [])
-        ]
-        
-        cotizaciones_response = [
-            CotizacionResponse(
-                id=cotizacion.id,
-                proveedor=cotizacion.proveedor,
-                monto=cotizacion.monto,
-                nombre_archivo=cotizacion.nombre_archivo,
-                tamaño_archivo=cotizacion.tamaño_archivo,
-                fecha_subida=cotizacion.fecha_subida.strftime("%Y-%m-%d %H:%M:%S"),
-                observaciones=cotizacion.observaciones
-            ) for cotizacion in cotizaciones_by_factura.get(factura.id, [])
-        ]
-        
-        evento_nombre = eventos_map.get(factura.evento_id) if factura.evento_id else None
-        campanya_nombre = campanyas_map.get(factura.campanya_id) if factura.campanya_id else None
-        
-        facturas_con_archivos.append(FacturaResponse(
-            id=factura.id,
-            numero_factura=factura.numero_factura,
-            proveedor=factura.proveedor,
-            subtotal=factura.subtotal,
-            iva=factura.iva,
-            monto=factura.monto,
-            total=factura.monto,  # Para compatibilidad con frontend
-            fecha_factura=factura.fecha_factura,
-            fecha_vencimiento=factura.fecha_vencimiento,
-            fecha_ingresada=factura.fecha_ingresada,
-            estado=factura.estado,
-            marca=factura.marca,
-            categoria=factura.categoria,
-            subcategoria=factura.subcategoria,
-            descripcion=factura.descripcion,
-            autorizada=factura.autorizada,
-            fecha_pago=factura.fecha_pago,
-            metodo_pago=factura.metodo_pago,
-            uso_cfdi=factura.uso_cfdi,
-            orden_compra=factura.orden_compra,
-            productos=factura.productos,
-            observaciones=factura.observaciones,
-            proyeccion_id=factura.proyeccion_id,
-            evento_id=factura.evento_id,
-            eventoId=factura.evento_id,  # camelCase para frontend
-            evento_nombre=evento_nombre,
-            campanya_id=factura.campanya_id,
-            campanya_nombre=campanya_nombre,
-            mes_asignado=factura.mes_asignado,
-            año_asignado=factura.año_asignado,
-            creado_por=factura.creado_por,
-            archivos=archivos_response,
-            cotizaciones=cotizaciones_response
-        ))
-    
-    return facturas_con_archivos
+        factura["total"] = factura["monto"]  # Para compatibilidad con frontend
+        factura["eventoId"] = factura["evento_id"]  # camelCase para frontend
+        factura["archivos"] = archivos_by_factura.get(factura["id"], [])
+        factura["cotizaciones"] = cotizaciones_by_factura.get(factura["id"], [])
+    
+    return fast_json.FastJSONResponse(facturas)
+
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Folio", "numero_factura"),
+    ("Proveedor", "proveedor"),
+    ("Subtotal", "subtotal"),
+    ("IVA", "iva"),
+    ("Monto", "monto"),
+    ("Fecha factura", "fecha_factura"),
+    ("Fecha vencimiento", "fecha_vencimiento"),
+    ("Fecha ingresada", "fecha_ingresada"),
+    ("Estado", "estado"),
+    ("Marca", "marca"),
+    ("Categoría", "categoria"),
+    ("Subcategoría", "subcategoria"),
+    ("Descripción", "descripcion"),
+    ("Autorizada", "autorizada"),
+    ("Fecha pago", "fecha_pago"),
+    ("Método pago", "metodo_pago"),
+    ("Uso CFDI", "uso_cfdi"),
+    ("Orden de compra", "orden_compra"),
+    ("Evento", "evento_nombre"),
+    ("Campaña", "campanya_nombre"),
+    ("Mes asignado", "mes_asignado"),
+    ("Año asignado", "año_asignado"),
+    ("Observaciones", "observaciones"),
+    ("Creado por", "creado_por"),
+]
+
+@router.get("/exportar", status_code=status.HTTP_200_OK)
+async def exportar_facturas(user: user_dependency, db: db_dependency,
+                            formato: str = Query(exportador.CSV, pattern=exportador.PATRON_FORMATO),
+                            marca: Optional[str] = Query(None),
+                            estado: Optional[str] = Query(None),
+                            categoria: Optional[str] = Query(None),
+                            autorizada: Optional[bool] = Query(None),
+                            anio: Optional[int] = Query(None, ge=2000, le=2100)):
+    """Exporta el listado de facturas (mismos filtros) a CSV o XLSX en streaming."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
+    
+    query = consulta_facturas(db, user, marca, estado, categoria, autorizada, anio)\
+        .order_by(Facturas.fecha_factura, Facturas.id)
+    return exportador.exportar(query.statement, COLUMNAS_EXPORTACION, formato, "facturas")
+
+@router.get("/gasto-real-periodo", status_code=status.HTTP_200_OK)
+async def obtener_gasto_real_periodo(
+    user: user_dependency,
+    db: db_dependency,
+    anio: int = Query(..., ge=2000, le=2100),
+    mes: Optional[int] = Query(None, ge=1, le=12),
+    trimestre: Optional[int] = Query(None, ge=1, le=4),
+    categoria: List[str] = Query(["Relaciones Públicas"]),
+    marca: Optional[List[str]] = Query(None)
+):
+    """
+    Gasto real de facturas ingresadas con evento asignado, según la fecha del evento.
+
+    Acepta varias categorías y marcas (?categoria=A&categoria=B) y devuelve el
+    total del período más el desglose por mes, todo en una sola consulta agregada.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
+    
+    # Período del evento como rango semiabierto sobre fecha_inicio
+    if mes:
+        desde, hasta = rango_meses(anio, mes, mes)
+    elif trimestre:
+        desde, hasta = rango_meses(anio, (trimestre - 1) * 3 + 1, trimestre * 3)
+    else:
+        desde, hasta = rango_anio(anio)
+
+    mes_evento = extract('month', Eventos.fecha_inicio).label('mes')
+    query = db.query(
+        mes_evento,
+        func.coalesce(func.sum(Facturas.monto), 0),
+        func.count(Facturas.id),
+    ).join(
+        Eventos, Facturas.evento_id == Eventos.id
+    ).filter(
+        Facturas.fecha_ingresada.isnot(None),
+        Facturas.categoria.in_(categoria),
+        Eventos.fecha_inicio >= desde,
+        Eventos.fecha_inicio < hasta
+    )
+    
+    if marca:
+        query = query.filter(Facturas.marca.in_(marca))
+
+    # Aplicar filtros según el rol del usuario
+    query = get_facturas_query_for_user(query, user_role, user.get('id'))
+
+    por_mes = {int(m): (gasto, cantidad) for m, gasto, cantidad in query.group_by(mes_evento).all()}
+    # Meses del período (hasta es el 1° del mes siguiente; enero del año siguiente → diciembre)
+    meses = range(desde.month, (hasta.month - 1 or 12) + 1)
+
+    return {
+        "gasto_real": sum(gasto for gasto, _ in por_mes.values()),
+        "cantidad_facturas": sum(cantidad for _, cantidad in por_mes.values()),
+        "por_mes": [
+            {
+                "mes": m,
+                "gasto_real": por_mes.get(m, (0, 0))[0],
+                "cantidad_facturas": por_mes.get(m, (0, 0))[1],
+            }
+            for m in meses
+        ],
+        "filtros": {
+            "anio": anio,
+            "mes": mes,
+            "trimestre": trimestre,
+            "categoria": categoria,
+            "marca": marca
+        }
+    }
+
+@router.get("/cuentas-por-pagar/antiguedad", status_code=status.HTTP_200_OK)
+async def antiguedad_saldos(
+    user: user_dependency,
+    db: db_dependency,
+    marca: Optional[str] = Query(None),
+    proveedor: Optional[str] = Query(None),
+    fecha_corte: Optional[date] = Query(None)
+):
+    """
+    Antigüedad de saldos de las facturas sin pagar: vencido, por vencer en
+    0-30, 31-60, 61-90 y más de 90 días, en total y por proveedor.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
+
+    return cuentas_por_pagar.antiguedad_saldos(
+        db, fecha_corte or date.today(), marca, proveedor, facturas_restringidas_a(user_role, user.get('id'))
+    )
+
+@router.get("/cuentas-por-pagar/flujo-semanal", status_code=status.HTTP_200_OK)
+async def flujo_semanal(
+    user: user_dependency,
+    db: db_dependency,
+    marca: Optional[str] = Query(None),
+    proveedor: Optional[str] = Query(None),
+    fecha_corte: Optional[date] = Query(None),
+    semanas: int = Query(12, ge=1, le=52)
+):
+    """
+    Proyección de pagos por semana según fecha_vencimiento; lo vencido cae en
+    la semana de corte. Incluye el acumulado y lo que vence después del horizonte.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
+
+    return cuentas_por_pagar.flujo_semanal(
+        db, fecha_corte or date.today(), semanas, marca, proveedor,
+        facturas_restringidas_a(user_role, user.get('id'))
+    )
+
+class FacturaBusqueda(BaseModel):
+    id: int
+    numero_factura: str
+    proveedor: str
+    monto: float
+    fecha_factura: date
+    estado: str
+    marca: str
+    categoria: Optional[str] = None
+    descripcion: Optional[str] = None
+    orden_compra: Optional[str] = None
+    score: float
+
+class BusquedaFacturasResponse(BaseModel):
+    resultados: List[FacturaBusqueda]
+    siguiente: Optional[str] = None  # cursor para la página siguiente
+
+@router.get("/search", response_model=BusquedaFacturasResponse, status_code=status.HTTP_200_OK)
+async def buscar_facturas(user: user_dependency, db: db_dependency,
+                          q: str = Query(..., min_length=2, max_length=200),
+                          marca: Optional[str] = Query(None),
+                          estado: Optional[str] = Query(None),
+                          limit: int = Query(20, ge=1, le=100),
+                          cursor: Optional[str] = Query(None)):
+    """
+    Búsqueda por folio, proveedor, descripción, orden de compra y observaciones,
+    ordenada por relevancia. Para la página siguiente se manda el `siguiente` recibido como `cursor`.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
+    
+    try:
+        return busqueda_facturas.buscar(
+            db, q.strip(), limit, cursor,
+            user_id=facturas_restringidas_a(user_role, user.get('id')),
+            marca=marca, estado=estado,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{factura_id}", response_model=FacturaResponse, status_code=status.HTTP_200_OK)
 async def read_factura(user: user_dependency, db: db_dependency, factura_id: int = Path(gt=0)):
@@ -467,6 +684,16 @@ async def read_factura(user: user_dependency, db: db_dependency, factura_id: int
         cotizaciones=cotizaciones_response
     )
 
+def verificar_factura_duplicada(db: Session, clave_unica: Optional[str] = None, uuid: Optional[str] = None,
+                                excluir_id: Optional[int] = None):
+    """HTTP 409 si ya hay otra factura con la misma clave RFC|folio o el mismo UUID"""
+    duplicada = duplicados_facturas.buscar_duplicada(db, clave_unica, uuid, excluir_id)
+    if duplicada:
+        raise HTTPException(
+            status_code=409,
+            detail=f'Ya existe la factura {duplicada.numero_factura} de {duplicada.proveedor} (id {duplicada.id})'
+        )
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_factura(user: user_dependency, db: db_dependency, factura_request: FacturaRequest):
     if user is None:
@@ -480,6 +707,9 @@ async def create_factura(user: user_dependency, db: db_dependency, factura_reque
     if not can_modify_facturas(user_role):
         raise HTTPException(status_code=403, detail='No tienes permisos para crear facturas')
 
+    clave_unica = duplicados_facturas.clave_para(db, factura_request.proveedor, factura_request.numero_factura)
+    verificar_factura_duplicada(db, clave_unica)
+
     factura_model = Facturas(
         numero_factura=factura_request.numero_factura,
         proveedor=factura_request.proveedor,
@@ -505,12 +735,14 @@ async def create_factura(user: user_dependency, db: db_dependency, factura_reque
         campanya_id=factura_request.campanya_id,
         mes_asignado=factura_request.mes_asignado,
         año_asignado=factura_request.año_asignado,
+        clave_unica=clave_unica,
         creado_por=user.get('username'),
         user_id=user.get('id')
     )
 
     db.add(factura_model)
     db.commit()
+    cuentas_por_pagar.cache.invalidar()
     
     # Actualizar monto real de la proyección si está asociada
     if factura_request.proyeccion_id:
@@ -540,6 +772,8 @@ async def subir_archivos_factura(
         raise HTTPException(status_code=404, detail='Factura no encontrada')
     
     archivos_guardados = []
+    archivos_repetidos = []
+    hashes_en_carga = set()
     
     for archivo in archivos:
         # Validar tipo de archivo
@@ -552,6 +786,28 @@ async def subir_archivos_factura(
         # Determinar tipo de archivo
         tipo_archivo = 'PDF' if archivo.filename.lower().endswith('.pdf') else 'XML'
         
+        # El mismo archivo ya subido: se omite si es de esta factura, error si es de otra
+        hash_archivo = duplicados_facturas.hash_contenido(contenido)
+        existente = duplicados_facturas.archivo_existente(db, hash_archivo)
+        if existente and existente.factura_id != factura_id:
+            raise HTTPException(
+                status_code=409,
+                detail=f'Archivo {archivo.filename}: ya está adjunto a la factura {existente.factura_id} '
+                       f'como {existente.nombre_archivo}'
+            )
+        if existente or hash_archivo in hashes_en_carga:
+            archivos_repetidos.append(archivo.filename)
+            continue
+        hashes_en_carga.add(hash_archivo)
+        
+        # El UUID del XML identifica al CFDI: no puede estar en otra factura
+        if tipo_archivo == 'XML':
+            uuid = cfdi.parse_cfdi(contenido).get('uuid')
+            if uuid:
+                verificar_factura_duplicada(db, uuid=uuid, excluir_id=factura_id)
+                if not factura.uuid_cfdi:
+                    factura.uuid_cfdi = uuid
+        
         # Crear registro en base de datos
         archivo_modelo = FacturaArchivos(
             factura_id=factura_id,
@@ -559,7 +815,8 @@ async def subir_archivos_factura(
             tipo_archivo=tipo_archivo,
             contenido_archivo=contenido,
             tamaño_archivo=len(contenido),
-            subido_por=user.get('username')
+            subido_por=user.get('username'),
+            hash_contenido=hash_archivo
         )
         
         db.add(archivo_modelo)
@@ -573,7 +830,8 @@ async def subir_archivos_factura(
     
     return {
         'message': f'Se guardaron {len(archivos_guardados)} archivo(s)',
-        'archivos': archivos_guardados
+        'archivos': archivos_guardados,
+        'repetidos': archivos_repetidos
     }
 
 @router.post("/{factura_id}/archivos-productos", status_code=status.HTTP_201_CREATED)
@@ -609,7 +867,8 @@ async def subir_archivos_productos_factura(
             contenido_archivo=contenido,
             tamaño_archivo=len(contenido),
             subido_por=user.get('username'),
-            seccion='productos'
+            seccion='productos',
+            hash_contenido=duplicados_facturas.hash_contenido(contenido)
         )
         db.add(archivo_modelo)
         archivos_guardados.append({'nombre': nombre, 'tipo': tipo_archivo, 'tamaño': len(contenido)})
@@ -673,6 +932,62 @@ async def subir_cotizaciones_factura(
         }
     }
 
+@router.get("/archivos/bundle")
+async def descargar_paquete_archivos(
+    user: user_dependency,
+    db: db_dependency,
+    ids: Optional[List[int]] = Query(None, max_length=5000),
+    marca: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    anio: Optional[int] = Query(None, ge=2000, le=2100),
+    mes: Optional[int] = Query(None, ge=1, le=12)
+):
+    """
+    Descarga en un solo ZIP los archivos de varias facturas (por ids o por
+    marca/estado/mes de fecha_factura), organizados como Proveedor/Folio - archivo.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    user_role = user.get('role', '')
+    if not can_access_facturas(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para descargar archivos')
+    
+    if not (ids or marca or estado or anio):
+        raise HTTPException(status_code=400, detail='Indica ids o al menos un filtro (marca, estado, anio/mes)')
+    if mes and not anio:
+        raise HTTPException(status_code=400, detail='El filtro por mes requiere anio')
+
+    # Solo metadatos: el contenido se lee en trozos mientras se arma el ZIP
+    query = db.query(
+        FacturaArchivos.id,
+        Facturas.proveedor,
+        Facturas.numero_factura,
+        FacturaArchivos.nombre_archivo,
+        FacturaArchivos.fecha_subida,
+    ).join(Facturas, Facturas.id == FacturaArchivos.factura_id)
+    query = get_facturas_query_for_user(query, user_role, user.get('id'))
+    if ids:
+        query = query.filter(Facturas.id.in_(ids))
+    query = filtrar_facturas(query, marca=marca, estado=estado)
+    if anio:
+        desde, hasta = rango_meses(anio, mes, mes) if mes else rango_anio(anio)
+        query = query.filter(Facturas.fecha_factura >= desde, Facturas.fecha_factura < hasta)
+    entradas = [
+        paquete_archivos.Entrada(*fila)
+        for fila in query.order_by(Facturas.proveedor, Facturas.numero_factura, FacturaArchivos.id)
+    ]
+    if not entradas:
+        raise HTTPException(status_code=404, detail='No hay archivos para las facturas indicadas')
+
+    partes = ["facturas", marca, estado, f"{anio}-{mes:02d}" if mes else anio]
+    nombre = "_".join(str(p) for p in partes if p).replace(" ", "_")
+    return StreamingResponse(
+        paquete_archivos.generar_zip(entradas),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{nombre}.zip"'}
+    )
+
 @router.get("/{factura_id}/archivos/{archivo_id}/descargar")
 async def descargar_archivo_factura(
     factura_id: int,
@@ -790,6 +1105,12 @@ async def update_factura(user: user_dependency, db: db_dependency,
     if factura is None:
         raise HTTPException(status_code=404, detail='Factura no encontrada')
 
+    # La clave solo cambia con proveedor/folio: no re-verificar duplicados en cada edición
+    if (factura_request.proveedor, factura_request.numero_factura) != (factura.proveedor, factura.numero_factura):
+        clave_unica = duplicados_facturas.clave_para(db, factura_request.proveedor, factura_request.numero_factura)
+        verificar_factura_duplicada(db, clave_unica, excluir_id=factura.id)
+        factura.clave_unica = clave_unica
+
     factura.numero_factura = factura_request.numero_factura
     factura.proveedor = factura_request.proveedor
     factura.subtotal = factura_request.subtotal
@@ -832,6 +1153,7 @@ async def update_factura(user: user_dependency, db: db_dependency,
 
     db.add(factura)
     db.commit()
+    cuentas_por_pagar.cache.invalidar()
     
     # Actualizar montos reales de ambas proyecciones (anterior y nueva)
     if proyeccion_anterior:
@@ -870,11 +1192,450 @@ async def delete_factura(user: user_dependency, db: db_dependency, factura_id: i
     # Ahora eliminar la factura
     db.delete(factura)
     db.commit()
+    cuentas_por_pagar.cache.invalidar()
     
     # Actualizar monto real de la proyección si estaba asociada
     if proyeccion_id:
         actualizar_monto_real_proyeccion(db, proyeccion_id)
 
+class FiltroFacturas(BaseModel):
+    marca: Optional[str] = None
+    estado: Optional[str] = None
+    categoria: Optional[str] = None
+    autorizada: Optional[bool] = None
+    anio: Optional[int] = Field(None, ge=2000, le=2100)
+
+class TransicionLoteRequest(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    filtro: Optional[FiltroFacturas] = None
+
+    @model_validator(mode='after')
+    def ids_o_filtro(self):
+        if (self.ids is None) == (self.filtro is None):
+            raise ValueError('Se requiere ids o filtro (solo uno de los dos)')
+        if self.filtro is not None and not self.filtro.model_dump(exclude_none=True):
+            raise ValueError('El filtro debe tener al menos un criterio')
+        return self
+
+class IngresarLoteRequest(TransicionLoteRequest):
+    fecha_ingreso: Optional[date] = None
+
+# Estados desde los que se permite cada transición (None = desde cualquiera)
+ESTADOS_PARA_INGRESAR = ["Pendiente", "Autorizada"]
+# En lote solo se autorizan pendientes: regresar una ingresada o pagada se hace
+# factura por factura en /{id}/autorizar
+ESTADOS_PARA_AUTORIZAR = ["Pendiente"]
+
+def _transicion_lote(db: Session, user: dict, lote: TransicionLoteRequest, valores: dict,
+                     estados_permitidos: Optional[list] = None) -> dict:
+    """
+    Aplica `valores` a las facturas del lote (ids o filtro) en un UPDATE ... RETURNING,
+    respetando la visibilidad por rol, y recalcula monto_real una vez por proyección
+    afectada. Devuelve el resultado por id. No hace commit.
+    """
+    stmt = update(Facturas)
+    stmt = get_facturas_query_for_user(stmt, user.get('role', ''), user.get('id'))
+    if lote.ids is not None:
+        ids = sorted(set(lote.ids))
+        stmt = stmt.where(Facturas.id.in_(ids))
+    else:
+        ids = None
+        f = lote.filtro
+        stmt = filtrar_facturas(stmt, f.marca, f.estado, f.categoria, f.autorizada, f.anio)
+    if estados_permitidos is not None:
+        stmt = stmt.where(Facturas.estado.in_(estados_permitidos))
+
+    actualizadas = db.execute(
+        stmt.values(**valores).returning(Facturas.id, Facturas.proyeccion_id),
+        execution_options={"synchronize_session": False},
+    ).all()
+    actualizar_montos_reales_proyecciones(db, {proyeccion_id for _, proyeccion_id in actualizadas})
+
+    resultados = [{"id": factura_id, "resultado": "actualizada"} for factura_id, _ in actualizadas]
+    if ids is not None:
+        # Las que no se actualizaron: o no existen/no son visibles, o su estado no lo permite
+        faltantes = set(ids) - {factura_id for factura_id, _ in actualizadas}
+        estados = dict(get_facturas_query_for_user(
+            db.query(Facturas.id, Facturas.estado).filter(Facturas.id.in_(faltantes)),
+            user.get('role', ''), user.get('id'),
+        ).all()) if faltantes else {}
+        for factura_id in sorted(faltantes):
+            if factura_id in estados:
+                resultados.append({"id": factura_id, "resultado": "estado_no_permitido",
+                                   "estado": estados[factura_id]})
+            else:
+                resultados.append({"id": factura_id, "resultado": "no_encontrada"})
+    resultados.sort(key=lambda r: r["id"])
+    return {"actualizadas": len(actualizadas), "resultados": resultados}
+
+@router.patch("/autorizar-lote", status_code=status.HTTP_200_OK)
+async def autorizar_facturas_lote(user: user_dependency, db: db_dependency, lote: TransicionLoteRequest):
+    """Autoriza varias facturas pendientes (por ids o filtro) en una sola transacción."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    if not can_authorize_facturas(user.get('role', '')):
+        raise HTTPException(status_code=403, detail='No tienes permisos para autorizar facturas')
+
+    resultado = _transicion_lote(db, user, lote, {
+        "autorizada": True,
+        "estado": "Autorizada",
+    }, estados_permitidos=ESTADOS_PARA_AUTORIZAR)
+    db.commit()
+    return resultado
+
+@router.patch("/ingresar-lote", status_code=status.HTTP_200_OK)
+async def ingresar_facturas_lote(user: user_dependency, db: db_dependency, lote: IngresarLoteRequest):
+    """Marca como ingresadas varias facturas pendientes o autorizadas en una sola transacción."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    if not can_ingresar_facturas(user.get('role', '')):
+        raise HTTPException(status_code=403, detail='No tienes permisos para ingresar facturas')
+
+    fecha_ingresada = lote.fecha_ingreso or date.today()
+    resultado = _transicion_lote(db, user, lote, {
+        "fecha_ingresada": fecha_ingresada,
+        "estado": "Ingresada",
+    }, estados_permitidos=ESTADOS_PARA_INGRESAR)
+    db.commit()
+    return {**resultado, "fecha_ingresada": fecha_ingresada}
+
+@router.patch("/marcar-pagada-lote", status_code=status.HTTP_200_OK)
+async def marcar_pagadas_lote(
+    user: user_dependency,
+    db: db_dependency,
+    ids: List[int] = Form(...),
+    fecha_pago: Optional[date] = Form(None),
+    metodo_pago: Optional[str] = Form(None),
+    comprobante: Optional[UploadFile] = File(None)
+):
+    """
+    Marca como pagadas varias facturas con un mismo comprobante (p. ej. una
+    transferencia que cubre varias). El comprobante se adjunta a cada factura.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    if not can_mark_paid_facturas(user.get('role', '')):
+        raise HTTPException(status_code=403, detail='No tienes permisos para marcar facturas como pagadas')
+
+    # Validar que se haya subido un comprobante (obligatorio)
+    if not comprobante:
+        raise HTTPException(status_code=400, detail='El comprobante de pago es obligatorio')
+    if not 1 <= len(ids) <= 1000:
+        raise HTTPException(status_code=400, detail='Se requieren entre 1 y 1000 facturas')
+
+    valores = {
+        # Marcar fecha de ingreso si no la tiene
+        "fecha_ingresada": func.coalesce(Facturas.fecha_ingresada, date.today()),
+        "estado": "Pagada",
+    }
+    if fecha_pago:
+        valores["fecha_pago"] = fecha_pago
+    if metodo_pago:
+        valores["metodo_pago"] = metodo_pago
+    resultado = _transicion_lote(db, user, TransicionLoteRequest(ids=ids), valores)
+
+    # Guardar el comprobante en cada factura actualizada
+    contenido = await comprobante.read()
+    hash_archivo = duplicados_facturas.hash_contenido(contenido)
+    pagadas = [r["id"] for r in resultado["resultados"] if r["resultado"] == "actualizada"]
+    if pagadas:
+        db.execute(insert(FacturaArchivos), [
+            {
+                "factura_id": factura_id,
+                "nombre_archivo": comprobante.filename,
+                "tipo_archivo": 'Comprobante',
+                "contenido_archivo": contenido,
+                "tamaño_archivo": len(contenido),
+                "subido_por": user.get('username', 'sistema'),
+                "hash_contenido": hash_archivo,
+            }
+            for factura_id in pagadas
+        ])
+    db.commit()
+    cuentas_por_pagar.cache.invalidar()
+    return resultado
+
+@router.post("/duplicados/reporte", status_code=status.HTTP_202_ACCEPTED)
+async def iniciar_reporte_duplicados(user: user_dependency):
+    """
+    Lanza en segundo plano el respaldo de claves/UUID/hashes de los registros
+    existentes y el reporte de facturas y archivos duplicados.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    if not can_delete_facturas(user.get('role', '')):
+        raise HTTPException(status_code=403, detail='No tienes permisos para revisar duplicados')
+
+    try:
+        job = jobs.submit("reporte_duplicados", duplicados_facturas.reporte_duplicados, clave="facturas:duplicados")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return {"job_id": job.id, "estado": job.estado}
+
+@router.get("/duplicados/reporte/{job_id}", status_code=status.HTTP_200_OK)
+async def get_reporte_duplicados(user: user_dependency, job_id: str):
+    """Avance y, al terminar, resultado del reporte de duplicados"""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    job = jobs.get(job_id)
+    if job is None or job.tipo != "reporte_duplicados":
+        raise HTTPException(status_code=404, detail='Reporte no encontrado')
+
+    return job.to_dict()
+
+MAX_ARCHIVOS_CFDI = 2000
+MAX_TAMAÑO_XML = 5 * 1024 * 1024
+MAX_TAMAÑO_PDF = 20 * 1024 * 1024
+DIAS_VENCIMIENTO_CFDI = 30
+
+
+def _nombre_base(nombre: str) -> str:
+    """Nombre sin carpeta ni extensión, para emparejar `F-12.xml` con `F-12.pdf`."""
+    return nombre.replace("\\", "/").rsplit("/", 1)[-1].rsplit(".", 1)[0].lower()
+
+
+async def _leer_archivos_cfdi(archivos: List[UploadFile]):
+    """
+    XMLs y PDFs de la carga, abriendo los ZIP. Devuelve (xmls, pdfs, reporte):
+    xmls = [(nombre, contenido)], pdfs = {nombre_base: (nombre, contenido)} y
+    reporte con los archivos que se ignoraron.
+    """
+    xmls, pdfs, reporte = [], {}, []
+
+    def agregar(nombre: str, tamaño: int, leer):
+        extension = nombre.lower().rsplit(".", 1)[-1]
+        if extension not in ("xml", "pdf"):
+            reporte.append({"archivo": nombre, "resultado": "ignorado", "detalle": "Solo se procesan XML y PDF"})
+        elif tamaño > (MAX_TAMAÑO_XML if extension == "xml" else MAX_TAMAÑO_PDF):
+            reporte.append({"archivo": nombre, "resultado": "error", "detalle": "Archivo demasiado grande"})
+        elif len(xmls) + len(pdfs) >= MAX_ARCHIVOS_CFDI:
+            reporte.append({"archivo": nombre, "resultado": "error",
+                            "detalle": f"Se excedió el máximo de {MAX_ARCHIVOS_CFDI} archivos por carga"})
+        elif extension == "xml":
+            xmls.append((nombre, leer()))
+        else:
+            pdfs[_nombre_base(nombre)] = (nombre, leer())
+
+    for archivo in archivos:
+        nombre = archivo.filename or "archivo"
+        if nombre.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(archivo.file) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                            continue
+                        agregar(info.filename, info.file_size, lambda info=info: zf.read(info))
+            except zipfile.BadZipFile:
+                reporte.append({"archivo": nombre, "resultado": "error", "detalle": "ZIP inválido"})
+        else:
+            contenido = await archivo.read()
+            agregar(nombre, len(contenido), lambda contenido=contenido: contenido)
+    return xmls, pdfs, reporte
+
+
+def _productos_cfdi(conceptos: list[dict]) -> Optional[str]:
+    lineas = []
+    for concepto in conceptos:
+        cantidad = concepto.get("cantidad")
+        cantidad = f"{cantidad:g} x " if cantidad is not None else ""
+        lineas.append(f"{cantidad}{concepto.get('descripcion') or ''}".strip())
+    return "\n".join(lineas) or None
+
+
+@router.post("/importar-cfdi", status_code=status.HTTP_200_OK)
+async def importar_cfdi(
+    user: user_dependency,
+    db: db_dependency,
+    archivos: List[UploadFile] = File(...),
+    marca: str = Form(...),
+    categoria: Optional[str] = Form(None),
+    subcategoria: Optional[str] = Form(None)
+):
+    """
+    Alta masiva de facturas desde CFDI: acepta XMLs sueltos o ZIPs (con PDFs
+    opcionales del mismo nombre). Los XML se leen en un pool de procesos, el
+    RFC del emisor se busca en Proveedores y las facturas se crean (o se
+    actualizan si ya existe la misma clave RFC|serie-folio o el mismo UUID)
+    con inserts en lote.
+    No se actualiza una factura existente con otro UUID ni una que ya esté
+    autorizada, ingresada o pagada: esos archivos salen como "conflicto".
+    Devuelve un resultado por archivo.
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    if not can_modify_facturas(user.get('role', '')):
+        raise HTTPException(status_code=403, detail='No tienes permisos para crear facturas')
+
+    xmls, pdfs, reporte = await _leer_archivos_cfdi(archivos)
+    if not xmls:
+        raise HTTPException(status_code=400, detail='No se encontraron archivos XML para importar')
+
+    datos = await cfdi.parse_lote([contenido for _, contenido in xmls])
+
+    # Proveedores registrados por RFC, en una sola consulta
+    rfcs = {d["rfc_emisor"] for d in datos if "error" not in d}
+    proveedores = dict(
+        db.query(func.upper(Proveedores.rfc), Proveedores.nombre)
+        .filter(func.upper(Proveedores.rfc).in_(rfcs)).all()
+    ) if rfcs else {}
+
+    # Validar cada XML y armar su clave de duplicados (RFC|serie-folio)
+    validos = []  # (nombre, contenido, datos, proveedor, numero, clave)
+    claves_vistas, uuids_vistos = set(), set()
+    for (nombre, contenido), d in zip(xmls, datos):
+        if "error" in d:
+            reporte.append({"archivo": nombre, "resultado": "error", "detalle": d["error"]})
+            continue
+        if (d.get("tipo_comprobante") or "I").upper() not in ("I", "INGRESO"):
+            reporte.append({"archivo": nombre, "resultado": "error",
+                            "detalle": f'Solo se importan CFDI de ingreso (tipo {d["tipo_comprobante"]})'})
+            continue
+        proveedor = proveedores.get(d["rfc_emisor"])
+        if proveedor is None:
+            reporte.append({"archivo": nombre, "resultado": "error",
+                            "detalle": f'El RFC {d["rfc_emisor"]} no está registrado en proveedores'})
+            continue
+        numero = cfdi.numero_factura(d)
+        if not numero:
+            reporte.append({"archivo": nombre, "resultado": "error", "detalle": "El CFDI no trae folio ni UUID"})
+            continue
+        clave = duplicados_facturas.clave_factura(d["rfc_emisor"], proveedor, numero)
+        if clave in claves_vistas or (d.get("uuid") and d["uuid"] in uuids_vistos):
+            reporte.append({"archivo": nombre, "resultado": "duplicado",
+                            "detalle": f"Factura {numero} de {proveedor} repetida en la carga"})
+            continue
+        claves_vistas.add(clave)
+        if d.get("uuid"):
+            uuids_vistos.add(d["uuid"])
+        validos.append((nombre, contenido, d, proveedor, numero, clave))
+
+    # Facturas que ya existen con la misma clave o el mismo UUID (búsqueda por índice)
+    por_clave, por_uuid = {}, {}
+    if validos:
+        for fila in db.query(
+            Facturas.id, Facturas.clave_unica, Facturas.uuid_cfdi, Facturas.proyeccion_id,
+            Facturas.numero_factura, Facturas.estado, Facturas.autorizada
+        ).filter(or_(Facturas.clave_unica.in_(claves_vistas), Facturas.uuid_cfdi.in_(uuids_vistos)))\
+                .order_by(Facturas.id):
+            if fila.clave_unica in claves_vistas:
+                por_clave.setdefault(fila.clave_unica, fila)
+            if fila.uuid_cfdi in uuids_vistos:
+                por_uuid.setdefault(fila.uuid_cfdi, fila)
+
+    existentes = {}  # clave -> (factura_id, proyeccion_id)
+    nuevas, actualizaciones = [], []
+    sin_conflicto = []
+    for nombre, contenido, d, proveedor, numero, clave in validos:
+        existente = por_uuid.get(d.get("uuid")) or por_clave.get(clave)
+        if existente is not None:
+            conflicto = None
+            if d.get("uuid") and existente.uuid_cfdi and existente.uuid_cfdi != d["uuid"]:
+                conflicto = (f"La factura {existente.numero_factura} (id {existente.id}) ya existe "
+                             f"con otro UUID ({existente.uuid_cfdi})")
+            elif existente.autorizada or (existente.estado or "Pendiente") != "Pendiente":
+                estado = existente.estado if existente.estado not in (None, "Pendiente") else "Autorizada"
+                conflicto = (f"La factura {existente.numero_factura} (id {existente.id}) ya está "
+                             f"{estado}; no se modifica")
+            if conflicto:
+                reporte.append({"archivo": nombre, "resultado": "conflicto", "factura_id": existente.id,
+                                "detalle": conflicto})
+                continue
+        sin_conflicto.append((nombre, contenido, d, proveedor, numero, clave))
+    validos = sin_conflicto
+
+    for nombre, _, d, proveedor, numero, clave in validos:
+        valores = {
+            "subtotal": d.get("subtotal"),
+            "iva": d["iva"],
+            "monto": d["total"],
+            "fecha_factura": d["fecha"],
+            "metodo_pago": d.get("metodo_pago"),
+            "uso_cfdi": d.get("uso_cfdi"),
+            "productos": _productos_cfdi(d["conceptos"]),
+            "uuid_cfdi": d.get("uuid"),
+        }
+        existente = por_uuid.get(d.get("uuid")) or por_clave.get(clave)
+        if existente is not None:
+            existentes[clave] = (existente.id, existente.proyeccion_id)
+            actualizaciones.append({"id": existente.id, **valores})
+        else:
+            nuevas.append({
+                **valores,
+                "numero_factura": numero,
+                "proveedor": proveedor,
+                "clave_unica": clave,
+                "fecha_vencimiento": d["fecha"] + timedelta(days=DIAS_VENCIMIENTO_CFDI),
+                "estado": "Pendiente",
+                "marca": marca,
+                "categoria": categoria,
+                "subcategoria": subcategoria,
+                "descripcion": next((c["descripcion"] for c in d["conceptos"] if c.get("descripcion")), None),
+                "autorizada": False,
+                "observaciones": f'Importada de CFDI {d.get("uuid") or ""}'.strip(),
+                "creado_por": user.get('username'),
+                "user_id": user.get('id'),
+            })
+
+    ids = {clave: factura_id for clave, (factura_id, _) in existentes.items()}
+    if nuevas:
+        creadas = db.execute(
+            insert(Facturas).returning(Facturas.id, sort_by_parameter_order=True), nuevas
+        ).scalars().all()
+        ids.update(zip((n["clave_unica"] for n in nuevas), creadas))
+    if actualizaciones:
+        db.execute(update(Facturas), actualizaciones)
+
+    # XML (y PDF con el mismo nombre) como archivos de la factura, sin repetir los que ya tenga
+    ya_adjuntos = set(
+        db.query(FacturaArchivos.factura_id, FacturaArchivos.hash_contenido)
+        .filter(FacturaArchivos.factura_id.in_([a["id"] for a in actualizaciones])).all()
+    ) if actualizaciones else set()
+    adjuntos = []
+    for nombre, contenido, _, proveedor, numero, clave in validos:
+        factura_id = ids[clave]
+        por_adjuntar = [(nombre, contenido, 'XML')]
+        if _nombre_base(nombre) in pdfs:
+            por_adjuntar.append((*pdfs[_nombre_base(nombre)], 'PDF'))
+        for archivo_nombre, archivo_contenido, tipo in por_adjuntar:
+            hash_archivo = duplicados_facturas.hash_contenido(archivo_contenido)
+            if (factura_id, hash_archivo) in ya_adjuntos:
+                continue
+            adjuntos.append({
+                "factura_id": factura_id,
+                "nombre_archivo": archivo_nombre.replace("\\", "/").rsplit("/", 1)[-1],
+                "tipo_archivo": tipo,
+                "contenido_archivo": archivo_contenido,
+                "tamaño_archivo": len(archivo_contenido),
+                "subido_por": user.get('username', 'sistema'),
+                "seccion": 'general',
+                "hash_contenido": hash_archivo,
+            })
+        reporte.append({
+            "archivo": nombre,
+            "resultado": "actualizada" if clave in existentes else "creada",
+            "factura_id": factura_id,
+            "proveedor": proveedor,
+            "numero_factura": numero,
+        })
+    if adjuntos:
+        db.execute(insert(FacturaArchivos), adjuntos)
+
+    # Las actualizadas pueden cambiar de monto: recalcular sus proyecciones
+    actualizar_montos_reales_proyecciones(db, [proyeccion_id for _, proyeccion_id in existentes.values()])
+    db.commit()
+    cuentas_por_pagar.cache.invalidar()
+
+    resumen = {r: sum(1 for x in reporte if x["resultado"] == r)
+               for r in ("creada", "actualizada", "duplicado", "conflicto", "error", "ignorado")}
+    return {"resumen": resumen, "resultados": reporte}
+
 @router.patch("/{factura_id}/autorizar", status_code=status.HTTP_200_OK)
 async def autorizar_factura(user: user_dependency, db: db_dependency, factura_id: int = Path(gt=0)):
     if user is None:
@@ -950,72 +1711,6 @@ async def ingresar_factura(
     
     return {"mensaje": mensaje, "fecha_ingresada": factura.fecha_ingresada}
 
-@router.get("/gasto-real-periodo", status_code=status.HTTP_200_OK)
-async def obtener_gasto_real_periodo(
-    user: user_dependency,
-    db: db_dependency,
-    anio: int = Query(...),
-    mes: Optional[int] = Query(None),
-    trimestre: Optional[int] = Query(None),
-    categoria: str = Query("Relaciones Públicas"),
-    marca: Optional[str] = Query(None)
-):
-    """Obtener gasto real basado en facturas ingresadas con eventos del período"""
-    if user is None:
-        raise HTTPException(status_code=401, detail='Authentication Failed')
-    
-    user_role = user.get('role', '')
-    if not can_access_facturas(user_role):
-        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a facturas')
-    
-    from sqlalchemy import extract, and_
-    
-    # Base query para facturas ingresadas con evento asignado
-    # Join con Eventos para filtrar por fecha del evento
-    query = db.query(Facturas).join(
-        Eventos, Facturas.evento_id == Eventos.id
-    ).filter(
-        Facturas.fecha_ingreso.isnot(None),
-        Facturas.evento_id.isnot(None),
-        Facturas.categoria == categoria,
-        extract('year', Eventos.fecha_inicio) == anio
-    )
-    
-    # Filtrar por marca si se especifica
-    if marca:
-        query = query.filter(Facturas.marca == marca)
-    
-    # Filtrar por mes del evento si se especifica
-    if mes:
-        query = query.filter(extract('month', Eventos.fecha_inicio) == mes)
-    
-    # Filtrar por trimestre si se especifica (basado en mes del evento)
-    if trimestre:
-        mes_inicio = (trimestre - 1) * 3 + 1
-        mes_fin = trimestre * 3
-        query = query.filter(
-            and_(
-                extract('month', Eventos.fecha_inicio) >= mes_inicio,
-                extract('month', Eventos.fecha_inicio) <= mes_fin
-            )
-        )
-    
-    # Obtener facturas y calcular total
-    facturas = query.all()
-    gasto_total = sum(factura.monto for factura in facturas)
-    
-    return {
-        "gasto_real": gasto_total,
-        "cantidad_facturas": len(facturas),
-        "filtros": {
-            "anio": anio,
-            "mes": mes,
-            "trimestre": trimestre,
-            "categoria": categoria,
-            "marca": marca
-        }
-    }
-
 @router.patch("/{factura_id}/marcar-pagada", status_code=status.HTTP_200_OK)
 async def marcar_pagada(
     user: user_dependency, 
@@ -1066,9 +1761,11 @@ async def marcar_pagada(
         tipo_archivo='Comprobante',
         contenido_archivo=contenido,
         tamaño_archivo=len(contenido),
-        subido_por=user.get('username', 'sistema')
+        subido_por=user.get('username', 'sistema'),
+        hash_contenido=duplicados_facturas.hash_contenido(contenido)
     )
     db.add(archivo_db)
     
     db.add(factura)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    cuentas_por_pagar.cache.invalidar()
\ No newline at end of file
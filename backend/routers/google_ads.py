@@ -3,22 +3,27 @@ Google Ads API integration – todas las credenciales viven en .env del servidor
 Nunca se exponen al frontend ni se incluyen en el repositorio.
 """
 import json
-from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from typing import Annotated, Iterator, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from starlette import status
-from .auth import get_current_user
+from .auth import get_current_user, get_current_user_opcional
 from database import SessionLocal
-from models import Campanas, SystemSettings
+from models import Campanas
+from system_settings import registry as settings_registry, env_json
+import ad_image_cache
 import os
 import requests as http_requests
+from urllib.parse import quote
 
 router = APIRouter(prefix="/google-ads", tags=["google-ads"])
 user_dependency = Annotated[dict, Depends(get_current_user)]
+optional_user_dependency = Annotated[Optional[dict], Depends(get_current_user_opcional)]
 
 GOOGLE_ADS_API_VERSION = "v20"
-GOOGLE_ADS_BASE = f"https://googleads.googleapis.com/{GOOGLE_ADS_API_VERSION}"
+# Los hosts se pueden sobreescribir para apuntar al simulador local (ads_simulator.py)
+GOOGLE_ADS_BASE = f"{os.getenv('GOOGLE_ADS_API_HOST', 'https://googleads.googleapis.com')}/{GOOGLE_ADS_API_VERSION}"
+GOOGLE_OAUTH_TOKEN_URL = os.getenv("GOOGLE_OAUTH_TOKEN_URL", "https://oauth2.googleapis.com/token")
 
 
 def get_db():
@@ -42,34 +47,14 @@ def _get_google_config(db: Session) -> dict:
     Prioridad refresh_token: DB > GOOGLE_ADS_REFRESH_TOKEN env var.
     Prioridad customer_map:  DB > GOOGLE_ADS_CUSTOMER_MAP env var (JSON).
     """
-    db_refresh = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "google_ads_refresh_token")
-        .first()
-    )
-    db_refresh_token = (db_refresh.value if db_refresh else None) or ""
+    settings = settings_registry.snapshot(db)
+    db_refresh_token = settings.get("google_ads_refresh_token")
     env_refresh_token = os.getenv("GOOGLE_ADS_REFRESH_TOKEN", "")
     refresh_token = db_refresh_token or env_refresh_token
 
     # customer_map: base = .env JSON, sobreescrito por DB si existe
-    customer_map: dict = {}
-    env_map_str = os.getenv("GOOGLE_ADS_CUSTOMER_MAP", "")
-    if env_map_str:
-        try:
-            customer_map = json.loads(env_map_str)
-        except Exception:
-            pass
-
-    db_map = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "google_ads_customer_map")
-        .first()
-    )
-    if db_map and db_map.value:
-        try:
-            customer_map.update(json.loads(db_map.value))
-        except Exception:
-            pass
+    customer_map = env_json("GOOGLE_ADS_CUSTOMER_MAP")
+    customer_map.update(settings.get_json("google_ads_customer_map"))
 
     return {
         "developer_token": os.getenv("GOOGLE_ADS_DEVELOPER_TOKEN"),
@@ -116,7 +101,7 @@ def _parse_oauth_error(resp) -> tuple[str, str]:
 def _request_access_token(client_id: str, client_secret: str, refresh_token: str) -> tuple[bool, str, str]:
     """Solicita access token. Retorna (ok, access_token, error_detail)."""
     resp = http_requests.post(
-        "https://oauth2.googleapis.com/token",
+        GOOGLE_OAUTH_TOKEN_URL,
         json={
             "client_id": client_id,
             "client_secret": client_secret,
@@ -162,9 +147,7 @@ def _get_access_token(cfg: dict) -> str:
     )
 
 
-def _gaql(access_token: str, developer_token: str, customer_id: str, query: str,
-          manager_id: str = "") -> list:
-    url = f"{GOOGLE_ADS_BASE}/customers/{customer_id}/googleAds:search"
+def _gaql_headers(access_token: str, developer_token: str, manager_id: str = "") -> dict:
     headers = {
         "Authorization": f"Bearer {access_token}",
         "developer-token": developer_token,
@@ -173,15 +156,98 @@ def _gaql(access_token: str, developer_token: str, customer_id: str, query: str,
     # Si hay una MCC, se envía como login-customer-id para acceder a sub-cuentas
     if manager_id:
         headers["login-customer-id"] = manager_id
-    resp = http_requests.post(
-        url,
-        headers=headers,
-        json={"query": query},
-        timeout=30,
-    )
-    if not resp.ok:
-        raise HTTPException(status_code=502, detail=f"Google Ads API error: {resp.text[:300]}")
-    return resp.json().get("results", [])
+    return headers
+
+
+def _gaql(access_token: str, developer_token: str, customer_id: str, query: str,
+          manager_id: str = "") -> list:
+    """Ejecuta una consulta GAQL con googleAds:search siguiendo nextPageToken.
+    Para consultas grandes (segments.date) usar _gaql_stream.
+    """
+    url = f"{GOOGLE_ADS_BASE}/customers/{customer_id}/googleAds:search"
+    headers = _gaql_headers(access_token, developer_token, manager_id)
+    results: list = []
+    page_token = None
+    while True:
+        body = {"query": query}
+        if page_token:
+            body["pageToken"] = page_token
+        resp = http_requests.post(url, headers=headers, json=body, timeout=30)
+        if not resp.ok:
+            raise HTTPException(status_code=502, detail=f"Google Ads API error: {resp.text[:300]}")
+        data = resp.json()
+        results.extend(data.get("results", []))
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return results
+
+
+def _iter_json_array(chunks: Iterator[str]) -> Iterator[dict]:
+    """Decodifica un arreglo JSON ([{...}, {...}]) conforme llegan los fragmentos.
+    Solo se mantiene en memoria el elemento en curso. Cuando un elemento llega
+    incompleto se espera a que el buffer duplique su tamaño antes de reintentar,
+    para que el costo total de decodificación siga siendo lineal.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    retry_at = 0
+    for chunk in chunks:
+        buf += chunk
+        if len(buf) < retry_at:
+            continue
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos >= len(buf):
+                break
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break
+            yield obj
+        buf = buf[pos:]
+        retry_at = len(buf) * 2
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos >= len(buf):
+            return
+        obj, pos = decoder.raw_decode(buf, pos)
+        yield obj
+
+
+def _gaql_stream(access_token: str, developer_token: str, customer_id: str, query: str,
+                 manager_id: str = "") -> Iterator[dict]:
+    """Ejecuta una consulta GAQL con googleAds:searchStream y entrega fila por fila.
+    La respuesta no se carga completa: cada lote se decodifica al llegar y se descarta
+    en cuanto se consumen sus filas. Los errores HTTP se reportan como 502 igual que _gaql,
+    también si la respuesta llega cortada o con JSON inválido.
+    """
+    url = f"{GOOGLE_ADS_BASE}/customers/{customer_id}/googleAds:searchStream"
+    headers = _gaql_headers(access_token, developer_token, manager_id)
+    with http_requests.post(url, headers=headers, json={"query": query}, timeout=30, stream=True) as resp:
+        if not resp.ok:
+            raise HTTPException(status_code=502, detail=f"Google Ads API error: {resp.text[:300]}")
+        resp.encoding = "utf-8"
+        batches = _iter_json_array(resp.iter_content(chunk_size=64 * 1024, decode_unicode=True))
+        while True:
+            try:
+                batch = next(batches, None)
+            except (json.JSONDecodeError, http_requests.RequestException) as e:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Google Ads API error: respuesta de searchStream incompleta ({e})"[:300],
+                )
+            if batch is None:
+                return
+            if "error" in batch:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Google Ads API error: {json.dumps(batch['error'])[:300]}",
+                )
+            yield from batch.get("results", [])
 
 
 # ─── Status ────────────────────────────────────────────────────────────────────
@@ -242,7 +308,7 @@ def exchange_oauth_code(payload: dict, user: user_dependency, db: db_dependency)
 
     redirect_uri = os.getenv("GOOGLE_ADS_REDIRECT_URI", "http://localhost")
     resp = http_requests.post(
-        "https://oauth2.googleapis.com/token",
+        GOOGLE_OAUTH_TOKEN_URL,
         json={
             "client_id": client_id,
             "client_secret": client_secret,
@@ -264,16 +330,7 @@ def exchange_oauth_code(payload: dict, user: user_dependency, db: db_dependency)
         )
 
     # Guardar en DB (no en código, no en git)
-    existing = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "google_ads_refresh_token")
-        .first()
-    )
-    if existing:
-        existing.value = refresh_token
-    else:
-        db.add(SystemSettings(key="google_ads_refresh_token", value=refresh_token))
-    db.commit()
+    settings_registry.set(db, "google_ads_refresh_token", refresh_token)
 
     return {"success": True, "message": "Google Ads conectado correctamente"}
 
@@ -282,8 +339,7 @@ def exchange_oauth_code(payload: dict, user: user_dependency, db: db_dependency)
 async def disconnect_google_ads(user: user_dependency, db: db_dependency):
     """Revoca la conexión eliminando el refresh_token de DB."""
     _require_admin(user)
-    db.query(SystemSettings).filter(SystemSettings.key == "google_ads_refresh_token").delete()
-    db.commit()
+    settings_registry.delete(db, "google_ads_refresh_token")
     return {"success": True}
 
 
@@ -293,13 +349,7 @@ async def disconnect_google_ads(user: user_dependency, db: db_dependency):
 async def get_customer_map(user: user_dependency, db: db_dependency):
     """Devuelve el mapa actual de marca → customer_id de Google Ads."""
     _require_admin(user)
-    row = db.query(SystemSettings).filter(SystemSettings.key == "google_ads_customer_map").first()
-    if row and row.value:
-        try:
-            return json.loads(row.value)
-        except Exception:
-            pass
-    return {}
+    return settings_registry.snapshot(db).get_json("google_ads_customer_map")
 
 
 @router.put("/customer-map")
@@ -315,12 +365,7 @@ async def set_customer_map(payload: dict, user: user_dependency, db: db_dependen
             continue
         cleaned[str(marca).strip()] = str(cid).strip().replace("-", "")
 
-    row = db.query(SystemSettings).filter(SystemSettings.key == "google_ads_customer_map").first()
-    if row:
-        row.value = json.dumps(cleaned, ensure_ascii=False)
-    else:
-        db.add(SystemSettings(key="google_ads_customer_map", value=json.dumps(cleaned, ensure_ascii=False)))
-    db.commit()
+    settings_registry.set_json(db, "google_ads_customer_map", cleaned)
     return {"success": True, "cuentas_guardadas": len(cleaned), "mapa": cleaned}
 
 
@@ -473,7 +518,15 @@ def list_campaign_ads(
                 asset_resource = img.get("asset", "")
                 if asset_resource:
                     asset_id = asset_resource.split("/")[-1]
-                    imagenes.append({"tipo": tipo, "asset_id": asset_id})
+                    imagenes.append({
+                        "tipo": tipo,
+                        "asset_id": asset_id,
+                        # Servida desde el caché en disco del backend (URL firmada para <img>)
+                        "proxy_url": ad_image_cache.signed_url(
+                            f"/google-ads/assets/{asset_id}/imagen?marca={quote(marca or '')}",
+                            f"google:{marca or ''}:{asset_id}",
+                        ),
+                    })
 
         results.append(
             {
@@ -525,12 +578,21 @@ def list_campaign_ads(
 @router.get("/assets/{asset_id}/imagen")
 def proxy_asset_image(
     asset_id: str,
-    user: user_dependency,
+    request: Request,
+    user: optional_user_dependency,
     db: db_dependency,
     marca: Optional[str] = Query(None),
+    ancho: Optional[int] = Query(None, ge=1, description="Ancho máximo en px (variante reducida)"),
+    exp: Optional[int] = Query(None),
+    sig: Optional[str] = Query(None),
 ):
-    """Proxy para imágenes de Google Ads — el frontend nunca ve las credenciales."""
-    _require_admin(user)
+    """Proxy para imágenes de Google Ads — el frontend nunca ve las credenciales.
+    Las imágenes se sirven desde el caché en disco (ad_image_cache) cuando existen,
+    sin consultar a Google. Acepta la URL firmada de proxy_url (para <img>) o un
+    token de administrador.
+    """
+    if not ad_image_cache.valid_signature(f"google:{marca or ''}:{asset_id}", exp, sig):
+        _require_admin(user)
     cfg = _get_google_config(db)
     if not _is_configured(cfg):
         raise HTTPException(status_code=503, detail="Google Ads no configurado")
@@ -539,34 +601,35 @@ def proxy_asset_image(
     if not customer_id:
         raise HTTPException(status_code=400, detail="Especifica ?marca= para identificar la cuenta")
 
-    token = _get_access_token(cfg)
-    rows = _gaql(
-        token,
-        cfg["developer_token"],
-        customer_id,
-        f"""
-        SELECT asset.id, asset.image_asset.full_size.url
-        FROM asset
-        WHERE asset.id = {asset_id}
-        """,
-        manager_id=cfg.get("manager_id", ""),
-    )
-    if not rows:
-        raise HTTPException(status_code=404, detail="Asset no encontrado")
+    def descargar() -> tuple[bytes, str]:
+        token = _get_access_token(cfg)
+        rows = _gaql(
+            token,
+            cfg["developer_token"],
+            customer_id,
+            f"""
+            SELECT asset.id, asset.image_asset.full_size.url
+            FROM asset
+            WHERE asset.id = {asset_id}
+            """,
+            manager_id=cfg.get("manager_id", ""),
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail="Asset no encontrado")
 
-    image_url = (
-        rows[0].get("asset", {}).get("imageAsset", {}).get("fullSize", {}).get("url")
-    )
-    if not image_url:
-        raise HTTPException(status_code=404, detail="Este asset no tiene imagen disponible")
+        image_url = (
+            rows[0].get("asset", {}).get("imageAsset", {}).get("fullSize", {}).get("url")
+        )
+        if not image_url:
+            raise HTTPException(status_code=404, detail="Este asset no tiene imagen disponible")
 
-    img_resp = http_requests.get(image_url, timeout=20)
-    if not img_resp.ok:
-        raise HTTPException(status_code=404, detail="No se pudo obtener la imagen")
+        img_resp = http_requests.get(image_url, timeout=20)
+        if not img_resp.ok:
+            raise HTTPException(status_code=404, detail="No se pudo obtener la imagen")
+        return img_resp.content, img_resp.headers.get("content-type", "image/jpeg")
 
-    return Response(
-        content=img_resp.content,
-        media_type=img_resp.headers.get("content-type", "image/jpeg"),
+    return ad_image_cache.serve(
+        request, f"google:{customer_id}:{asset_id}", ad_image_cache.variant_for_width(ancho), descargar
     )
 
 
@@ -618,8 +681,11 @@ def get_period_metrics(
         customer_id = _get_customer_id_for_marca(cfg, marca)
         if not customer_id:
             continue
+        # Agrupar por campaign.id (segments.date genera una fila por día); las filas
+        # se consumen en streaming, así que solo se guarda un acumulado por campaña.
+        agg: dict = {}
         try:
-            rows = _gaql(
+            rows = _gaql_stream(
                 token, cfg["developer_token"], customer_id,
                 f"""
                 SELECT
@@ -635,25 +701,22 @@ def get_period_metrics(
                 """,
                 manager_id=cfg.get("manager_id", ""),
             )
+            for r in rows:
+                cid = str(r.get("campaign", {}).get("id", ""))
+                if not cid:
+                    continue
+                m = r.get("metrics", {})
+                if cid not in agg:
+                    agg[cid] = {"impressions": 0, "clicks": 0, "costMicros": 0,
+                                "conversions": 0.0, "interactions": 0}
+                agg[cid]["impressions"] += int(m.get("impressions", 0) or 0)
+                agg[cid]["clicks"] += int(m.get("clicks", 0) or 0)
+                agg[cid]["costMicros"] += int(m.get("costMicros", 0) or 0)
+                agg[cid]["conversions"] += float(m.get("conversions", 0) or 0)
+                agg[cid]["interactions"] += int(m.get("interactions", 0) or 0)
         except Exception:
             continue
 
-        # Agrupar por campaign.id (segments.date genera una fila por día)
-        agg: dict = {}
-        for r in rows:
-            cid = str(r.get("campaign", {}).get("id", ""))
-            if not cid:
-                continue
-            m = r.get("metrics", {})
-            if cid not in agg:
-                agg[cid] = {"impressions": 0, "clicks": 0, "costMicros": 0,
-                            "conversions": 0.0, "interactions": 0}
-            agg[cid]["impressions"] += int(m.get("impressions", 0) or 0)
-            agg[cid]["clicks"] += int(m.get("clicks", 0) or 0)
-            agg[cid]["costMicros"] += int(m.get("costMicros", 0) or 0)
-            agg[cid]["conversions"] += float(m.get("conversions", 0) or 0)
-            agg[cid]["interactions"] += int(m.get("interactions", 0) or 0)
-
         for cid, a in agg.items():
             impr = a["impressions"]
             clicks = a["clicks"]
@@ -824,7 +887,7 @@ def _importar_todas_las_marcas(db: Session) -> dict:
         # ── Query 2: Métricas acumuladas (all-time, sin filtro de fecha) ──
         metricas_por_id: dict = {}
         try:
-            rows_metrics = _gaql(
+            rows_metrics = _gaql_stream(
                 token, cfg["developer_token"], customer_id,
                 """
                 SELECT
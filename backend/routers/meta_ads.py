@@ -13,21 +13,30 @@ un System User Token que no caduca.  Se puede generar desde:
   Meta Business Suite → Configuración → Cuentas → Usuarios del sistema → Generar Token
 """
 import json
-from typing import Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+import threading
+import time
+from datetime import date as date_type, timedelta
+from typing import Annotated, Iterator, Optional
+from urllib.parse import urlencode
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from starlette import status
-from .auth import get_current_user
+from .auth import get_current_user, get_current_user_opcional
 from database import SessionLocal
-from models import Campanas, SystemSettings
+from models import Campanas
+from system_settings import registry as settings_registry, env_json
+from collections import OrderedDict
+import ad_image_cache
 import os
 import requests as http_requests
 
 router = APIRouter(prefix="/meta-ads", tags=["meta-ads"])
 user_dependency = Annotated[dict, Depends(get_current_user)]
+optional_user_dependency = Annotated[Optional[dict], Depends(get_current_user_opcional)]
 
 META_GRAPH_VERSION = "v21.0"
-META_GRAPH_BASE = f"https://graph.facebook.com/{META_GRAPH_VERSION}"
+# El host se puede sobreescribir para apuntar al simulador local (ads_simulator.py)
+META_GRAPH_BASE = f"{os.getenv('META_GRAPH_API_HOST', 'https://graph.facebook.com')}/{META_GRAPH_VERSION}"
 
 
 def get_db():
@@ -50,33 +59,13 @@ def _require_admin(user: dict):
 
 def _get_meta_config(db: Session) -> dict:
     """Lee credenciales de .env y tokens/account_map de DB o .env."""
+    settings = settings_registry.snapshot(db)
     # Access token: DB > .env
-    db_token = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "meta_ads_access_token")
-        .first()
-    )
-    access_token = (db_token.value if db_token else None) or os.getenv("META_ADS_ACCESS_TOKEN")
+    access_token = settings.get("meta_ads_access_token") or os.getenv("META_ADS_ACCESS_TOKEN")
 
     # Account map: .env base, DB override
-    account_map: dict = {}
-    env_map_str = os.getenv("META_ADS_ACCOUNT_MAP", "")
-    if env_map_str:
-        try:
-            account_map = json.loads(env_map_str)
-        except Exception:
-            pass
-
-    db_map = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "meta_ads_account_map")
-        .first()
-    )
-    if db_map and db_map.value:
-        try:
-            account_map.update(json.loads(db_map.value))
-        except Exception:
-            pass
+    account_map = env_json("META_ADS_ACCOUNT_MAP")
+    account_map.update(settings.get_json("meta_ads_account_map"))
 
     return {
         "app_id": os.getenv("META_ADS_APP_ID"),
@@ -98,16 +87,187 @@ def _get_account_id_for_marca(cfg: dict, marca: Optional[str]) -> str:
     return ""
 
 
+def _meta_error_message(resp) -> str:
+    try:
+        return resp.json().get("error", {}).get("message", resp.text[:300])
+    except Exception:
+        return resp.text[:300]
+
+
+def _meta_get(url: str, params: dict | None = None) -> dict:
+    resp = http_requests.get(url, params=params, timeout=30)
+    if not resp.ok:
+        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {_meta_error_message(resp)}")
+    return resp.json()
+
+
 def _meta_api(access_token: str, endpoint: str, params: dict | None = None) -> dict:
-    """Llamada GET al Graph API de Meta."""
-    url = f"{META_GRAPH_BASE}/{endpoint}"
+    """Llamada GET al Graph API de Meta (una sola página)."""
     p = dict(params or {})
     p["access_token"] = access_token
-    resp = http_requests.get(url, params=p, timeout=30)
+    return _meta_get(f"{META_GRAPH_BASE}/{endpoint}", p)
+
+
+def _follow_paging(first_page: dict) -> Iterator[dict]:
+    """Entrega los elementos de `data` de una página y de las siguientes (paging.next).
+    La URL de paging.next ya incluye el access_token y el cursor."""
+    page = first_page
+    while True:
+        yield from page.get("data", [])
+        next_url = (page.get("paging") or {}).get("next")
+        if not next_url:
+            return
+        page = _meta_get(next_url)
+
+
+def _meta_paginate(access_token: str, endpoint: str, params: dict | None = None) -> Iterator[dict]:
+    """Itera perezosamente todos los elementos de un edge del Graph API siguiendo los cursores."""
+    yield from _follow_paging(_meta_api(access_token, endpoint, params))
+
+
+META_BATCH_SIZE = 50  # máximo de peticiones por llamada a la Batch API
+
+
+def _meta_batch(access_token: str, calls: list[tuple[str, dict]], follow_pages: bool = True) -> list[dict]:
+    """Ejecuta varios GET (endpoint, params) con la Batch API del Graph, en lotes de 50.
+    Devuelve un body por petición, en el mismo orden. Con follow_pages los edges
+    paginados se completan siguiendo paging.next, de modo que `data` trae todos los
+    elementos. Si una petición falla su body es {"error": {"message": ...}} y las
+    demás no se ven afectadas.
+    """
+    bodies: list[dict] = []
+    for chunk_start in range(0, len(calls), META_BATCH_SIZE):
+        chunk = calls[chunk_start:chunk_start + META_BATCH_SIZE]
+        batch = [
+            {"method": "GET", "relative_url": f"{endpoint}?{urlencode(params)}" if params else endpoint}
+            for endpoint, params in chunk
+        ]
+        resp = http_requests.post(
+            f"{META_GRAPH_BASE}/",
+            data={"access_token": access_token, "batch": json.dumps(batch), "include_headers": "false"},
+            timeout=60,
+        )
+        if not resp.ok:
+            raise HTTPException(status_code=502, detail=f"Meta Ads API error: {_meta_error_message(resp)}")
+
+        for (endpoint, params), item in zip(chunk, resp.json()):
+            try:
+                if item is None:
+                    # Meta devuelve null cuando una sub-petición no alcanzó a ejecutarse
+                    body = _meta_api(access_token, endpoint, params)
+                else:
+                    body = json.loads(item.get("body") or "{}")
+                    if item.get("code") != 200 and "error" not in body:
+                        body = {"error": {"message": f"HTTP {item.get('code')}"}}
+                if follow_pages and "error" not in body and "data" in body:
+                    body = {"data": list(_follow_paging(body))}
+            except HTTPException as e:
+                body = {"error": {"message": e.detail}}
+            bodies.append(body)
+    return bodies
+
+
+# Rangos mayores a esto (o date_preset=maximum) se piden como reporte asíncrono
+ASYNC_INSIGHTS_MIN_DAYS = 93
+ASYNC_INSIGHTS_POLL_SECONDS = 2  # intervalo máximo entre consultas de estado
+ASYNC_INSIGHTS_FIRST_POLL_SECONDS = 0.5
+ASYNC_INSIGHTS_TIMEOUT_SECONDS = 300
+# Meta conserva ~37 meses de insights; más atrás no hay datos que pedir
+META_INSIGHTS_RETENTION_DAYS = 37 * 30
+
+
+def _needs_async_insights(params: dict) -> bool:
+    if params.get("date_preset") == "maximum":
+        return True
+    try:
+        tr = json.loads(params.get("time_range") or "{}")
+        since = date_type.fromisoformat(tr["since"])
+        until = date_type.fromisoformat(tr["until"])
+    except Exception:
+        return False
+    return (until - since).days > ASYNC_INSIGHTS_MIN_DAYS
+
+
+def _meta_async_start(access_token: str, object_id: str, params: dict) -> str:
+    """Lanza un reporte asíncrono de insights y devuelve su report_run_id."""
+    resp = http_requests.post(
+        f"{META_GRAPH_BASE}/{object_id}/insights",
+        data={**params, "access_token": access_token},
+        timeout=30,
+    )
     if not resp.ok:
-        error_msg = resp.json().get("error", {}).get("message", resp.text[:300])
-        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {error_msg}")
-    return resp.json()
+        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {_meta_error_message(resp)}")
+    report_run_id = resp.json().get("report_run_id")
+    if not report_run_id:
+        raise HTTPException(status_code=502, detail="Meta Ads API error: no se recibió report_run_id")
+    return report_run_id
+
+
+def _meta_async_wait(access_token: str, report_run_ids: list[str]) -> dict:
+    """Espera varios reportes a la vez (una Batch API por consulta de estado).
+    Devuelve {report_run_id: None si terminó | mensaje de error}.
+    """
+    resultado: dict = {}
+    pendientes = list(report_run_ids)
+    deadline = time.monotonic() + ASYNC_INSIGHTS_TIMEOUT_SECONDS
+    espera = ASYNC_INSIGHTS_FIRST_POLL_SECONDS
+    while pendientes:
+        runs = _meta_batch(access_token, [
+            (run_id, {"fields": "async_status,async_percent_completion"}) for run_id in pendientes
+        ], follow_pages=False)
+        siguen = []
+        for run_id, run in zip(pendientes, runs):
+            async_status = run.get("async_status")
+            if "error" in run:
+                resultado[run_id] = f"Meta Ads API error: {run['error'].get('message', '')}"
+            elif async_status == "Job Completed" and int(run.get("async_percent_completion", 0) or 0) >= 100:
+                resultado[run_id] = None
+            elif async_status in ("Job Failed", "Job Skipped"):
+                resultado[run_id] = f"Meta Ads API error: reporte {async_status}"
+            else:
+                siguen.append(run_id)
+        pendientes = siguen
+        if not pendientes:
+            break
+        if time.monotonic() > deadline:
+            for run_id in pendientes:
+                resultado[run_id] = "Meta Ads API: el reporte de insights tardó demasiado"
+            break
+        time.sleep(espera)
+        espera = min(espera * 2, ASYNC_INSIGHTS_POLL_SECONDS)
+    return resultado
+
+
+def _meta_insights_many(access_token: str, calls: list[tuple[str, dict]]) -> list[dict]:
+    """Insights de varios objetos (object_id, params). Devuelve un body por objeto, en el
+    mismo orden, como _meta_batch: {"data": [...]} o {"error": {"message": ...}}.
+    Los rangos cortos van juntos en la Batch API; los grandes se lanzan todos como
+    reportes asíncronos y se esperan a la vez, en lugar de uno tras otro.
+    """
+    bodies: list = [None] * len(calls)
+    sync_idx = [i for i, (_, params) in enumerate(calls) if not _needs_async_insights(params)]
+    if sync_idx:
+        sync_bodies = _meta_batch(access_token, [(f"{calls[i][0]}/insights", calls[i][1]) for i in sync_idx])
+        for i, body in zip(sync_idx, sync_bodies):
+            bodies[i] = body
+
+    runs: dict = {}  # report_run_id -> posición
+    for i, (object_id, params) in enumerate(calls):
+        if bodies[i] is None:
+            try:
+                runs[_meta_async_start(access_token, object_id, params)] = i
+            except HTTPException as e:
+                bodies[i] = {"error": {"message": e.detail}}
+    if runs:
+        estados = _meta_async_wait(access_token, list(runs))
+        listos = [run_id for run_id in runs if estados.get(run_id) is None]
+        for run_id in runs:
+            if estados.get(run_id) is not None:
+                bodies[runs[run_id]] = {"error": {"message": estados[run_id]}}
+        resultados = _meta_batch(access_token, [(f"{run_id}/insights", {"limit": "500"}) for run_id in listos])
+        for run_id, body in zip(listos, resultados):
+            bodies[runs[run_id]] = body
+    return bodies
 
 
 # Mapeo de optimization_goal (ad set) → action_type para "Resultados"
@@ -127,20 +287,34 @@ _OPT_GOAL_ACTION = {
 }
 
 
-def _get_optimization_goals(token: str, account_id: str) -> dict:
-    """Devuelve {campaign_id: optimization_goal} para todas las adsets de una cuenta."""
+def _campaigns_params() -> dict:
+    return {
+        "fields": "id,name,status,start_time,stop_time,daily_budget,lifetime_budget",
+        "filtering": json.dumps([{"field": "effective_status", "operator": "NOT_IN", "value": ["DELETED", "ARCHIVED"]}]),
+        "limit": "500",
+    }
+
+
+def _campaign_insights_params(**date_filter) -> dict:
+    return {
+        "fields": "campaign_id,impressions,clicks,spend,actions,ctr,inline_link_clicks,cost_per_inline_link_click",
+        "level": "campaign",
+        "limit": "500",
+        **date_filter,
+    }
+
+
+def _adsets_params() -> dict:
+    return {"fields": "campaign_id,optimization_goal", "limit": "500"}
+
+
+def _goals_from_adsets(adsets) -> dict:
+    """{campaign_id: optimization_goal} a partir de las adsets (gana la primera de cada campaña)."""
     goals: dict = {}
-    try:
-        data = _meta_api(token, f"{account_id}/adsets", {
-            "fields": "campaign_id,optimization_goal",
-            "limit": "500",
-        })
-        for a in data.get("data", []):
-            cid = a.get("campaign_id")
-            if cid and cid not in goals:
-                goals[cid] = a.get("optimization_goal", "")
-    except Exception:
-        pass
+    for a in adsets:
+        cid = a.get("campaign_id")
+        if cid and cid not in goals:
+            goals[cid] = a.get("optimization_goal", "")
     return goals
 
 
@@ -212,16 +386,7 @@ def exchange_short_token(payload: dict, user: user_dependency, db: db_dependency
     if not long_token:
         raise HTTPException(status_code=400, detail="Meta no devolvió el token largo")
 
-    existing = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "meta_ads_access_token")
-        .first()
-    )
-    if existing:
-        existing.value = long_token
-    else:
-        db.add(SystemSettings(key="meta_ads_access_token", value=long_token))
-    db.commit()
+    settings_registry.set(db, "meta_ads_access_token", long_token)
 
     return {"success": True, "message": "Token de Meta Ads guardado correctamente"}
 
@@ -234,24 +399,14 @@ async def save_token(payload: dict, user: user_dependency, db: db_dependency):
     if not token:
         raise HTTPException(status_code=400, detail="Se requiere access_token")
 
-    existing = (
-        db.query(SystemSettings)
-        .filter(SystemSettings.key == "meta_ads_access_token")
-        .first()
-    )
-    if existing:
-        existing.value = token
-    else:
-        db.add(SystemSettings(key="meta_ads_access_token", value=token))
-    db.commit()
+    settings_registry.set(db, "meta_ads_access_token", token)
     return {"success": True}
 
 
 @router.delete("/token/disconnect")
 async def disconnect_meta_ads(user: user_dependency, db: db_dependency):
     _require_admin(user)
-    db.query(SystemSettings).filter(SystemSettings.key == "meta_ads_access_token").delete()
-    db.commit()
+    settings_registry.delete(db, "meta_ads_access_token")
     return {"success": True}
 
 
@@ -260,13 +415,7 @@ async def disconnect_meta_ads(user: user_dependency, db: db_dependency):
 @router.get("/account-map")
 async def get_account_map(user: user_dependency, db: db_dependency):
     _require_admin(user)
-    row = db.query(SystemSettings).filter(SystemSettings.key == "meta_ads_account_map").first()
-    if row and row.value:
-        try:
-            return json.loads(row.value)
-        except Exception:
-            pass
-    return {}
+    return settings_registry.snapshot(db).get_json("meta_ads_account_map")
 
 
 @router.put("/account-map")
@@ -280,12 +429,7 @@ async def set_account_map(payload: dict, user: user_dependency, db: db_dependenc
         val = str(aid).strip()
         cleaned[str(marca).strip()] = val if val.startswith("act_") else f"act_{val}"
 
-    row = db.query(SystemSettings).filter(SystemSettings.key == "meta_ads_account_map").first()
-    if row:
-        row.value = json.dumps(cleaned, ensure_ascii=False)
-    else:
-        db.add(SystemSettings(key="meta_ads_account_map", value=json.dumps(cleaned, ensure_ascii=False)))
-    db.commit()
+    settings_registry.set_json(db, "meta_ads_account_map", cleaned)
     return {"success": True, "cuentas_guardadas": len(cleaned), "mapa": cleaned}
 
 
@@ -315,14 +459,10 @@ def list_meta_campaigns(
     token = cfg["access_token"]
 
     # Obtener campañas con insights all-time
-    data = _meta_api(token, f"{account_id}/campaigns", {
-        "fields": "id,name,status,start_time,stop_time,daily_budget,lifetime_budget",
-        "filtering": json.dumps([{"field": "effective_status", "operator": "NOT_IN", "value": ["DELETED", "ARCHIVED"]}]),
-        "limit": "500",
-    })
+    campaigns = _meta_paginate(token, f"{account_id}/campaigns", _campaigns_params())
 
     results = []
-    for c in data.get("data", []):
+    for c in campaigns:
         results.append({
             "id": c.get("id"),
             "nombre": c.get("name"),
@@ -337,6 +477,37 @@ def list_meta_campaigns(
 
 # ─── Anuncios de una campaña Meta Ads ────────────────────────────────────────
 
+# Memorias en proceso compartidas por los hilos del threadpool: acotadas (LRU) y con candado
+_MEMO_LOCK = threading.Lock()
+
+
+def _memo_get(memo: OrderedDict, key: str):
+    with _MEMO_LOCK:
+        value = memo.get(key)
+        if value is not None:
+            memo.move_to_end(key)
+        return value
+
+
+def _memo_put(memo: OrderedDict, key: str, value, max_entries: int):
+    with _MEMO_LOCK:
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > max_entries:
+            memo.popitem(last=False)
+
+
+def _memo_forget(memo: OrderedDict, key: str):
+    with _MEMO_LOCK:
+        memo.pop(key, None)
+
+
+# creative_id → (timestamp, thumbnail 800×800); las URLs del CDN de Meta duran días
+_HD_THUMBS: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+_HD_THUMBS_TTL_SECONDS = 3600
+_HD_THUMBS_MAX = 5000
+
+
 @router.get("/campanas/{campaign_id}/anuncios")
 def list_meta_campaign_ads(
     campaign_id: str,
@@ -354,19 +525,28 @@ def list_meta_campaign_ads(
     token = cfg["access_token"]
     account_id = _get_account_id_for_marca(cfg, marca) if marca else ""
 
-    data = _meta_api(token, f"{campaign_id}/ads", {
+    ads = list(_meta_paginate(token, f"{campaign_id}/ads", {
         "fields": "id,name,effective_status,creative{id,thumbnail_url,image_url,image_hash,body,title,call_to_action_type,object_story_spec,object_url}",
         "limit": "100",
-    })
-
-    ads = data.get("data", [])
+    }))
 
     # ── Batch 1: HD thumbnails (800×800) via creative IDs — covers ALL ad types including Reels.
     # The nested creative{thumbnail_url} expansion always returns p64x64 (1 740 B).
     # Querying creative objects directly with thumbnail_width/height gives p800x800 (74 KB+).
     # One GET call for up to 50 IDs.
+    # Las URLs ya resueltas en la última hora se reutilizan sin volver a pedirlas.
     creative_id_to_hd_thumb: dict = {}
-    creative_ids = [ad["creative"]["id"] for ad in ads if (ad.get("creative") or {}).get("id")]
+    now = time.time()
+    creative_ids = []
+    for ad in ads:
+        cid = (ad.get("creative") or {}).get("id")
+        if not cid:
+            continue
+        known = _memo_get(_HD_THUMBS, cid)
+        if known and now - known[0] < _HD_THUMBS_TTL_SECONDS:
+            creative_id_to_hd_thumb[cid] = known[1]
+        else:
+            creative_ids.append(cid)
     for chunk_start in range(0, len(creative_ids), 50):
         chunk = creative_ids[chunk_start:chunk_start + 50]
         try:
@@ -381,6 +561,7 @@ def list_meta_campaign_ads(
                     tu = obj.get("thumbnail_url", "")
                     if tu:
                         creative_id_to_hd_thumb[cid] = tu
+                        _memo_put(_HD_THUMBS, cid, (now, tu), _HD_THUMBS_MAX)
         except Exception:
             pass
 
@@ -395,12 +576,12 @@ def list_meta_campaign_ads(
         ]
         if hashes:
             try:
-                imgs = _meta_api(token, f"{account_id}/adimages", {
+                imgs = _meta_paginate(token, f"{account_id}/adimages", {
                     "hashes": json.dumps(hashes),
                     "fields": "hash,url",
                     "limit": "500",
                 })
-                for img in imgs.get("data", []):
+                for img in imgs:
                     h = img.get("hash")
                     u = img.get("url", "")
                     if h and u:
@@ -445,11 +626,18 @@ def list_meta_campaign_ads(
         ad_id = ad.get("id", "")
         dest_url = f"https://www.facebook.com/ads/library/?id={ad_id}" if ad_id else ""
 
+        if ad_id and full_url:
+            _remember_ad_image_url(str(ad_id), full_url)
+
         results.append({
             "id": str(ad_id),
             "nombre": ad.get("name", ""),
             "estado": ad.get("effective_status", ""),
             "full_image_url": full_url,
+            # Misma imagen servida desde el caché en disco del backend (URL firmada para <img>)
+            "imagen_proxy_url": ad_image_cache.signed_url(
+                f"/meta-ads/anuncios/{ad_id}/imagen", f"meta:{ad_id}"
+            ) if ad_id and full_url else "",
             "image_url": creative.get("image_url", ""),
             "thumbnail_url": creative_id_to_hd_thumb.get(creative_id, "") or creative.get("thumbnail_url", ""),
             "titulo": creative.get("title", "") or link_data.get("name", ""),
@@ -459,6 +647,72 @@ def list_meta_campaign_ads(
     return results
 
 
+# ─── Imagen de anuncio (proxy con caché en disco) ─────────────────────────────
+
+# ad_id → URL de la mejor imagen resuelta por list_meta_campaign_ads, para que el
+# proxy no tenga que volver a consultar el Graph API al descargarla.
+_AD_IMAGE_URLS: "OrderedDict[str, str]" = OrderedDict()
+_AD_IMAGE_URLS_MAX = 5000
+
+
+def _remember_ad_image_url(ad_id: str, url: str):
+    _memo_put(_AD_IMAGE_URLS, ad_id, url, _AD_IMAGE_URLS_MAX)
+
+
+def _lookup_ad_image_url(token: str, ad_id: str) -> str:
+    ad = _meta_api(token, ad_id, {
+        "fields": "creative{image_url,thumbnail_url,object_story_spec}",
+        "thumbnail_width": "800",
+        "thumbnail_height": "800",
+    })
+    creative = ad.get("creative") or {}
+    oss = creative.get("object_story_spec") or {}
+    return (
+        creative.get("image_url")
+        or (oss.get("photo_data") or {}).get("url")
+        or (oss.get("video_data") or {}).get("image_url")
+        or (oss.get("link_data") or {}).get("picture")
+        or creative.get("thumbnail_url")
+        or ""
+    )
+
+
+@router.get("/anuncios/{ad_id}/imagen")
+def proxy_ad_image(
+    ad_id: str,
+    request: Request,
+    user: optional_user_dependency,
+    db: db_dependency,
+    ancho: Optional[int] = Query(None, ge=1, description="Ancho máximo en px (variante reducida)"),
+    exp: Optional[int] = Query(None),
+    sig: Optional[str] = Query(None),
+):
+    """Imagen de un anuncio de Meta servida desde el caché en disco (ad_image_cache).
+    Acepta la URL firmada de imagen_proxy_url (para <img>) o un token de administrador.
+    """
+    if not ad_image_cache.valid_signature(f"meta:{ad_id}", exp, sig):
+        _require_admin(user)
+
+    def descargar() -> tuple[bytes, str]:
+        image_url = _memo_get(_AD_IMAGE_URLS, ad_id)
+        if not image_url:
+            cfg = _get_meta_config(db)
+            if not _is_configured(cfg):
+                raise HTTPException(status_code=503, detail="Meta Ads no configurado")
+            image_url = _lookup_ad_image_url(cfg["access_token"], ad_id)
+        if not image_url:
+            raise HTTPException(status_code=404, detail="Este anuncio no tiene imagen disponible")
+
+        img_resp = http_requests.get(image_url, timeout=20)
+        if not img_resp.ok:
+            # La URL del CDN pudo expirar: olvidarla para resolverla de nuevo la próxima vez
+            _memo_forget(_AD_IMAGE_URLS, ad_id)
+            raise HTTPException(status_code=404, detail="No se pudo obtener la imagen")
+        return img_resp.content, img_resp.headers.get("content-type", "image/jpeg")
+
+    return ad_image_cache.serve(request, f"meta:{ad_id}", ad_image_cache.variant_for_width(ancho), descargar)
+
+
 # ─── Métricas por período ──────────────────────────────────────────────────────
 
 @router.get("/metrics")
@@ -497,22 +751,40 @@ def get_period_metrics(
 
     result: dict = {}
 
-    for marca in marcas:
-        account_id = _get_account_id_for_marca(cfg, marca)
-        if not account_id:
-            continue
+    account_ids = [aid for aid in (_get_account_id_for_marca(cfg, m) for m in marcas) if aid]
+    insights_params = _campaign_insights_params(time_range=json.dumps({"since": start, "until": end}))
+    use_async = _needs_async_insights(insights_params)
+
+    # adsets (optimization_goal) e insights de todas las cuentas en una sola Batch API;
+    # los rangos grandes se piden como reportes asíncronos que se esperan juntos.
+    calls = [(f"{aid}/adsets", _adsets_params()) for aid in account_ids]
+    if not use_async:
+        calls += [(f"{aid}/insights", insights_params) for aid in account_ids]
+    try:
+        bodies = _meta_batch(token, calls)
+        adsets_bodies = bodies[:len(account_ids)]
+        if use_async:
+            insights_bodies = _meta_insights_many(token, [(aid, insights_params) for aid in account_ids])
+        else:
+            insights_bodies = bodies[len(account_ids):]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {e}")
+
+    errores = [b["error"].get("message", "") for b in insights_bodies if "error" in b]
+    if account_ids and len(errores) == len(account_ids):
+        # Ninguna cuenta respondió: mostrar el error en lugar de métricas en cero
+        raise HTTPException(status_code=502, detail=errores[0] or "Meta Ads API error")
+
+    for i, account_id in enumerate(account_ids):
         try:
-            # Obtener optimization_goal por campaña (una sola llamada por cuenta)
-            opt_goals = _get_optimization_goals(token, account_id)
-
-            # Una sola llamada para todas las campañas de la cuenta en el período
-            insights_data = _meta_api(token, f"{account_id}/insights", {
-                "fields": "campaign_id,impressions,clicks,spend,actions,ctr,inline_link_clicks,cost_per_inline_link_click",
-                "level": "campaign",
-                "time_range": json.dumps({"since": start, "until": end}),
-                "limit": "500",
-            })
-            for row in insights_data.get("data", []):
+            opt_goals = _goals_from_adsets(adsets_bodies[i].get("data", []))
+
+            if "error" in insights_bodies[i]:
+                continue
+            insights_rows = insights_bodies[i].get("data", [])
+            for row in insights_rows:
                 cid = row.get("campaign_id")
                 if not cid:
                     continue
@@ -570,13 +842,27 @@ def sync_campaign_metrics(
 
     token = cfg["access_token"]
 
+    # Métricas all-time (date_preset=maximum) como reporte asíncrono: en síncrono
+    # Meta suele rechazar o cortar por tiempo los rangos largos
     try:
-        insights = _meta_api(token, f"{campana.meta_ads_id}/insights", {
-            "fields": "impressions,clicks,spend,actions,ctr,inline_link_clicks,cost_per_inline_link_click",
-            "date_preset": "maximum",
-        })
+        adsets, = _meta_batch(token, [
+            (f"{campana.meta_ads_id}/adsets", {
+                "fields": "optimization_goal",
+                "limit": "1",
+            }),
+        ], follow_pages=False)
+        insights, = _meta_insights_many(token, [
+            (campana.meta_ads_id, {
+                "fields": "impressions,clicks,spend,actions,ctr,inline_link_clicks,cost_per_inline_link_click",
+                "date_preset": "maximum",
+            }),
+        ])
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=502, detail=str(e))
+        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {e}")
+    if "error" in insights:
+        raise HTTPException(status_code=502, detail=f"Meta Ads API error: {insights['error'].get('message', '')}")
 
     rows = insights.get("data", [])
     if not rows:
@@ -588,15 +874,7 @@ def sync_campaign_metrics(
     spend = float(row.get("spend", 0) or 0)
     ctr = float(row.get("ctr", 0) or 0)
 
-    # Obtener optimization_goal para esta campaña
-    try:
-        adsets = _meta_api(token, f"{campana.meta_ads_id}/adsets", {
-            "fields": "optimization_goal",
-            "limit": "1",
-        })
-        og = adsets.get("data", [{}])[0].get("optimization_goal", "") if adsets.get("data") else ""
-    except Exception:
-        og = ""
+    og = adsets.get("data", [{}])[0].get("optimization_goal", "") if adsets.get("data") else ""
 
     actions = row.get("actions", [])
     conversions = _extract_resultados(actions, og)
@@ -648,8 +926,6 @@ async def vincular_campaign(
 
 def _importar_todas_las_marcas(db: Session) -> dict:
     """Importa/actualiza campañas de Meta Ads para todas las marcas configuradas."""
-    from datetime import date as date_type
-
     cfg = _get_meta_config(db)
     if not _is_configured(cfg):
         return {"error": "Meta Ads no configurado"}
@@ -665,38 +941,71 @@ def _importar_todas_las_marcas(db: Session) -> dict:
 
     resumen = {"creadas": 0, "actualizadas": 0, "marcas": [], "errores": []}
 
+    cuentas = []
     for marca in marcas:
         account_id = _get_account_id_for_marca(cfg, marca)
         if not account_id:
             resumen["errores"].append(f"Sin account_id para '{marca}'")
             continue
+        cuentas.append((marca, account_id))
 
-        # ── Obtener lista de campañas ──
-        try:
-            data = _meta_api(token, f"{account_id}/campaigns", {
-                "fields": "id,name,status,start_time,stop_time,daily_budget,lifetime_budget",
-                "filtering": json.dumps([{"field": "effective_status", "operator": "NOT_IN", "value": ["DELETED", "ARCHIVED"]}]),
-                "limit": "500",
-            })
-        except HTTPException as e:
-            resumen["errores"].append(f"{marca} (campaigns): {e.detail}")
+    # ── Campañas y optimization_goal de todas las cuentas en una sola Batch API ──
+    calls = []
+    for _, account_id in cuentas:
+        calls.append((f"{account_id}/campaigns", _campaigns_params()))
+        calls.append((f"{account_id}/adsets", _adsets_params()))
+    try:
+        bodies = _meta_batch(token, calls)
+    except Exception as e:
+        bodies = [{"error": {"message": getattr(e, "detail", str(e))}}] * len(calls)
+
+    # ── Métricas all-time: desde el inicio de la campaña más antigua de cada cuenta
+    # (acotado a lo que Meta conserva y a hoy), de todas las cuentas a la vez. Las cuentas
+    # con campañas recientes caben en la Batch API; el resto va como reporte asíncrono.
+    # Las cuentas sin campañas no piden insights.
+    limite_retencion = hoy - timedelta(days=META_INSIGHTS_RETENTION_DAYS)
+    insights_bodies: list = [{"data": []}] * len(cuentas)
+    insights_calls, insights_idx = [], []
+    for i, (_, account_id) in enumerate(cuentas):
+        campaigns = bodies[2 * i].get("data", []) if "error" not in bodies[2 * i] else []
+        if not campaigns:
             continue
+        inicios = []
+        for c in campaigns:
+            try:
+                inicios.append(date_type.fromisoformat(c["start_time"][:10]))
+            except Exception:
+                pass
+        # Una campaña programada a futuro no debe dejar since > until
+        desde = min(max(min(inicios, default=limite_retencion), limite_retencion), hoy)
+        insights_idx.append(i)
+        insights_calls.append((account_id, _campaign_insights_params(
+            time_range=json.dumps({"since": desde.isoformat(), "until": hoy.isoformat()}),
+        )))
+    try:
+        for i, body in zip(insights_idx, _meta_insights_many(token, insights_calls)):
+            insights_bodies[i] = body
+    except Exception as e:
+        for i in insights_idx:
+            insights_bodies[i] = {"error": {"message": getattr(e, "detail", str(e))}}
 
-        campaigns = data.get("data", [])
+    for i, (marca, account_id) in enumerate(cuentas):
+        campaigns_body, adsets_body = bodies[2 * i], bodies[2 * i + 1]
+        if "error" in campaigns_body:
+            resumen["errores"].append(f"{marca} (campaigns): Meta Ads API error: {campaigns_body['error'].get('message', '')}")
+            continue
 
-        # ── Obtener optimization_goal por campaña ──
-        opt_goals = _get_optimization_goals(token, account_id)
+        campaigns = campaigns_body.get("data", [])
+        opt_goals = _goals_from_adsets(adsets_body.get("data", []))
 
-        # ── Obtener métricas all-time por campaña ──
+        # ── Métricas all-time por campaña ──
         metricas_por_id: dict = {}
+        if "error" in insights_bodies[i]:
+            # Se importan las campañas con 0s
+            resumen["errores"].append(f"{marca} (insights): {insights_bodies[i]['error'].get('message', '')}")
         try:
-            insights_data = _meta_api(token, f"{account_id}/insights", {
-                "fields": "campaign_id,impressions,clicks,spend,actions,ctr,inline_link_clicks,cost_per_inline_link_click",
-                "level": "campaign",
-                "date_preset": "maximum",
-                "limit": "500",
-            })
-            for row in insights_data.get("data", []):
+            insights_rows = insights_bodies[i].get("data", [])
+            for row in insights_rows:
                 cid = row.get("campaign_id")
                 if not cid:
                     continue
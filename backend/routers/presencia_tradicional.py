@@ -8,6 +8,8 @@ from database import SessionLocal
 from .auth import get_current_user
 from datetime import date
 import json as json_module
+import fast_json
+import exportador
 
 router = APIRouter(
     prefix='/presencia-tradicional',
@@ -84,6 +86,17 @@ class PresenciaTradicionalResponse(BaseModel):
     datos_extra_json: Optional[str] = None
     creado_por: str
 
+def filtrar_presencia(query, marca: Optional[str] = None, agencia: Optional[str] = None,
+                      tipo: Optional[str] = None):
+    """Filtros del listado de presencia tradicional"""
+    if marca:
+        query = query.filter(PresenciaTradicional.marca.ilike(marca))
+    if agencia:
+        query = query.filter(PresenciaTradicional.agencia.ilike(agencia))
+    if tipo:
+        query = query.filter(PresenciaTradicional.tipo.ilike(tipo))
+    return query
+
 @router.get("/", response_model=list[PresenciaTradicionalResponse], status_code=status.HTTP_200_OK)
 async def read_all_presencia(user: user_dependency, db: db_dependency,
                              marca: Optional[str] = Query(None),
@@ -94,31 +107,25 @@ async def read_all_presencia(user: user_dependency, db: db_dependency,
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
     
-    query = db.query(PresenciaTradicional)
+    # Solo las columnas del response_model, serializadas con fast_json sin validar por fila
+    query = db.query(*fast_json.columnas(PresenciaTradicional, PresenciaTradicionalResponse))
     
-    if marca:
-        query = query.filter(PresenciaTradicional.marca.ilike(marca))
-    if agencia:
-        query = query.filter(PresenciaTradicional.agencia.ilike(agencia))
-    if tipo:
-        query = query.filter(PresenciaTradicional.tipo.ilike(tipo))
+    query = filtrar_presencia(query, marca, agencia, tipo)
     
     query = query.offset(offset)
     if limit:
         query = query.limit(limit)
 
-    presencias = query.all()
+    result = fast_json.filas(query)
 
     # Strip heavy base64 content from list response (97MB → ~500KB)
     # Full data available via GET /{presencia_id}
-    result = []
-    for p in presencias:
-        item = {c.name: getattr(p, c.name) for c in PresenciaTradicional.__table__.columns}
+    for item in result:
         # Keep only light fieldValues from datos_extra_json (needed for date filtering)
         # Strip base64 images stored inside fieldValues, fieldImages, fieldFiles (~93MB total)
-        if p.datos_extra_json:
+        if item["datos_extra_json"]:
             try:
-                extras = json_module.loads(p.datos_extra_json)
+                extras = json_module.loads(item["datos_extra_json"])
                 raw_fv = extras.get("fieldValues") or {}
                 # Strip any value that is base64 data or longer than 500 chars
                 light_fv = {
@@ -144,8 +151,52 @@ async def read_all_presencia(user: user_dependency, db: db_dependency,
             except (json_module.JSONDecodeError, TypeError):
                 item["datos_extra_json"] = None
         # imagenes_json kept for dashboard card image display (4.3MB total, acceptable)
-        result.append(item)
-    return result
+    return fast_json.FastJSONResponse(result)
+
+# Sin imagenes_json ni datos_extra_json (base64 / JSON del formulario)
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Tipo", "tipo"),
+    ("Nombre", "nombre"),
+    ("Agencia", "agencia"),
+    ("Marca", "marca"),
+    ("Ciudad", "ciudad"),
+    ("Campaña", "campanya"),
+    ("Ubicación", "ubicacion"),
+    ("Contenido", "contenido"),
+    ("Fecha instalación", "fecha_instalacion"),
+    ("Duración", "duracion"),
+    ("Cambio de lona", "cambio_lona"),
+    ("Vista", "vista"),
+    ("Iluminación", "iluminacion"),
+    ("Dimensiones", "dimensiones"),
+    ("Proveedor", "proveedor"),
+    ("Código proveedor", "codigo_proveedor"),
+    ("Costo mensual", "costo_mensual"),
+    ("Duración contrato", "duracion_contrato"),
+    ("Inicio contrato", "inicio_contrato"),
+    ("Término contrato", "termino_contrato"),
+    ("Impresión", "impresion"),
+    ("Costo impresión", "costo_impresion"),
+    ("Instalación", "instalacion"),
+    ("Notas", "notas"),
+    ("Observaciones", "observaciones"),
+    ("Creado por", "creado_por"),
+]
+
+@router.get("/exportar", status_code=status.HTTP_200_OK)
+async def exportar_presencia(user: user_dependency, db: db_dependency,
+                             formato: str = Query(exportador.CSV, pattern=exportador.PATRON_FORMATO),
+                             marca: Optional[str] = Query(None),
+                             agencia: Optional[str] = Query(None),
+                             tipo: Optional[str] = Query(None)):
+    """Exporta la presencia tradicional (mismos filtros que el listado) a CSV o XLSX en streaming."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    query = db.query(*[getattr(PresenciaTradicional, clave) for _, clave in COLUMNAS_EXPORTACION])
+    query = filtrar_presencia(query, marca, agencia, tipo).order_by(PresenciaTradicional.id)
+    return exportador.exportar(query.statement, COLUMNAS_EXPORTACION, formato, "presencia_tradicional")
 
 @router.get("/{presencia_id}", response_model=PresenciaTradicionalResponse, status_code=status.HTTP_200_OK)
 async def read_presencia(user: user_dependency, db: db_dependency, presencia_id: int = Path(gt=0)):
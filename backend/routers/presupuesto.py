@@ -9,6 +9,7 @@ from database import SessionLocal
 from models import PresupuestoMensual, Marcas, Categorias
 from routers.auth import get_current_user
 import json
+import exportador
 
 router = APIRouter(
     prefix='/presupuesto',
@@ -82,6 +83,20 @@ async def get_categorias(user: user_dependency, db: db_dependency):
     return get_categorias_activas(db)
 
 
+def filtrar_presupuestos(query, mes: Optional[int] = None, anio: Optional[int] = None,
+                         categoria: Optional[str] = None, marca_id: Optional[int] = None):
+    """Filtros del listado de presupuestos mensuales"""
+    if mes is not None:
+        query = query.filter(PresupuestoMensual.mes == mes)
+    if anio is not None:
+        query = query.filter(PresupuestoMensual.anio == anio)
+    if categoria:
+        query = query.filter(PresupuestoMensual.categoria == categoria)
+    if marca_id is not None:
+        query = query.filter(PresupuestoMensual.marca_id == marca_id)
+    return query
+
+
 @router.get("/", response_model=List[PresupuestoMensualResponse], status_code=status.HTTP_200_OK)
 async def get_presupuestos_mensuales(
     user: user_dependency, 
@@ -100,14 +115,7 @@ async def get_presupuestos_mensuales(
     query = db.query(PresupuestoMensual)
     
     # Aplicar filtros
-    if mes is not None:
-        query = query.filter(PresupuestoMensual.mes == mes)
-    if anio is not None:
-        query = query.filter(PresupuestoMensual.anio == anio)
-    if categoria:
-        query = query.filter(PresupuestoMensual.categoria == categoria)
-    if marca_id is not None:
-        query = query.filter(PresupuestoMensual.marca_id == marca_id)
+    query = filtrar_presupuestos(query, mes, anio, categoria, marca_id)
     
     presupuestos = query.order_by(
         PresupuestoMensual.anio.desc(),
@@ -137,6 +145,49 @@ async def get_presupuestos_mensuales(
     return result
 
 
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Año", "anio"),
+    ("Mes", "mes"),
+    ("Categoría", "categoria"),
+    ("Marca ID", "marca_id"),
+    ("Marca", "marca_nombre"),
+    ("Monto", "monto"),
+    ("Monto mensual base", "monto_mensual_base"),
+    ("Fecha modificación", "fecha_modificacion"),
+    ("Modificado por", "modificado_por"),
+]
+
+
+@router.get("/exportar", status_code=status.HTTP_200_OK)
+async def exportar_presupuestos_mensuales(
+    user: user_dependency,
+    db: db_dependency,
+    formato: str = Query(exportador.CSV, pattern=exportador.PATRON_FORMATO),
+    mes: Optional[int] = Query(None, ge=1, le=12, description="Filtrar por mes"),
+    anio: Optional[int] = Query(None, ge=2020, le=2050, description="Filtrar por año"),
+    categoria: Optional[str] = Query(None, description="Filtrar por categoría"),
+    marca_id: Optional[int] = Query(None, description="Filtrar por agencia/marca")
+):
+    """
+    Exportar presupuestos mensuales (mismos filtros que el listado) a CSV o XLSX en streaming
+    """
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    query = db.query(
+        *[getattr(PresupuestoMensual, clave) for _, clave in COLUMNAS_EXPORTACION if clave != "marca_nombre"],
+        Marcas.cuenta.label("marca_nombre"),
+    ).outerjoin(Marcas, Marcas.id == PresupuestoMensual.marca_id)
+    query = filtrar_presupuestos(query, mes, anio, categoria, marca_id).order_by(
+        PresupuestoMensual.anio.desc(),
+        PresupuestoMensual.mes.desc(),
+        PresupuestoMensual.categoria,
+        PresupuestoMensual.marca_id
+    )
+    return exportador.exportar(query.statement, COLUMNAS_EXPORTACION, formato, "presupuesto_mensual")
+
+
 @router.post("/", response_model=PresupuestoMensualResponse, status_code=status.HTTP_201_CREATED)
 async def create_or_update_presupuesto_mensual(
     user: user_dependency,
@@ -7,6 +7,7 @@ from starlette import status
 from models import Proveedores
 from database import SessionLocal
 from .auth import get_current_user
+from sugerencias_proveedores import sugerencias
 
 router = APIRouter(
     prefix='/proveedores',
@@ -71,6 +72,22 @@ class ProveedorResponse(BaseModel):
     activo: bool
     creado_por: str
 
+class ProveedorSugerencia(BaseModel):
+    id: int
+    nombre: str
+    rfc: Optional[str]
+
+@router.get("/suggest", response_model=list[ProveedorSugerencia], status_code=status.HTTP_200_OK)
+async def suggest_proveedores(user: user_dependency, db: db_dependency,
+                              q: str = Query(..., min_length=1, max_length=100),
+                              limit: int = Query(10, ge=1, le=50),
+                              incluir_inactivos: bool = Query(False)):
+    """Autocompletado por prefijo y trigramas sobre nombre, razón social y RFC (solo id/nombre/rfc)"""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    return sugerencias.sugerir(db, q, limit, incluir_inactivos)
+
 @router.get("/rfc/{rfc}", response_model=ProveedorResponse, status_code=status.HTTP_200_OK)
 async def get_proveedor_by_rfc(user: user_dependency, db: db_dependency, rfc: str):
     if user is None:
@@ -170,6 +187,7 @@ async def create_proveedor(user: user_dependency, db: db_dependency, proveedor_r
 
     db.add(proveedor_model)
     db.commit()
+    sugerencias.invalidar()
     db.refresh(proveedor_model)
     return proveedor_model
 
@@ -219,6 +237,7 @@ async def update_proveedor(user: user_dependency, db: db_dependency,
 
     db.add(proveedor)
     db.commit()
+    sugerencias.invalidar()
 
 @router.delete("/{proveedor_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_proveedor(user: user_dependency, db: db_dependency, proveedor_id: int = Path(gt=0)):
@@ -233,6 +252,7 @@ async def delete_proveedor(user: user_dependency, db: db_dependency, proveedor_i
 
     db.delete(proveedor)
     db.commit()
+    sugerencias.invalidar()
 
 @router.patch("/{proveedor_id}/toggle-activo", status_code=status.HTTP_200_OK)
 async def toggle_activo_proveedor(user: user_dependency, db: db_dependency, proveedor_id: int = Path(gt=0)):
@@ -248,6 +268,7 @@ async def toggle_activo_proveedor(user: user_dependency, db: db_dependency, prov
     proveedor.activo = not proveedor.activo
     db.add(proveedor)
     db.commit()
+    sugerencias.invalidar()
     
     estado = "activado" if proveedor.activo else "desactivado"
     return {"mensaje": f"Proveedor {estado} exitosamente"}
\ No newline at end of file
@@ -1,12 +1,15 @@
 from typing import Annotated, Optional
 from pydantic import BaseModel, Field
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from starlette import status
-from models import Proyecciones
+from models import Proyecciones, ProyeccionPartidas
 from database import SessionLocal
 from .auth import get_current_user
 from datetime import datetime
+from proyeccion_partidas import sync_partidas
+import exportador
 
 def can_access_data(user_role: str) -> bool:
     """Determina si el usuario puede acceder a los datos según su rol"""
@@ -124,6 +127,19 @@ async def get_proyecciones_simple(user: user_dependency, db: db_dependency):
         }
         for p in proyecciones
     ]
+def filtrar_proyecciones(query, marca: Optional[str] = None, año: Optional[int] = None,
+                         periodo: Optional[str] = None, categoria: Optional[str] = None):
+    """Filtros del listado de proyecciones"""
+    if marca:
+        query = query.filter(Proyecciones.marca == marca)
+    if año:
+        query = query.filter(Proyecciones.año == año)
+    if periodo:
+        query = query.filter(Proyecciones.periodo == periodo)
+    if categoria:
+        query = query.filter(Proyecciones.categoria == categoria)
+    return query
+
 @router.get("/", response_model=list[ProyeccionResponse], status_code=status.HTTP_200_OK)
 async def read_all_proyecciones(user: user_dependency, db: db_dependency,
                                marca: Optional[str] = Query(None),
@@ -144,14 +160,7 @@ async def read_all_proyecciones(user: user_dependency, db: db_dependency,
     # Aplicar filtros según el rol del usuario
     query = get_query_for_user(query, user_role, user.get('id'))
     
-    if marca:
-        query = query.filter(Proyecciones.marca == marca)
-    if año:
-        query = query.filter(Proyecciones.año == año)
-    if periodo:
-        query = query.filter(Proyecciones.periodo == periodo)
-    if categoria:
-        query = query.filter(Proyecciones.categoria == categoria)
+    query = filtrar_proyecciones(query, marca, año, periodo, categoria)
     
     query = query.offset(offset)
     if limit:
@@ -159,6 +168,46 @@ async def read_all_proyecciones(user: user_dependency, db: db_dependency,
 
     return query.all()
 
+COLUMNAS_EXPORTACION = [
+    ("ID", "id"),
+    ("Nombre", "nombre"),
+    ("Marca", "marca"),
+    ("Periodo", "periodo"),
+    ("Año", "año"),
+    ("Mes", "mes"),
+    ("Trimestre", "trimestre"),
+    ("Categoría", "categoria"),
+    ("Monto proyectado", "monto_proyectado"),
+    ("Monto real", "monto_real"),
+    ("Estado", "estado"),
+    ("Excede presupuesto", "excede_presupuesto"),
+    ("Autorizada por", "autorizada_por"),
+    ("Fecha autorización", "fecha_autorizacion"),
+    ("Descripción", "descripcion"),
+    ("Creado por", "creado_por"),
+]
+
+@router.get("/exportar", status_code=status.HTTP_200_OK)
+async def exportar_proyecciones(user: user_dependency, db: db_dependency,
+                                formato: str = Query(exportador.CSV, pattern=exportador.PATRON_FORMATO),
+                                marca: Optional[str] = Query(None),
+                                año: Optional[int] = Query(None),
+                                periodo: Optional[str] = Query(None),
+                                categoria: Optional[str] = Query(None)):
+    """Exporta las proyecciones (mismos filtros que el listado) a CSV o XLSX en streaming."""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+    
+    user_role = user.get('role', '')
+    if not can_access_data(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a proyecciones')
+    
+    query = db.query(*[getattr(Proyecciones, clave) for _, clave in COLUMNAS_EXPORTACION])
+    query = get_query_for_user(query, user_role, user.get('id'))
+    query = filtrar_proyecciones(query, marca, año, periodo, categoria)\
+        .order_by(Proyecciones.año, Proyecciones.mes, Proyecciones.id)
+    return exportador.exportar(query.statement, COLUMNAS_EXPORTACION, formato, "proyecciones")
+
 @router.get("/{proyeccion_id}", response_model=ProyeccionResponse, status_code=status.HTTP_200_OK)
 async def read_proyeccion(user: user_dependency, db: db_dependency, proyeccion_id: int = Path(gt=0)):
     if user is None:
@@ -221,6 +270,8 @@ async def create_proyeccion(user: user_dependency, db: db_dependency, proyeccion
     )
 
     db.add(proyeccion_model)
+    db.flush()
+    sync_partidas(db, proyeccion_model)
     db.commit()
     db.refresh(proyeccion_model)
     return proyeccion_model
@@ -274,6 +325,7 @@ async def update_proyeccion(user: user_dependency, db: db_dependency,
     proyeccion.excede_presupuesto = proyeccion_request.excede_presupuesto
 
     db.add(proyeccion)
+    sync_partidas(db, proyeccion)
     db.commit()
 
 @router.delete("/{proyeccion_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -295,45 +347,141 @@ async def delete_proyeccion(user: user_dependency, db: db_dependency, proyeccion
     if proyeccion is None:
         raise HTTPException(status_code=404, detail='Proyección no encontrada')
 
+    db.query(ProyeccionPartidas).filter(ProyeccionPartidas.proyeccion_id == proyeccion.id)\
+        .delete(synchronize_session=False)
     db.delete(proyeccion)
     db.commit()
 
 @router.get("/resumen/por-marca", status_code=status.HTTP_200_OK)
-async def resumen_por_marca(user: user_dependency, db: db_dependency, año: int = Query(None)):
+async def resumen_por_marca(user: user_dependency, db: db_dependency, año: int = Query(None),
+                            marca: Optional[str] = Query(None),
+                            desglose: Optional[str] = Query(None, pattern="^(mes|trimestre|categoria)$")):
+    """
+    Totales por marca calculados en SQL. Con `desglose` cada marca trae además
+    sus totales por mes, trimestre o categoría (la categoría sale de las partidas).
+    """
     if user is None:
         raise HTTPException(status_code=401, detail='Authentication Failed')
     
     user_role = user.get('role', '')
     if not can_access_data(user_role):
         raise HTTPException(status_code=403, detail='No tienes permisos para acceder a proyecciones')
-    
-    query = db.query(Proyecciones)
-    
-    # Aplicar filtros según el rol del usuario
+
+    def filtrar(query):
+        # Aplicar filtros según el rol del usuario
+        query = get_query_for_user(query, user_role, user.get('id'))
+        if año:
+            query = query.filter(Proyecciones.año == año)
+        if marca:
+            query = query.filter(Proyecciones.marca == marca)
+        return query
+
+    totales = filtrar(db.query(
+        Proyecciones.marca,
+        func.coalesce(func.sum(Proyecciones.monto_proyectado), 0),
+        func.coalesce(func.sum(Proyecciones.monto_real), 0),
+        func.count(Proyecciones.id),
+    )).group_by(Proyecciones.marca).all()
+
+    resumen = {
+        marca_resumen: {
+            'marca': marca_resumen,
+            'monto_proyectado_total': proyectado,
+            'monto_real_total': real,
+            'proyecciones_count': count
+        }
+        for marca_resumen, proyectado, real, count in totales
+    }
+    if not desglose:
+        return list(resumen.values())
+
+    if desglose == 'categoria':
+        filas = filtrar(db.query(
+            ProyeccionPartidas.marca,
+            ProyeccionPartidas.categoria,
+            func.coalesce(func.sum(ProyeccionPartidas.monto), 0),
+            func.count(func.distinct(ProyeccionPartidas.proyeccion_id)),
+        ).join(Proyecciones, Proyecciones.id == ProyeccionPartidas.proyeccion_id))\
+            .group_by(ProyeccionPartidas.marca, ProyeccionPartidas.categoria)\
+            .order_by(ProyeccionPartidas.marca, ProyeccionPartidas.categoria).all()
+        for marca_resumen, categoria, proyectado, count in filas:
+            if marca_resumen in resumen:
+                resumen[marca_resumen].setdefault('desglose', []).append({
+                    'categoria': categoria,
+                    'monto_proyectado_total': proyectado,
+                    'proyecciones_count': count,
+                })
+    else:
+        if desglose == 'mes':
+            periodo = Proyecciones.mes
+        else:
+            # Proyecciones mensuales no siempre guardan trimestre; se deriva del mes
+            periodo = func.coalesce(Proyecciones.trimestre, (Proyecciones.mes + 2) // 3)
+        periodo = periodo.label('periodo')  # no 'mes'/'trimestre': chocaría con las columnas en GROUP BY
+        filas = filtrar(db.query(
+            Proyecciones.marca,
+            periodo,
+            func.coalesce(func.sum(Proyecciones.monto_proyectado), 0),
+            func.coalesce(func.sum(Proyecciones.monto_real), 0),
+            func.count(Proyecciones.id),
+        )).group_by(Proyecciones.marca, periodo).order_by(Proyecciones.marca, periodo).all()
+        for marca_resumen, valor, proyectado, real, count in filas:
+            resumen[marca_resumen].setdefault('desglose', []).append({
+                desglose: int(valor) if valor is not None else None,
+                'monto_proyectado_total': proyectado,
+                'monto_real_total': real,
+                'proyecciones_count': count,
+            })
+
+    for item in resumen.values():
+        item.setdefault('desglose', [])
+    return list(resumen.values())
+
+@router.get("/resumen/por-categoria", status_code=status.HTTP_200_OK)
+async def resumen_por_categoria(user: user_dependency, db: db_dependency,
+                                año: Optional[int] = Query(None),
+                                mes: Optional[int] = Query(None, ge=1, le=12),
+                                marca: Optional[str] = Query(None)):
+    """Monto proyectado por categoría/subcategoría, sumando las partidas en SQL"""
+    if user is None:
+        raise HTTPException(status_code=401, detail='Authentication Failed')
+
+    user_role = user.get('role', '')
+    if not can_access_data(user_role):
+        raise HTTPException(status_code=403, detail='No tienes permisos para acceder a proyecciones')
+
+    query = db.query(
+        ProyeccionPartidas.categoria,
+        ProyeccionPartidas.subcategoria,
+        func.coalesce(func.sum(ProyeccionPartidas.monto), 0),
+        func.count(ProyeccionPartidas.id),
+        func.count(func.distinct(ProyeccionPartidas.proyeccion_id)),
+    )
+
+    # Aplicar filtros según el rol del usuario (sobre la proyección dueña de cada partida)
+    query = query.join(Proyecciones, Proyecciones.id == ProyeccionPartidas.proyeccion_id)
     query = get_query_for_user(query, user_role, user.get('id'))
-    
+
     if año:
-        query = query.filter(Proyecciones.año == año)
-    
-    proyecciones = query.all()
-    
-    # Agrupar por marca
-    resumen = {}
-    for proyeccion in proyecciones:
-        if proyeccion.marca not in resumen:
-            resumen[proyeccion.marca] = {
-                'marca': proyeccion.marca,
-                'monto_proyectado_total': 0,
-                'monto_real_total': 0,
-                'proyecciones_count': 0
-            }
-        
-        resumen[proyeccion.marca]['monto_proyectado_total'] += proyeccion.monto_proyectado
-        if proyeccion.monto_real:
-            resumen[proyeccion.marca]['monto_real_total'] += proyeccion.monto_real
-        resumen[proyeccion.marca]['proyecciones_count'] += 1
-    
-    return list(resumen.values())
+        query = query.filter(ProyeccionPartidas.año == año)
+    if mes:
+        query = query.filter(ProyeccionPartidas.mes == mes)
+    if marca:
+        query = query.filter(ProyeccionPartidas.marca == marca)
+
+    filas = query.group_by(ProyeccionPartidas.categoria, ProyeccionPartidas.subcategoria)\
+        .order_by(ProyeccionPartidas.categoria, ProyeccionPartidas.subcategoria).all()
+
+    return [
+        {
+            'categoria': categoria,
+            'subcategoria': subcategoria,
+            'monto_proyectado_total': monto,
+            'partidas_count': partidas,
+            'proyecciones_count': proyecciones,
+        }
+        for categoria, subcategoria, monto, partidas, proyecciones in filas
+    ]
 
 @router.post("/{proyeccion_id}/aprobar", status_code=status.HTTP_200_OK)
 async def aprobar_proyeccion(user: user_dependency, db: db_dependency, proyeccion_id: int = Path(gt=0)):
@@ -0,0 +1,241 @@
+"""
+Autocompletado de proveedores (/proveedores/suggest).
+
+Índice en memoria con nombre, razón social y RFC de todos los proveedores:
+  - prefijos: lista ordenada de palabras normalizadas (sin acentos, minúsculas)
+    donde cada prefijo se resuelve con bisect;
+  - trigramas: trigrama -> proveedores que lo contienen, para tolerar errores
+    de dedo ("imprenat" encuentra "Imprenta"). La similitud se calcula por
+    campo (nombre, razón social, RFC) y se toma la mayor, igual que
+    greatest(similarity(...)) en la consulta de respaldo.
+Se reconstruye en un hilo cuando se crea, edita, activa/desactiva o borra un
+proveedor (`invalidar`). Mientras no está listo (arranque o reconstrucción en
+curso) las sugerencias salen de la base: trigramas de pg_trgm en PostgreSQL
+si la extensión está instalada, LIKE en otro caso. Los índices de trigramas se
+crean con migrations/create_trigramas_proveedores.py, no al arrancar.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import func, or_, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Proveedores
+
+LIMITE = 10
+MIN_SIMILITUD = 0.3  # igual que el umbral por defecto de pg_trgm
+
+# (nombre, DDL); la migración agrega CONCURRENTLY a los CREATE INDEX
+DDL_POSTGRES = [
+    ("pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    ("ix_proveedores_nombre_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_proveedores_nombre_trgm ON proveedores USING gin (nombre gin_trgm_ops)"),
+    ("ix_proveedores_razon_social_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_proveedores_razon_social_trgm ON proveedores USING gin (razon_social gin_trgm_ops)"),
+    ("ix_proveedores_rfc_trgm",
+     "CREATE INDEX IF NOT EXISTS ix_proveedores_rfc_trgm ON proveedores USING gin (rfc gin_trgm_ops)"),
+]
+
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas, sin acentos y con un espacio entre palabras."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def trigramas(texto: str) -> set[str]:
+    """Trigramas por palabra, con relleno como pg_trgm ("  ab", " abc", ...)."""
+    resultado = set()
+    for palabra in texto.split():
+        palabra = f"  {palabra} "
+        resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+
+@dataclass(frozen=True)
+class _Proveedor:
+    id: int
+    nombre: str
+    rfc: Optional[str]
+    activo: bool
+    texto: str  # nombre + razón social + RFC normalizados
+    trigramas: tuple[frozenset, ...]  # uno por campo: nombre, razón social, RFC
+
+
+class _Indice:
+    def __init__(self, proveedores: list[_Proveedor]):
+        self.proveedores = proveedores
+        # (palabra, posición en proveedores) ordenado para buscar prefijos con bisect
+        self.palabras = sorted(
+            {(palabra, i) for i, p in enumerate(proveedores) for palabra in p.texto.split()}
+        )
+        self.claves = [palabra for palabra, _ in self.palabras]
+        # trigrama -> (posición en proveedores, campo) que lo contienen
+        self.por_trigrama: dict[str, list[tuple[int, int]]] = {}
+        for i, p in enumerate(proveedores):
+            for campo, trigramas_campo in enumerate(p.trigramas):
+                for trigrama in trigramas_campo:
+                    self.por_trigrama.setdefault(trigrama, []).append((i, campo))
+
+    def _por_prefijo(self, prefijo: str) -> set[int]:
+        inicio = bisect.bisect_left(self.claves, prefijo)
+        fin = bisect.bisect_left(self.claves, prefijo + "\uffff")
+        return {i for _, i in self.palabras[inicio:fin]}
+
+    def buscar(self, q: str, limite: int, incluir_inactivos: bool) -> list[dict]:
+        terminos = q.split()
+        if not terminos:
+            return []
+        # Prefijo: todas las palabras de la consulta deben iniciar alguna palabra del proveedor
+        candidatos = self._por_prefijo(terminos[0])
+        for termino in terminos[1:]:
+            candidatos &= self._por_prefijo(termino)
+        if not incluir_inactivos:
+            candidatos = {i for i in candidatos if self.proveedores[i].activo}
+        puntajes = {i: 2.0 + (1.0 if self.proveedores[i].texto.startswith(q) else 0.0) for i in candidatos}
+
+        # Trigramas (similitud como pg_trgm: comunes / unión, la mejor de los campos),
+        # solo si faltan resultados
+        trigramas_q = trigramas(q)
+        if len(puntajes) < limite and trigramas_q:
+            comunes: dict[tuple[int, int], int] = {}
+            for trigrama in trigramas_q:
+                for llave in self.por_trigrama.get(trigrama, ()):
+                    comunes[llave] = comunes.get(llave, 0) + 1
+            similitudes: dict[int, float] = {}
+            for (i, campo), n in comunes.items():
+                similitud = n / (len(trigramas_q) + len(self.proveedores[i].trigramas[campo]) - n)
+                if similitud >= MIN_SIMILITUD and similitud > similitudes.get(i, 0.0):
+                    similitudes[i] = similitud
+            for i, similitud in similitudes.items():
+                if i not in puntajes and (incluir_inactivos or self.proveedores[i].activo):
+                    puntajes[i] = similitud
+
+        mejores = heapq.nsmallest(limite, puntajes, key=lambda i: (-puntajes[i], self.proveedores[i].nombre.lower()))
+        return [{"id": p.id, "nombre": p.nombre, "rfc": p.rfc} for p in (self.proveedores[i] for i in mejores)]
+
+
+class SugerenciasProveedores:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indice: Optional[_Indice] = None
+        self._version = 0  # sube con cada invalidación; descarta reconstrucciones viejas
+        self._reconstruyendo = False
+
+    @property
+    def listo(self) -> bool:
+        return self._indice is not None
+
+    def reconstruir(self):
+        """Carga los proveedores y reemplaza el índice (corre en un hilo aparte)."""
+        with self._lock:
+            version = self._version
+        try:
+            with SessionLocal() as db:
+                filas = db.query(Proveedores.id, Proveedores.nombre, Proveedores.razon_social,
+                                 Proveedores.rfc, Proveedores.activo).all()
+            proveedores = []
+            for id_, nombre, razon_social, rfc, activo in filas:
+                campos = [normalizar(campo) for campo in (nombre, razon_social, rfc)]
+                proveedores.append(_Proveedor(id_, nombre or "", rfc, activo is not False,
+                                              " ".join(filter(None, campos)),
+                                              tuple(frozenset(trigramas(campo)) for campo in campos if campo)))
+            indice = _Indice(proveedores)
+        except Exception:
+            with self._lock:
+                self._reconstruyendo = False
+            raise
+        with self._lock:
+            self._reconstruyendo = False
+            if version == self._version:
+                self._indice = indice
+            else:
+                self._programar()  # hubo cambios mientras se construía
+
+    def _programar(self):
+        # Llamar con self._lock tomado
+        if not self._reconstruyendo:
+            self._reconstruyendo = True
+            threading.Thread(target=self.reconstruir, name="sugerencias-proveedores", daemon=True).start()
+
+    def calentar(self):
+        """Construye el índice en segundo plano si todavía no existe (p. ej. al arrancar)."""
+        with self._lock:
+            if self._indice is None:
+                self._programar()
+
+    def invalidar(self):
+        """Descarta el índice y lo reconstruye en segundo plano."""
+        with self._lock:
+            self._version += 1
+            self._indice = None
+            self._programar()
+
+    def sugerir(self, db: Session, q: str, limite: int = LIMITE, incluir_inactivos: bool = False) -> list[dict]:
+        indice = self._indice
+        if indice is not None:
+            return indice.buscar(normalizar(q), limite, incluir_inactivos)
+        self.calentar()
+        return sugerir_desde_base(db, q, limite, incluir_inactivos)
+
+
+_pg_trgm: Optional[bool] = None  # None: todavía no se consulta
+_pg_trgm_consultado = 0.0
+# Sin la extensión se vuelve a consultar cada tanto: la migración puede
+# instalarla con la API corriendo
+PG_TRGM_RECONSULTA_SEGUNDOS = 300
+
+
+def tiene_pg_trgm(db: Session) -> bool:
+    """Si la base es PostgreSQL con la extensión pg_trgm instalada."""
+    global _pg_trgm, _pg_trgm_consultado
+    if db.bind.dialect.name != "postgresql":
+        return False
+    if _pg_trgm is None or (not _pg_trgm and time.monotonic() - _pg_trgm_consultado > PG_TRGM_RECONSULTA_SEGUNDOS):
+        _pg_trgm = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+        _pg_trgm_consultado = time.monotonic()
+    return _pg_trgm
+
+
+def sugerir_desde_base(db: Session, q: str, limite: int = LIMITE, incluir_inactivos: bool = False) -> list[dict]:
+    """Sugerencias sin índice en memoria: pg_trgm si está disponible, ILIKE en otro caso."""
+    q = q.strip()
+    if not q:
+        return []
+    campos = (Proveedores.nombre, Proveedores.razon_social, Proveedores.rfc)
+    query = db.query(Proveedores.id, Proveedores.nombre, Proveedores.rfc)
+    if not incluir_inactivos:
+        query = query.filter(or_(Proveedores.activo.is_(None), Proveedores.activo.is_(True)))
+    if tiene_pg_trgm(db):
+        # `%` usa los índices gin_trgm_ops; ILIKE cubre prefijos muy cortos (< 3 letras)
+        patron = f"{q}%"
+        similitud = func.greatest(*(func.similarity(c, q) for c in campos))
+        query = query.filter(or_(*(c.op("%")(q) for c in campos), *(c.ilike(patron) for c in campos)))\
+            .order_by(Proveedores.nombre.ilike(patron).desc(), similitud.desc(), Proveedores.nombre)
+    else:
+        patron = f"%{q}%"
+        query = query.filter(or_(*(c.ilike(patron) for c in campos))).order_by(Proveedores.nombre)
+    return [{"id": id_, "nombre": nombre, "rfc": rfc} for id_, nombre, rfc in query.limit(limite)]
+
+
+def indices_faltantes(engine) -> list[str]:
+    """Índices de trigramas que todavía no existen (solo consulta el catálogo)."""
+    if engine.dialect.name != "postgresql":
+        return []
+    from migrations.crear_indices_modelos import indices_validos
+    nombres = [nombre for nombre, ddl in DDL_POSTGRES if ddl.startswith("CREATE INDEX")]
+    existentes = indices_validos(engine, nombres)
+    return [nombre for nombre in nombres if nombre not in existentes]
+
+
+sugerencias = SugerenciasProveedores()
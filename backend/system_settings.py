@@ -0,0 +1,119 @@
+"""
+Registro en memoria de la tabla system_settings.
+
+Todas las claves se cargan con una sola consulta y se guardan ya parseadas
+(los mapas JSON de Google/Meta se decodifican una vez). Las escrituras hechas
+con `registry.set` / `registry.delete` invalidan el registro al hacer commit;
+además el snapshot expira cada SETTINGS_CACHE_TTL segundos para recoger cambios
+hechos por otros procesos (p. ej. otro worker de uvicorn).
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from models import SystemSettings
+
+SETTINGS_CACHE_TTL = 60  # seconds
+
+# Claves cuyo valor es un objeto JSON
+JSON_KEYS = frozenset({"google_ads_customer_map", "meta_ads_account_map"})
+
+
+def _parse_json_object(value: Optional[str]) -> dict:
+    if not value:
+        return {}
+    try:
+        data = json.loads(value)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@lru_cache(maxsize=None)
+def _env_json_cached(name: str, raw: str) -> tuple:
+    return tuple(_parse_json_object(raw).items())
+
+
+def env_json(name: str) -> dict:
+    """Objeto JSON de una variable de entorno (p. ej. GOOGLE_ADS_CUSTOMER_MAP), parseado una sola vez."""
+    return dict(_env_json_cached(name, os.getenv(name, "")))
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    values: dict = field(default_factory=dict)
+    parsed: dict = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    def get(self, key: str, default: str = "") -> str:
+        return self.values.get(key) or default
+
+    def get_json(self, key: str) -> dict:
+        """Copia del objeto JSON guardado en `key` ({} si no existe o es inválido)."""
+        return dict(self.parsed.get(key) or {})
+
+    def has(self, key: str) -> bool:
+        return key in self.values
+
+
+class SettingsRegistry:
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot: Optional[SettingsSnapshot] = None
+        # Cambia con cada invalidate(); una carga que empezó antes no se guarda
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+
+    def snapshot(self, db: Session) -> SettingsSnapshot:
+        snap = self._snapshot
+        if snap is not None and time.time() - snap.loaded_at < self.ttl:
+            return snap
+        with self._lock:
+            snap = self._snapshot
+            if snap is not None and time.time() - snap.loaded_at < self.ttl:
+                return snap
+            with self._generation_lock:
+                generation = self._generation
+            rows = db.query(SystemSettings.key, SystemSettings.value).all()
+            values = {key: value for key, value in rows}
+            parsed = {key: _parse_json_object(values[key]) for key in JSON_KEYS if key in values}
+            snap = SettingsSnapshot(values=values, parsed=parsed, loaded_at=time.time())
+            with self._generation_lock:
+                # Un set()/invalidate() durante la consulta: lo leído puede ser anterior
+                # al cambio, así que no se guarda y la siguiente lectura vuelve a cargar
+                if generation == self._generation:
+                    self._snapshot = snap
+            return snap
+
+    def invalidate(self):
+        with self._generation_lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def set(self, db: Session, key: str, value: str):
+        """Crea o actualiza `key`, hace commit e invalida el registro."""
+        row = db.query(SystemSettings).filter(SystemSettings.key == key).first()
+        if row:
+            row.value = value
+        else:
+            db.add(SystemSettings(key=key, value=value))
+        db.commit()
+        self.invalidate()
+
+    def set_json(self, db: Session, key: str, value: dict):
+        self.set(db, key, json.dumps(value, ensure_ascii=False))
+
+    def delete(self, db: Session, key: str):
+        db.query(SystemSettings).filter(SystemSettings.key == key).delete()
+        db.commit()
+        self.invalidate()
+
+
+registry = SettingsRegistry()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Verificación de planes de consulta (regresión de índices).
+
+Arma las mismas consultas que los routers (usando sus funciones de filtrado),
+corre EXPLAIN y falla con código 1 si alguna dejó de usar el índice esperado.
+En PostgreSQL se desactiva el seq scan de la sesión para que el resultado no
+dependa de cuántas filas tenga la base: si aun así no se usa el índice, el
+predicado no es sargable o el índice no existe. En SQLite se usa EXPLAIN QUERY PLAN.
+
+Uso:
+  python verificar_planes_consulta.py
+"""
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import func, text
+
+from database import engine, SessionLocal
+from models import Facturas, Eventos
+from routers.facturas import filtrar_facturas
+from routers.eventos import filtrar_eventos
+
+CASOS = [
+    (
+        "facturas por marca y año",
+        lambda db: filtrar_facturas(db.query(Facturas.id), marca="Marca", anio=2025),
+        "ix_facturas_marca_fecha_factura",
+    ),
+    (
+        "facturas por estado y año",
+        lambda db: filtrar_facturas(db.query(Facturas.id), estado="Pendiente", anio=2025),
+        "ix_facturas_estado_fecha_factura",
+    ),
+    (
+        "gasto por evento y categoría",
+        lambda db: db.query(func.sum(Facturas.monto)).filter(
+            Facturas.evento_id == 1, Facturas.categoria == "Relaciones Públicas"
+        ),
+        "ix_facturas_evento_categoria",
+    ),
+    (
+        "eventos por marca y rango de fechas",
+        lambda db: filtrar_eventos(db.query(Eventos.id), "Marca", date(2025, 1, 1), date(2025, 12, 31)),
+        "ix_eventos_marca_fecha_inicio",
+    ),
+]
+
+
+def _indices_postgres(plan: dict) -> set:
+    encontrados = set()
+    if plan.get("Index Name"):
+        encontrados.add(plan["Index Name"])
+    for hijo in plan.get("Plans", []):
+        encontrados |= _indices_postgres(hijo)
+    return encontrados
+
+
+def _indices_usados(db, sql: str) -> tuple[set, str]:
+    if engine.dialect.name == "postgresql":
+        plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        raiz = plan[0]["Plan"]
+        return _indices_postgres(raiz), str(raiz)
+    filas = db.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    detalle = "\n".join(str(fila[-1]) for fila in filas)
+    return {palabra for palabra in detalle.replace("(", " ").split() if palabra.startswith("ix_")}, detalle
+
+
+def main() -> int:
+    db = SessionLocal()
+    fallos = 0
+    try:
+        if engine.dialect.name == "postgresql":
+            db.execute(text("SET enable_seqscan = off"))
+        for nombre, construir, indice in CASOS:
+            sql = str(construir(db).statement.compile(
+                dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+            ))
+            usados, detalle = _indices_usados(db, sql)
+            if indice in usados:
+                print(f"✅ {nombre}: usa {indice}")
+            else:
+                fallos += 1
+                print(f"❌ {nombre}: se esperaba {indice}, el plan usa {sorted(usados) or 'ningún índice'}")
+                print(f"   {detalle}")
+    finally:
+        db.rollback()
+        db.close()
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
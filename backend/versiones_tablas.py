@@ -0,0 +1,88 @@
+"""
+Versión de cambios por tabla, en memoria.
+
+Cada commit que escribe en una tabla sube su contador. Los eventos de
+SQLAlchemy juntan las tablas tocadas durante la transacción y las confirman
+al hacer commit (un rollback las descarta):
+  - after_flush: objetos nuevos, modificados o borrados de la sesión;
+  - do_orm_execute: insert/update/delete en lote (db.execute(update(...)),
+    query.update/delete) y UPDATE/INSERT/DELETE escritos con text().
+Lo que se escribe fuera de una Session (engine.begin() en migraciones o en
+el arranque) no sube versiones; `epoca` cambia en cada arranque para que las
+versiones de un proceso anterior nunca coincidan con las actuales.
+
+cache_http usa estas versiones para armar ETags sin consultar la base.
+"""
+import re
+import threading
+import uuid
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+_CLAVE_SESION = "tablas_modificadas"
+_DML_TEXTO = re.compile(r"\b(?:update|insert\s+into|delete\s+from)\s+\"?(\w+)\"?", re.IGNORECASE)
+
+
+class RegistroVersiones:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versiones: dict[str, int] = {}
+        self.epoca = uuid.uuid4().hex[:8]
+
+    def incrementar(self, tablas: Iterable[str]):
+        with self._lock:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def versiones(self, tablas: Iterable[str]) -> tuple:
+        versiones = self._versiones
+        return tuple(versiones.get(tabla, 0) for tabla in tablas)
+
+
+registro = RegistroVersiones()
+
+
+def _pendientes(session: Session) -> set:
+    return session.info.setdefault(_CLAVE_SESION, set())
+
+
+def _tablas_de_objetos(objetos) -> set:
+    tablas = set()
+    for obj in objetos:
+        tabla = getattr(obj, "__table__", None)
+        if tabla is not None:
+            tablas.add(tabla.name)
+    return tablas
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    _pendientes(session).update(_tablas_de_objetos([*session.new, *session.dirty, *session.deleted]))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    statement = orm_execute_state.statement
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        tabla = getattr(statement, "table", None)
+        if tabla is not None and getattr(tabla, "name", None):
+            _pendientes(orm_execute_state.session).add(tabla.name)
+    elif isinstance(statement, TextClause):
+        tablas = _DML_TEXTO.findall(statement.text)
+        if tablas:
+            _pendientes(orm_execute_state.session).update(t.lower() for t in tablas)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    tablas = session.info.pop(_CLAVE_SESION, None)
+    if tablas:
+        registro.incrementar(tablas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_CLAVE_SESION, None)
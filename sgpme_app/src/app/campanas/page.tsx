@@ -66,12 +66,18 @@ interface AnuncioApiItem {
   tipo?: string;
   estado?: string;
   full_image_url?: string;
+  imagen_proxy_url?: string;
   thumbnail_url?: string;
   image_url?: string;
   titulo?: string;
   cuerpo?: string;
   dest_url?: string;
-  imagenes?: { tipo: string; asset_id: string; url?: string }[];
+  imagenes?: {
+    tipo: string;
+    asset_id: string;
+    url?: string;
+    proxy_url?: string;
+  }[];
   titulos?: string[];
   descripciones?: string[];
   urls_finales?: string[];
@@ -1499,8 +1505,15 @@ const CampanasPage = () => {
                 ) : anunciosApiData.length > 0 ? (
                   <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
                     {anunciosApiData.map((ad: AnuncioApiItem) => {
-                      const imgSrc =
+                      // El proxy del backend (URL firmada, caché en disco) va primero;
+                      // la URL directa del CDN queda como respaldo
+                      const proxyUrl =
                         campanaAnuncios.plataforma === "Meta Ads"
+                          ? ad.imagen_proxy_url
+                          : ad.imagenes?.[0]?.proxy_url;
+                      const imgSrc = proxyUrl
+                        ? `${API_URL}${proxyUrl}`
+                        : campanaAnuncios.plataforma === "Meta Ads"
                           ? ad.full_image_url ||
                             ad.image_url ||
                             ad.thumbnail_url ||
@@ -1514,7 +1527,7 @@ const CampanasPage = () => {
                           {imgSrc ? (
                             // eslint-disable-next-line @next/next/no-img-element
                             <img
-                              src={imgSrc}
+                              src={proxyUrl ? `${imgSrc}&ancho=640` : imgSrc}
                               alt={ad.nombre}
                               onClick={() => setImagenPreview(imgSrc)}
                               className="w-full h-56 object-contain bg-gray-100 cursor-pointer hover:opacity-80 transition-opacity"
@@ -184,7 +184,31 @@ export function useCategoriasAPI() {
           throw new Error(errorData.detail || "Error al actualizar categoría");
         }
 
-        const result = await response.json();
+        let result = await response.json();
+
+        // La migración de datos corre en segundo plano; esperar a que termine
+        if (result.job_id) {
+          const jobUrl = `${API_BASE_URL}/categorias/migraciones/${result.job_id}`;
+          for (let intento = 0; intento < 120; intento++) {
+            await new Promise((resolve) => setTimeout(resolve, 500));
+            const jobResponse = await fetch(jobUrl, {
+              headers: getAuthHeader(),
+            });
+            if (!jobResponse.ok) break;
+            const job = await jobResponse.json();
+            if (job.estado === "error") {
+              throw new Error(job.error || "Error al migrar la categoría");
+            }
+            if (job.estado === "completado") {
+              result = {
+                message: "Categoría actualizada exitosamente",
+                migracion: job.resultado,
+              };
+              break;
+            }
+          }
+        }
+
         console.log("✅ Categoría actualizada:", result);
         return result;
       } catch (err) {
@@ -501,7 +501,9 @@ export function useEventos() {
           objetivo_especifico: brief.objetivoEspecifico,
           audiencia_detallada: brief.audienciaDetallada,
           mensaje_clave: brief.mensajeClave,
+          // Las ids numéricas vienen del backend y permiten actualizar sin recrear filas
           actividades: brief.actividades.map((act) => ({
+            id: /^\d+$/.test(act.id) ? Number(act.id) : undefined,
             nombre: act.nombre,
             descripcion: act.descripcion,
             duracion: act.duracion,
@@ -510,6 +512,7 @@ export function useEventos() {
             orden: 0,
           })),
           cronograma: brief.cronograma.map((cron) => ({
+            id: /^\d+$/.test(cron.id) ? Number(cron.id) : undefined,
             actividad: cron.actividad,
             fecha_inicio: new Date(
               cron.fechaInicio.split(".")[0].replace(" ", "T"),
@@ -1444,6 +1447,30 @@ export function useEventos() {
         if (!response.ok) return evento;
 
         const briefData = await response.json();
+
+        // Las imágenes se guardan aparte; el brief solo trae referencias (imagen_id)
+        let observacionesEspeciales: string =
+          briefData.observaciones_especiales || "";
+        try {
+          const obs = JSON.parse(observacionesEspeciales || "{}");
+          if (
+            obs.imagenes?.some(
+              (img: { imagen_id?: number; url?: string }) =>
+                img.imagen_id && !img.url,
+            )
+          ) {
+            const imagenesResponse = await fetchConToken(
+              `${API_URL}/eventos/${eventoId}/brief/imagenes${marcaParam}`,
+            );
+            if (imagenesResponse.ok) {
+              obs.imagenes = await imagenesResponse.json();
+              observacionesEspeciales = JSON.stringify(obs);
+            }
+          }
+        } catch {
+          // observaciones sin JSON válido: se usan tal cual
+        }
+
         const briefMapeado: BriefEvento = {
           id: briefData.id.toString(),
           eventoId: briefData.evento_id.toString(),
@@ -1475,7 +1502,7 @@ export function useEventos() {
           proveedores: briefData.proveedores || "",
           logistica: briefData.logistica || "",
           presupuestoDetallado: briefData.presupuesto_detallado || "",
-          observacionesEspeciales: briefData.observaciones_especiales || "",
+          observacionesEspeciales,
           fechaCreacion: briefData.fecha_creacion
             ? briefData.fecha_creacion.split("T")[0]
             : "",
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la clave de duplicados de facturas (serie + folio).
+Uso: pytest test_duplicados_facturas.py  (o python test_duplicados_facturas.py)
+Usa una base SQLite temporal; no necesita el servidor corriendo.
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+
+_DB = os.path.join(tempfile.mkdtemp(), "duplicados.db")
+os.environ.update(DB_TYPE="sqlite", SQLITE_PATH=_DB)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import cfdi  # noqa: E402
+import duplicados_facturas  # noqa: E402
+import models  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from starlette.datastructures import UploadFile  # noqa: E402
+from routers.facturas import FacturaRequest, importar_cfdi, update_factura  # noqa: E402
+
+RFC = "AAA010101AAA"
+PROVEEDOR = "Imprenta Sol"
+USUARIO = {"id": 1, "role": "administrador", "username": "pruebas"}
+
+
+def _xml(serie, folio, total, uuid):
+    atributo_serie = f' Serie="{serie}"' if serie else ""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4"
+    xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital"
+    Version="4.0"{atributo_serie} Folio="{folio}" Fecha="2025-03-01T10:00:00"
+    SubTotal="{total}" Total="{total}" TipoDeComprobante="I">
+  <cfdi:Emisor Rfc="{RFC}" Nombre="{PROVEEDOR}"/>
+  <cfdi:Receptor Rfc="BBB010101BBB" UsoCFDI="G03"/>
+  <cfdi:Conceptos><cfdi:Concepto Cantidad="1" Descripcion="Lonas" Importe="{total}"/></cfdi:Conceptos>
+  <cfdi:Complemento><tfd:TimbreFiscalDigital UUID="{uuid}"/></cfdi:Complemento>
+</cfdi:Comprobante>""".encode()
+
+
+def _importar(db, archivos):
+    subidos = [UploadFile(io.BytesIO(contenido), filename=nombre) for nombre, contenido in archivos]
+    return asyncio.run(importar_cfdi(USUARIO, db, subidos, "Kia", None, None))
+
+
+def _db():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(models.Proveedores(nombre=PROVEEDOR, rfc=RFC, activo=True))
+    db.commit()
+    return db
+
+
+def test_misma_clave_sin_importar_guiones_ni_ceros():
+    clave = duplicados_facturas.clave_factura(RFC, PROVEEDOR, "A-100")
+    assert clave == f"{RFC}|A100"
+    assert duplicados_facturas.clave_factura(RFC, PROVEEDOR, "a 0100") == clave
+    assert duplicados_facturas.clave_factura(RFC, PROVEEDOR, "B-100") != clave
+
+
+def test_numero_de_cfdi_incluye_serie():
+    assert cfdi.numero_factura({"serie": "A", "folio": "100"}) == "A-100"
+    assert cfdi.numero_factura({"serie": None, "folio": "100"}) == "100"
+    assert cfdi.numero_factura({"folio": None, "uuid": "ABC"}) == "ABC"
+
+
+def test_mismo_folio_con_otra_serie_son_facturas_distintas():
+    db = _db()
+    try:
+        resultado = _importar(db, [
+            ("a.xml", _xml("A", "100", 500, "11111111-1111-1111-1111-111111111111")),
+            ("b.xml", _xml("B", "100", 700, "22222222-2222-2222-2222-222222222222")),
+        ])
+        assert resultado["resumen"]["creada"] == 2
+        facturas = {f.numero_factura: f for f in db.query(models.Facturas)}
+        assert set(facturas) == {"A-100", "B-100"}
+        assert facturas["A-100"].monto == 500 and facturas["B-100"].monto == 700
+
+        # Reimportar B-100 actualiza B-100, no A-100
+        resultado = _importar(db, [("b.xml", _xml("B", "100", 700, "22222222-2222-2222-2222-222222222222"))])
+        assert resultado["resultados"][0]["resultado"] == "actualizada"
+        assert resultado["resultados"][0]["factura_id"] == facturas["B-100"].id
+    finally:
+        db.close()
+
+
+def test_factura_capturada_a_mano_se_detecta_al_importar():
+    db = _db()
+    try:
+        manual = models.Facturas(
+            numero_factura="A-0100", proveedor=PROVEEDOR, marca="Kia", monto=500, estado="Pendiente",
+            clave_unica=duplicados_facturas.clave_para(db, PROVEEDOR, "A-0100"),
+        )
+        db.add(manual)
+        db.commit()
+
+        resultado = _importar(db, [("a.xml", _xml("A", "100", 500, "11111111-1111-1111-1111-111111111111"))])
+        assert resultado["resultados"][0]["resultado"] == "actualizada"
+        assert resultado["resultados"][0]["factura_id"] == manual.id
+        assert db.query(models.Facturas).count() == 1
+    finally:
+        db.close()
+
+
+def test_editar_solo_verifica_duplicados_si_cambia_proveedor_o_folio():
+    db = _db()
+    try:
+        # Dos capturas previas con la misma clave (anteriores a la verificación)
+        clave = duplicados_facturas.clave_para(db, PROVEEDOR, "A-100")
+        primera, segunda = (
+            models.Facturas(numero_factura=folio, proveedor=PROVEEDOR, marca="Kia", monto=500,
+                            estado="Pendiente", clave_unica=clave)
+            for folio in ("A-100", "A0100")
+        )
+        db.add_all([primera, segunda])
+        db.commit()
+
+        def editar(factura, **cambios):
+            datos = dict(numero_factura=factura.numero_factura, proveedor=PROVEEDOR, monto=600,
+                         fecha_factura=date(2025, 3, 1), fecha_vencimiento=date(2025, 4, 1),
+                         estado="Pendiente", marca="Kia")
+            asyncio.run(update_factura(USUARIO, db, FacturaRequest(**{**datos, **cambios}), factura.id))
+
+        # Editar el monto no choca con la otra factura
+        editar(segunda)
+        db.refresh(segunda)
+        assert segunda.monto == 600
+
+        # Cambiar el folio a uno que ya existe sí
+        otra = models.Facturas(numero_factura="B-1", proveedor=PROVEEDOR, marca="Kia", monto=1,
+                               estado="Pendiente", clave_unica=duplicados_facturas.clave_para(db, PROVEEDOR, "B-1"))
+        db.add(otra)
+        db.commit()
+        try:
+            editar(otra, numero_factura="A-100")
+            assert False, "se esperaba 409"
+        except HTTPException as e:
+            assert e.status_code == 409
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    for nombre, prueba in list(globals().items()):
+        if nombre.startswith("test_") and callable(prueba):
+            prueba()
+            print(f"✓ {nombre}")